@@ -10,62 +10,289 @@ Lancer :
 from __future__ import annotations
 
 import json
+import os
 import sys
+import threading
+import time
 from pathlib import Path
 from copy import deepcopy
 
 # Ajouter le répertoire parent pour importer main et src
 sys.path.insert(0, str(Path(__file__).parent))
 
-from flask import Flask, render_template, jsonify, request
+from flask import Flask, Response, render_template, jsonify, request
+
+from src.broadcast import Broadcaster, format_sse
+from src.dataset import DatasetSnapshot, DatasetStore
+from src.order_store import OrderStore, validate_order
+from src.batcher import MicroBatcher
+from src.responses import EncodedBodyCache, conditional_json
+from src.jobs import DONE, QUEUED, RUNNING, JobManager
+from src.allocation import GREEDY_ALLOCATORS
+from src.minizinc_solver import KNOWN_SOLVERS
 
 # Chargement des données au démarrage
 DATA_DIR = Path(__file__).parent / "data"
 RESULTS_DIR = Path(__file__).parent / "results"
+# Budget MiniZinc par requête : au-delà, on garde la meilleure solution trouvée (un worker ne reste jamais bloqué)
+MINIZINC_TIME_LIMIT = float(os.environ.get("OPTIPICK_MINIZINC_TIME_LIMIT", 5.0))
+# Threads de calcul en arrière-plan (allocation / MiniZinc) : les handlers HTTP ne calculent jamais eux-mêmes
+JOB_WORKERS = int(os.environ.get("OPTIPICK_JOB_WORKERS", 2))
+# Flux SSE : nombre maximal de clients connectés et battement de cœur (secondes)
+MAX_STREAMS = int(os.environ.get("OPTIPICK_MAX_STREAMS", 500))
+STREAM_HEARTBEAT = float(os.environ.get("OPTIPICK_STREAM_HEARTBEAT", 15.0))
+# Ingestion en masse : un lot (une version, un recalcul) tous les BULK_BATCH_SIZE commandes ou BULK_BATCH_DELAY secondes
+BULK_BATCH_SIZE = int(os.environ.get("OPTIPICK_BULK_BATCH_SIZE", 2000))
+BULK_BATCH_DELAY = float(os.environ.get("OPTIPICK_BULK_BATCH_DELAY", 0.25))
+# Pagination de GET /api/orders (limit par défaut et maximale)
+ORDERS_PAGE_SIZE = int(os.environ.get("OPTIPICK_ORDERS_PAGE_SIZE", 1000))
+ORDERS_MAX_PAGE_SIZE = int(os.environ.get("OPTIPICK_ORDERS_MAX_PAGE_SIZE", 10000))
+ORDER_FIELDS = ("id", "received_time", "deadline", "priority", "items", "agent_id")
+# Méthodes d'allocation acceptées par ?alloc= (les solveurs MiniZinc acceptés : KNOWN_SOLVERS)
+ALLOC_METHODS = ("first_fit", "minizinc", *GREEDY_ALLOCATORS)
+# Tournées des pistes d'animation (/api/tracks) : "nearest" (plus proche voisin + 2-opt) ou "ortools"
+# (1 s par agent) ; calculées une fois par résultat, dans le job de calcul
+TRACK_ROUTE_SOLVER = os.environ.get("OPTIPICK_TRACK_ROUTE_SOLVER", "nearest")
 
 app = Flask(__name__, template_folder="templates", static_folder="static")
+jobs = JobManager(max_workers=JOB_WORKERS)
+broadcaster = Broadcaster(max_subscribers=MAX_STREAMS)
+# Corps JSON sérialisés/compressés par ETag ; _BOOT_ID distingue les ETags d'un redémarrage à l'autre
+encoded_bodies = EncodedBodyCache()
+_BOOT_ID = f"{time.time_ns():x}"
+
+
+# Version du jeu de données : incrémentée à chaque POST de commande et à chaque nouvel instantané
+# de data/ (fichier modifié). Les résultats sont mémorisés par (version, allocateur, solveur) :
+# un poll de /api/stats ne relit ni ne recalcule rien tant que la version ne change pas.
+DATA_FILES = ("warehouse.json", "products.json", "agents.json", "orders.json")
+# Intervalle de surveillance des fichiers de data/ (secondes)
+DATA_POLL_INTERVAL = float(os.environ.get("OPTIPICK_DATA_POLL_INTERVAL", 1.0))
+_dataset_version = 0
+_result_cache: dict = {}
+# Dernier résultat sans erreur par (allocateur, solveur), rendu aux clients pendant un recalcul
+_last_good: dict = {}
+# Job de recalcul en attente (pas encore démarré) par (allocateur, solveur) : jamais plus d'un
+_pending_jobs: dict = {}
+_cache_lock = threading.Lock()
+
+
+def _build_dataset(raw: dict) -> dict:
+    """Modèle et projections construits une fois par instantané (partagés en lecture seule par les requêtes)."""
+    from main import parse_warehouse, parse_products
+    products = raw["products.json"] if isinstance(raw["products.json"], list) else []
+    return {
+        "warehouse": parse_warehouse(raw["warehouse.json"]),
+        "products_by_id": parse_products(products),
+        "products_view": [
+            {"id": p["id"], "name": p.get("name", p["id"]), "location": p.get("location", [0, 0])} for p in products
+        ],
+    }
+
+
+def _on_dataset_change(old: DatasetSnapshot, new: DatasetSnapshot) -> None:
+    """Nouvel instantané de data/ : nouvelle version (orders.json modifié : les commandes en mémoire sont relues)."""
+    with _cache_lock:
+        if new.mtimes["orders.json"] != old.mtimes["orders.json"]:
+            orders_store.reset(_base_orders(new))
+        _bump_version_locked()
+
+
+dataset = DatasetStore(
+    DATA_DIR, DATA_FILES, build=_build_dataset,
+    defaults={"warehouse.json": [], "products.json": [], "agents.json": {}, "orders.json": {}},
+    poll_interval=DATA_POLL_INTERVAL,
+)
+dataset.add_listener(_on_dataset_change)
+
+
+def _base_orders(snapshot: DatasetSnapshot) -> list:
+    orders = snapshot.raw["orders.json"]
+    return orders if isinstance(orders, list) else []
+
 
 # Commandes en mémoire (base = fichier, POST ajoute ici sans écraser data/orders.json)
-_orders_in_memory: list | None = None
+orders_store = OrderStore(_base_orders(dataset.snapshot))
 
 
-def _load_json(name: str):
-    p = DATA_DIR / name
-    if not p.exists():
-        return {} if "orders" in name or "agents" in name else []
-    with open(p, "r", encoding="utf-8") as f:
-        return json.load(f)
+def _get_orders_raw():
+    return orders_store.snapshot.orders
 
 
-def _get_warehouse():
-    return _load_json("warehouse.json")
+def _bump_version_locked() -> int:
+    """Nouvelle version du jeu de données (sous _cache_lock) ; les résultats des versions précédentes sont oubliés."""
+    global _dataset_version
+    _dataset_version += 1
+    _result_cache.clear()
+    return _dataset_version
 
 
-def _get_products():
-    return _load_json("products.json")
+def _current_version() -> int:
+    """Version courante (les changements de fichiers sont détectés par le thread de surveillance de dataset)."""
+    return _dataset_version
 
 
-def _get_agents_raw():
-    return _load_json("agents.json")
+def _result_key(version: int, alloc_method: str, solver_name: str) -> tuple:
+    return (version, alloc_method, solver_name if alloc_method == "minizinc" else None)
 
 
-def _get_orders_raw():
-    global _orders_in_memory
-    if _orders_in_memory is not None:
-        return _orders_in_memory
-    _orders_in_memory = _load_json("orders.json")
-    if not isinstance(_orders_in_memory, list):
-        _orders_in_memory = []
-    return _orders_in_memory
+def _stream_payload(data: dict) -> dict:
+    """Ce que reçoivent les clients du flux SSE (sans la liste des commandes)."""
+    return {
+        "version": data.get("version"),
+        "stats": data["stats"],
+        "agent_positions": data["agent_positions"],
+        "agent_routes": data.get("agent_routes", {}),
+        "assignment": data["assignment"],
+        "orders_metrics": data.get("orders_metrics", []),
+        "stale": data.get("stale", False),
+        "error": data.get("error"),
+    }
+
+
+def _compute_and_store(topic: tuple) -> dict:
+    """
+    Job : calcule le résultat de topic = (allocateur, solveur) pour la version courante au démarrage
+    du job (version et commandes lues ensemble), le mémorise (sauf erreur) et le publie aux flux SSE ;
+    les solutions intermédiaires de MiniZinc sont publiées au fil de l'eau.
+    """
+    alloc_method, solver_name = topic
+    with _cache_lock:
+        _pending_jobs.pop(topic, None)
+        version = _dataset_version
+        key = (version, *topic)
+        cached = _result_cache.get(key)
+        orders_raw = orders_store.snapshot.orders
+        snapshot = dataset.snapshot
+    if cached is not None:
+        return cached
+
+    def publish_incumbent(partial: dict) -> None:
+        if version == _dataset_version:
+            broadcaster.publish(topic, "incumbent", dict(_stream_payload(partial), version=version), event_id=version)
+
+    data = _compute_assignment_and_stats(
+        alloc_method=alloc_method, solver_name=solver_name or "cbc", on_incumbent=publish_incumbent,
+        orders_raw=orders_raw, snapshot=snapshot,
+    )
+    data["version"] = version
+    if "error" not in data:
+        with _cache_lock:
+            if version == _dataset_version:
+                _result_cache[key] = data
+            previous = _last_good.get(topic)
+            newest = previous is None or previous["version"] <= version
+            if newest:
+                _last_good[topic] = data
+        if newest:
+            broadcaster.publish(topic, "update", _stream_payload(data), event_id=version)
+        # Après la publication : les stats n'attendent pas les tournées ; /api/tracks répond "pending" d'ici là
+        data["tracks"] = _build_tracks(data, snapshot)
+    return data
+
+
+def _build_tracks(data: dict, snapshot: DatasetSnapshot) -> dict:
+    """Pistes d'animation encodées d'un résultat (construites une seule fois, dans son job de calcul)."""
+    from main import parse_agents, parse_orders
+    from src.tracks import build_tracks
+    try:
+        tracks = build_tracks(
+            data["assignment"], parse_orders(data["orders"]), parse_agents(deepcopy(snapshot.raw["agents.json"])),
+            snapshot.derived["products_by_id"], snapshot.derived["warehouse"], route_solver=TRACK_ROUTE_SOLVER,
+        )
+    except Exception as e:
+        return {"error": f"Pistes non calculées : {e}"}
+    return tracks.to_dict()
+
+
+def _submit_job(alloc_method: str, solver_name: str):
+    """
+    Lance le recalcul de (allocateur, solveur), ou rejoint celui qui attend déjà son tour : au plus un job
+    en attente par sujet, qui calculera la version courante à son démarrage. Sous un flux continu de
+    commandes, les versions intermédiaires sont sautées au lieu de s'empiler. Retourne (job, clé).
+    """
+    with _cache_lock:
+        key = _result_key(_dataset_version, alloc_method, solver_name)
+        topic = key[1:]
+        job = _pending_jobs.get(topic)
+        if job is None or job.cancel_requested:
+            job, _ = jobs.submit(key, _compute_and_store, topic)
+            if job.status == QUEUED:
+                _pending_jobs[topic] = job
+    return job, key
+
+
+def _ingest_batch(batch: list) -> None:
+    """Lot de commandes validées : une seule publication, une nouvelle version, un recalcul par allocateur utilisé."""
+    with _cache_lock:
+        # Ajout et version sous le même verrou : un job lit toujours des commandes cohérentes avec sa version
+        orders_store.append_many(batch)
+        _bump_version_locked()
+        topics = list(_last_good)
+    for alloc_method, solver_name in topics:
+        _submit_job(alloc_method, solver_name or "cbc")
+
+
+order_batcher = MicroBatcher(_ingest_batch, max_items=BULK_BATCH_SIZE, max_delay=BULK_BATCH_DELAY)
+
+
+def _lookup_result(alloc_method: str, solver_name: str):
+    """
+    (résultat, job) sans attendre : résultat mémorisé de la version courante, sinon un job est lancé et
+    on rend le dernier bon résultat (marqué stale, avec job_id) ; (None, job) s'il n'y en a pas encore.
+    """
+    key = _result_key(_current_version(), alloc_method, solver_name)
+    with _cache_lock:
+        data = _result_cache.get(key)
+        previous = _last_good.get(key[1:])
+    if data is not None:
+        return data, None
+    job, _ = _submit_job(alloc_method, solver_name)
+    if previous is not None:
+        return dict(previous, stale=True, job_id=job.id), job
+    return None, job
+
+
+# Attente maximale d'un premier résultat (au-delà, réponse vide avec job_id)
+RESULT_WAIT_TIMEOUT = MINIZINC_TIME_LIMIT + 30
+
+
+def _job_outcome(job) -> dict:
+    if job.status == DONE:
+        return job.result
+    return dict(_empty_result(job.error or "Calcul en cours"), version=job.key[0], job_id=job.id)
+
+
+def _latest_result(alloc_method: str = "first_fit", solver_name: str = "cbc"):
+    """Comme _lookup_result, mais au tout premier appel d'un allocateur on attend le job."""
+    data, job = _lookup_result(alloc_method, solver_name)
+    if data is not None:
+        return data
+    return _job_outcome(jobs.wait(job.id, timeout=RESULT_WAIT_TIMEOUT))
+
+
+def _empty_result(error: str) -> dict:
+    return {
+        "assignment": {},
+        "stats": {"n_orders": 0, "n_assigned": 0, "n_unassigned": 0, "by_type": {}, "total_distance": 0, "total_time_min": 0, "total_cost_euros": 0},
+        "agent_positions": {},
+        "agent_routes": {},
+        "orders_metrics": [],
+        "orders": [],
+        "error": error,
+    }
 
 
-def _compute_assignment_and_stats(alloc_method: str = "first_fit", solver_name: str = "cbc"):
-    """Charge orders/agents, enrichit, puis allocation First-Fit ou MiniZinc (.mzn). Retourne assignment + stats + routes."""
+def _compute_assignment_and_stats(
+    alloc_method: str = "first_fit", solver_name: str = "cbc", on_incumbent=None, orders_raw=None, snapshot=None,
+):
+    """
+    Charge orders/agents, enrichit, puis allocation First-Fit ou MiniZinc (.mzn). Retourne assignment + stats + routes.
+    on_incumbent(résultat) : appelé pour chaque solution intermédiaire de MiniZinc.
+    orders_raw, snapshot : commandes et instantané de data/ à utiliser (par défaut, les courants).
+    """
     try:
         from main import (
-            load_json,
-            parse_warehouse,
-            parse_products,
             parse_agents,
             parse_orders,
             enrich_orders,
@@ -73,141 +300,359 @@ def _compute_assignment_and_stats(alloc_method: str = "first_fit", solver_name:
             allocate_first_fit,
             apply_assignment,
         )
-        wh_data = load_json(DATA_DIR / "warehouse.json")
-        pr_data = load_json(DATA_DIR / "products.json")
-        ag_data = _get_agents_raw()
-        or_data = _get_orders_raw()
-        warehouse = parse_warehouse(wh_data)
-        products_by_id = parse_products(pr_data)
-        agents = parse_agents(ag_data)
-        orders = parse_orders(or_data if isinstance(or_data, list) else [])
+        from src.allocation import GREEDY_ALLOCATORS, allocate_regret
+        snapshot = snapshot or dataset.snapshot
+        if not snapshot.derived:
+            raise RuntimeError(f"Données illisibles : {dataset.last_error}")
+        # Entrepôt et produits : instantané partagé (lecture seule) ; agents et commandes sont modifiés par l'allocation
+        warehouse = snapshot.derived["warehouse"]
+        products_by_id = snapshot.derived["products_by_id"]
+        ag_data = snapshot.raw["agents.json"]
+        or_data = orders_raw if orders_raw is not None else _get_orders_raw()
+        orders = parse_orders(or_data)
         enrich_orders(orders, products_by_id)
         orders_sorted = sort_orders_by_received_time(orders)
         agents_fresh = parse_agents(deepcopy(ag_data))
         if alloc_method == "minizinc":
             try:
-                from src.minizinc_solver import allocate_with_minizinc
-                assignment = allocate_with_minizinc(
-                    orders_sorted, agents_fresh, products_by_id, warehouse, solver_name=solver_name
-                )
+                # Presolve : le solveur ne voit que les composantes réduites de l'instance
+                if on_incumbent is None:
+                    from src.presolve import allocate_with_presolve
+                    assignment, _ = allocate_with_presolve(
+                        orders_sorted, agents_fresh, products_by_id, warehouse, solver="minizinc",
+                        time_limit_seconds=MINIZINC_TIME_LIMIT, solver_name=solver_name,
+                    )
+                else:
+                    import asyncio
+                    from src.presolve import allocate_with_presolve_async
+
+                    def on_solution(incumbent, objective):
+                        on_incumbent(_summarize_assignment(incumbent, warehouse, orders_sorted, agents_fresh))
+
+                    assignment, _ = asyncio.run(allocate_with_presolve_async(
+                        orders_sorted, agents_fresh, products_by_id, warehouse, solver_name=solver_name,
+                        time_limit_seconds=MINIZINC_TIME_LIMIT, on_solution=on_solution,
+                    ))
                 apply_assignment(assignment, orders_sorted, agents_fresh)
-            except Exception as mz_err:
-                assignment = allocate_first_fit(orders_sorted, agents_fresh)
+            except Exception:
+                # Repli : regret-k (rapide, respecte les restrictions des agents)
+                agents_fresh = parse_agents(deepcopy(ag_data))
+                assignment = allocate_regret(orders_sorted, agents_fresh, products_by_id, warehouse)
+        elif alloc_method in GREEDY_ALLOCATORS:
+            assignment = GREEDY_ALLOCATORS[alloc_method](orders_sorted, agents_fresh, products_by_id, warehouse)
         else:
             assignment = allocate_first_fit(orders_sorted, agents_fresh)
-        # Stats
-        n_orders = len(orders)
-        n_assigned = sum(1 for a in assignment.values() if a is not None)
-        by_type = {}
-        for agent in agents_fresh:
-            t = agent.type
-            if t not in by_type:
-                by_type[t] = {"count": 0, "orders": 0}
-            by_type[t]["count"] += 1
-        for oid, aid in assignment.items():
-            if aid is None:
-                continue
-            for agent in agents_fresh:
-                if agent.id == aid:
-                    by_type[agent.type]["orders"] += 1
-                    break
-        # Tournées des agents pour l'animation : [entrée, loc1, loc2, ...] pour chaque agent
-        entry = warehouse.entry_point
-        agent_positions = {}
-        agent_routes = {}
-        orders_by_agent = {}
-        for oid, aid in assignment.items():
-            if aid is None:
-                continue
-            orders_by_agent.setdefault(aid, [])
-            orders_by_agent[aid].append(oid)
-        orders_by_id = {o.id: o for o in orders_sorted}
-        for agent in agents_fresh:
-            aid = agent.id
-            pos = {"x": entry.x, "y": entry.y}
-            route = [{"x": entry.x, "y": entry.y}]
-            if aid in orders_by_agent and orders_by_agent[aid]:
-                for order_id in orders_by_agent[aid]:
-                    order = orders_by_id.get(order_id)
-                    if order and getattr(order, "unique_locations", None):
-                        for loc in order.unique_locations:
-                            route.append({"x": loc.x, "y": loc.y})
-            if agent.type in ("robot", "cart"):
-                floor_y = route[0]["y"]
-                route = [p for p in route if p["y"] == floor_y]
-            agent_positions[aid] = route[1] if len(route) > 1 else {"x": entry.x, "y": entry.y}
-            agent_routes[aid] = route
-        for agent in agents_fresh:
-            if agent.id not in agent_routes:
-                agent_routes[agent.id] = [{"x": entry.x, "y": entry.y}]
-        # Performance et coût par commande
-        def _order_distance(ord_obj):
-            return sum(warehouse.entry_point.manhattan(loc) for loc in getattr(ord_obj, "unique_locations", []) or [])
-        orders_by_id = {o.id: o for o in orders_sorted}
-        agents_by_id = {a.id: a for a in agents_fresh}
-        orders_metrics = []
-        total_dist = 0
-        total_time_sec = 0.0
-        total_cost = 0.0
-        for oid, aid in assignment.items():
-            order = orders_by_id.get(oid)
-            agent = agents_by_id.get(aid) if aid else None
-            dist = _order_distance(order) if order else 0
-            time_sec = 0.0
-            cost_euros = 0.0
-            if order and agent:
-                n_items = sum(it.quantity for it in order.items)
-                travel_sec = dist / agent.speed if agent.speed > 0 else 0
-                picking_sec = n_items * 30
-                time_sec = travel_sec + picking_sec
-                cost_euros = round(time_sec * (agent.cost_per_hour / 3600.0), 2)
-                total_dist += dist
-                total_time_sec += time_sec
-                total_cost += cost_euros
-            orders_metrics.append({
-                "order_id": oid,
-                "agent_id": aid,
-                "distance": dist,
-                "time_sec": round(time_sec, 1),
-                "time_min": round(time_sec / 60.0, 2),
-                "cost_euros": cost_euros,
-            })
-        return {
-            "assignment": assignment,
-            "stats": {
-                "n_orders": n_orders,
-                "n_assigned": n_assigned,
-                "n_unassigned": n_orders - n_assigned,
-                "by_type": by_type,
-                "total_distance": total_dist,
-                "total_time_min": round(total_time_sec / 60.0, 2),
-                "total_cost_euros": round(total_cost, 2),
-            },
-            "agent_positions": agent_positions,
-            "agent_routes": agent_routes,
-            "orders_metrics": orders_metrics,
-            "orders": [
-                {
-                    "id": o.id,
-                    "received_time": o.received_time,
-                    "deadline": o.deadline,
-                    "priority": o.priority,
-                    "items": [{"product_id": it.product_id, "quantity": it.quantity} for it in o.items],
-                }
-                for o in orders_sorted
-            ],
-        }
+        return _summarize_assignment(assignment, warehouse, orders_sorted, agents_fresh)
     except Exception as e:
+        return _empty_result(str(e))
+
+
+def _summarize_assignment(assignment, warehouse, orders_sorted, agents_fresh) -> dict:
+    """Stats, tournées et métriques par commande d'une affectation (finale ou solution intermédiaire)."""
+    n_orders = len(orders_sorted)
+    n_assigned = sum(1 for a in assignment.values() if a is not None)
+    by_type = {}
+    for agent in agents_fresh:
+        t = agent.type
+        if t not in by_type:
+            by_type[t] = {"count": 0, "orders": 0}
+        by_type[t]["count"] += 1
+    for oid, aid in assignment.items():
+        if aid is None:
+            continue
+        for agent in agents_fresh:
+            if agent.id == aid:
+                by_type[agent.type]["orders"] += 1
+                break
+    # Tournées des agents pour l'animation : [entrée, loc1, loc2, ...] pour chaque agent
+    entry = warehouse.entry_point
+    agent_positions = {}
+    agent_routes = {}
+    orders_by_agent = {}
+    for oid, aid in assignment.items():
+        if aid is None:
+            continue
+        orders_by_agent.setdefault(aid, [])
+        orders_by_agent[aid].append(oid)
+    orders_by_id = {o.id: o for o in orders_sorted}
+    for agent in agents_fresh:
+        aid = agent.id
+        pos = {"x": entry.x, "y": entry.y}
+        route = [{"x": entry.x, "y": entry.y}]
+        if aid in orders_by_agent and orders_by_agent[aid]:
+            for order_id in orders_by_agent[aid]:
+                order = orders_by_id.get(order_id)
+                if order and getattr(order, "unique_locations", None):
+                    for loc in order.unique_locations:
+                        route.append({"x": loc.x, "y": loc.y})
+        if agent.type in ("robot", "cart"):
+            floor_y = route[0]["y"]
+            route = [p for p in route if p["y"] == floor_y]
+        agent_positions[aid] = route[1] if len(route) > 1 else {"x": entry.x, "y": entry.y}
+        agent_routes[aid] = route
+    for agent in agents_fresh:
+        if agent.id not in agent_routes:
+            agent_routes[agent.id] = [{"x": entry.x, "y": entry.y}]
+    # Performance et coût par commande
+    def _order_distance(ord_obj):
+        return sum(warehouse.entry_point.manhattan(loc) for loc in getattr(ord_obj, "unique_locations", []) or [])
+    orders_by_id = {o.id: o for o in orders_sorted}
+    agents_by_id = {a.id: a for a in agents_fresh}
+    orders_metrics = []
+    total_dist = 0
+    total_time_sec = 0.0
+    total_cost = 0.0
+    for oid, aid in assignment.items():
+        order = orders_by_id.get(oid)
+        agent = agents_by_id.get(aid) if aid else None
+        dist = _order_distance(order) if order else 0
+        time_sec = 0.0
+        cost_euros = 0.0
+        if order and agent:
+            n_items = sum(it.quantity for it in order.items)
+            travel_sec = dist / agent.speed if agent.speed > 0 else 0
+            picking_sec = n_items * 30
+            time_sec = travel_sec + picking_sec
+            cost_euros = round(time_sec * (agent.cost_per_hour / 3600.0), 2)
+            total_dist += dist
+            total_time_sec += time_sec
+            total_cost += cost_euros
+        orders_metrics.append({
+            "order_id": oid,
+            "agent_id": aid,
+            "distance": dist,
+            "time_sec": round(time_sec, 1),
+            "time_min": round(time_sec / 60.0, 2),
+            "cost_euros": cost_euros,
+        })
+    return {
+        "assignment": assignment,
+        "stats": {
+            "n_orders": n_orders,
+            "n_assigned": n_assigned,
+            "n_unassigned": n_orders - n_assigned,
+            "by_type": by_type,
+            "total_distance": total_dist,
+            "total_time_min": round(total_time_sec / 60.0, 2),
+            "total_cost_euros": round(total_cost, 2),
+        },
+        "agent_positions": agent_positions,
+        "agent_routes": agent_routes,
+        "orders_metrics": orders_metrics,
+        "orders": [
+            {
+                "id": o.id,
+                "received_time": o.received_time,
+                "deadline": o.deadline,
+                "priority": o.priority,
+                "items": [{"product_id": it.product_id, "quantity": it.quantity} for it in o.items],
+            }
+            for o in orders_sorted
+        ],
+    }
+
+
+def _cached_json(etag: str, payload):
+    """
+    Réponse JSON conditionnelle : 304 si le client a déjà etag (If-None-Match), sinon le corps
+    mémorisé pour etag, compressé si le client l'accepte. payload() n'est appelé qu'au premier encodage.
+    """
+    status, headers, body = conditional_json(
+        etag, payload, encoded_bodies,
+        request.headers.get("If-None-Match"), request.headers.get("Accept-Encoding", ""),
+    )
+    return Response(body, status=status, mimetype="application/json", headers=headers)
+
+
+def _dataset_etag(name: str) -> str:
+    return f'W/"{_BOOT_ID}-{name}-d{dataset.snapshot.version}"'
+
+
+def _result_etag(name: str, data: dict, alloc: str, solver: str, *extra) -> str:
+    """ETag d'une réponse dérivée d'un résultat : version calculée, allocateur, job en cours (réponse stale)."""
+    parts = [_BOOT_ID, name, str(data["version"]), alloc, solver if alloc == "minizinc" else "",
+             data.get("job_id") or "", *map(str, extra)]
+    return 'W/"' + "-".join(parts) + '"'
+
+
+# Les fonctions ci-dessous ne dépendent pas de Flask : elles servent aussi le mode ASGI (asgi.py).
+# Les réponses conditionnelles rendent (etag, payload()) ; les autres (payload, statut HTTP).
+
+def _dataset_response(name: str):
+    snapshot = dataset.snapshot
+    if name == "products":
+        return _dataset_etag(name), lambda: snapshot.derived.get("products_view", [])
+    return _dataset_etag(name), lambda: snapshot.raw[f"{name}.json"]
+
+
+def _alloc_params(args):
+    """(méthode d'allocation, solveur MiniZinc) d'une requête ; ValueError si inconnus."""
+    alloc = args.get("alloc", "first_fit")
+    solver = args.get("solver", "cbc")
+    if alloc not in ALLOC_METHODS:
+        raise ValueError(f"Méthode d'allocation inconnue : {alloc} (disponibles : {', '.join(ALLOC_METHODS)})")
+    if solver not in KNOWN_SOLVERS:
+        raise ValueError(f"Solveur inconnu : {solver} (disponibles : {', '.join(KNOWN_SOLVERS)})")
+    return alloc, solver
+
+
+def _page_params(args):
+    """(offset, limit, champs) de GET /api/orders ; ValueError si invalides."""
+    try:
+        offset = int(args.get("offset", 0))
+        limit = int(args.get("limit", ORDERS_PAGE_SIZE))
+    except (TypeError, ValueError):
+        raise ValueError("offset et limit doivent être des entiers") from None
+    if offset < 0 or limit < 1:
+        raise ValueError("offset >= 0 et limit >= 1 attendus")
+    fields = tuple(f for f in args.get("fields", "").split(",") if f)
+    unknown = [f for f in fields if f not in ORDER_FIELDS]
+    if unknown:
+        raise ValueError(f"Champs inconnus : {', '.join(unknown)} (disponibles : {', '.join(ORDER_FIELDS)})")
+    return offset, min(limit, ORDERS_MAX_PAGE_SIZE), fields
+
+
+def _orders_response(data: dict, alloc: str, solver: str, offset: int, limit: int, fields: tuple):
+    def payload() -> dict:
+        page = data["orders"][offset:offset + limit]
+        assignment = data["assignment"]
+        if fields:
+            orders = [
+                {f: (assignment.get(o["id"]) if f == "agent_id" else o[f]) for f in fields} for o in page
+            ]
+        else:
+            orders = page
         return {
-            "assignment": {},
-            "stats": {"n_orders": 0, "n_assigned": 0, "n_unassigned": 0, "by_type": {}, "total_distance": 0, "total_time_min": 0, "total_cost_euros": 0},
-            "agent_positions": {},
-            "agent_routes": {},
-            "orders_metrics": [],
-            "orders": [],
-            "error": str(e),
+            "orders": orders,
+            "assignment": {o["id"]: assignment.get(o["id"]) for o in page},
+            "total": len(data["orders"]),
+            "offset": offset,
+            "limit": limit,
+            "version": data["version"],
+            "stale": data.get("stale", False),
+            "job_id": data.get("job_id"),
+            "error": data.get("error"),
         }
 
+    return _result_etag("orders", data, alloc, solver, offset, limit, ",".join(fields)), payload
+
+
+def _stats_response(data: dict, alloc: str, solver: str):
+    return _result_etag("stats", data, alloc, solver), lambda: {
+        "version": data["version"],
+        "stats": data["stats"],
+        "agent_positions": data["agent_positions"],
+        "agent_routes": data.get("agent_routes", {}),
+        "assignment": data["assignment"],
+        "orders_metrics": data.get("orders_metrics", []),
+        "alloc_method": alloc,
+        "stale": data.get("stale", False),
+        "job_id": data.get("job_id"),
+        "error": data.get("error"),
+    }
+
+
+def _assignment_response(data: dict, alloc: str, solver: str):
+    return _result_etag("assignment", data, alloc, solver), lambda: {
+        "assignment": data["assignment"], "agent_positions": data["agent_positions"],
+        "version": data["version"], "stale": data.get("stale", False),
+        "job_id": data.get("job_id"), "error": data.get("error"),
+    }
+
+
+def _tracks_response(data: dict, alloc: str, solver: str):
+    """Pistes déjà encodées par le job du résultat ; pending=True tant qu'il ne les a pas construites."""
+    tracks = data.get("tracks")
+
+    def payload() -> dict:
+        meta = {"version": data["version"], "stale": data.get("stale", False), "job_id": data.get("job_id")}
+        if tracks is None:
+            return dict(meta, pending="error" not in data, error=data.get("error"))
+        return dict(tracks, **meta, error=tracks.get("error") or data.get("error"))
+
+    return _result_etag("tracks", data, alloc, solver, "pending" if tracks is None else "ready"), payload
+
+
+def _initial_stream_frame(sub, data: dict) -> None:
+    """État courant poussé à un nouvel abonné SSE, sauf si un job vient de publier (état au moins aussi récent)."""
+    if not sub.pending:
+        sub.push(format_sse(json.dumps(_stream_payload(data), separators=(",", ":")), "update", data["version"]))
+
+
+def _add_order(body: dict):
+    # Même validation que l'ingestion en masse : les deux chemins acceptent les mêmes commandes
+    try:
+        alloc, solver = _alloc_params(body)
+        order = validate_order(body, dataset.snapshot.derived.get("products_by_id", {}))
+    except ValueError as e:
+        return {"ok": False, "error": str(e)}, 400
+    # Identifiant attribué et commande publiée atomiquement par le store (POST concurrents sûrs)
+    with _cache_lock:
+        new_order, _ = orders_store.append(order)
+        _bump_version_locked()
+    new_id = new_order["id"]
+    # Réponse immédiate : le recalcul part en job, le client garde la dernière affectation valide
+    job, key = _submit_job(alloc, solver)
+    response = {"ok": True, "order_id": new_id, "version": key[0], "job_id": job.id, "stale": True}
+    with _cache_lock:
+        previous = _last_good.get(key[1:])
+    if previous is not None:
+        response.update({
+            "stats": previous["stats"],
+            "assignment": previous["assignment"],
+            "agent_positions": previous["agent_positions"],
+            "agent_routes": previous.get("agent_routes", {}),
+            "orders_metrics": previous.get("orders_metrics", []),
+        })
+    return response, 202
+
+
+def _add_orders_bulk(data: bytes):
+    products_by_id = dataset.snapshot.derived.get("products_by_id", {})
+    accepted, rejected = [], []
+    for line_no, line in enumerate(data.splitlines(), 1):
+        if not line.strip():
+            continue
+        try:
+            accepted.append(validate_order(json.loads(line), products_by_id))
+        except ValueError as e:  # json.JSONDecodeError en hérite
+            rejected.append({"line": line_no, "error": str(e)})
+    pending = order_batcher.add(accepted)
+    if pending is None:
+        return {"ok": False, "error": "File d'ingestion pleine, réessayez plus tard"}, 503
+    return {"ok": not rejected, "accepted": len(accepted), "rejected": rejected, "pending": pending}, 202
+
+
+def _submit_job_request(body: dict):
+    try:
+        alloc, solver = _alloc_params(body)
+    except ValueError as e:
+        return {"error": str(e)}, 400
+    job, _ = _submit_job(alloc, solver)
+    return job.to_dict(), 202
+
+
+def _job_status(job_id: str):
+    job = jobs.get(job_id)
+    if job is None:
+        return {"error": f"Job inconnu : {job_id}"}, 404
+    return job.to_dict(), 200
+
+
+def _job_result(job_id: str):
+    job = jobs.get(job_id)
+    if job is None:
+        return {"error": f"Job inconnu : {job_id}"}, 404
+    if job.status != DONE:
+        return job.to_dict(), 202 if job.status in (QUEUED, RUNNING) else 409
+    return dict(job.to_dict(), result=job.result), 200
+
+
+def _cancel_job(job_id: str):
+    if not jobs.cancel(job_id):
+        return {"ok": False, "error": f"Job inconnu ou déjà terminé : {job_id}"}, 404
+    return {"ok": True, **jobs.get(job_id).to_dict()}, 200
+
 
 @app.route("/")
 def index():
@@ -216,93 +661,133 @@ def index():
 
 @app.route("/api/warehouse")
 def api_warehouse():
-    return jsonify(_get_warehouse())
+    return _cached_json(*_dataset_response("warehouse"))
 
 
 @app.route("/api/products")
 def api_products():
-    products = _get_products()
-    if isinstance(products, list):
-        return jsonify([{"id": p["id"], "name": p.get("name", p["id"]), "location": p.get("location", [0, 0])} for p in products])
-    return jsonify([])
+    return _cached_json(*_dataset_response("products"))
 
 
 @app.route("/api/agents")
 def api_agents():
-    return jsonify(_get_agents_raw())
-
-
-def _alloc_params():
-    alloc = request.args.get("alloc", "first_fit")
-    solver = request.args.get("solver", "cbc")
-    return alloc, solver
+    return _cached_json(*_dataset_response("agents"))
 
 
 @app.route("/api/orders")
 def api_orders():
-    alloc, solver = _alloc_params()
-    data = _compute_assignment_and_stats(alloc_method=alloc, solver_name=solver)
-    return jsonify({"orders": data["orders"], "assignment": data["assignment"], "error": data.get("error")})
+    """Commandes paginées (?offset=&limit=) et champs choisis (?fields=id,priority,agent_id)."""
+    try:
+        alloc, solver = _alloc_params(request.args)
+        offset, limit, fields = _page_params(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    data = _latest_result(alloc_method=alloc, solver_name=solver)
+    return _cached_json(*_orders_response(data, alloc, solver, offset, limit, fields))
 
 
 @app.route("/api/stats")
 def api_stats():
-    alloc, solver = _alloc_params()
-    data = _compute_assignment_and_stats(alloc_method=alloc, solver_name=solver)
-    return jsonify({
-        "stats": data["stats"],
-        "agent_positions": data["agent_positions"],
-        "agent_routes": data.get("agent_routes", {}),
-        "assignment": data["assignment"],
-        "orders_metrics": data.get("orders_metrics", []),
-        "alloc_method": alloc,
-        "error": data.get("error"),
-    })
+    try:
+        alloc, solver = _alloc_params(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    data = _latest_result(alloc_method=alloc, solver_name=solver)
+    return _cached_json(*_stats_response(data, alloc, solver))
 
 
 @app.route("/api/assignment")
 def api_assignment():
-    alloc, solver = _alloc_params()
-    data = _compute_assignment_and_stats(alloc_method=alloc, solver_name=solver)
-    return jsonify({"assignment": data["assignment"], "agent_positions": data["agent_positions"], "error": data.get("error")})
+    try:
+        alloc, solver = _alloc_params(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    data = _latest_result(alloc_method=alloc, solver_name=solver)
+    return _cached_json(*_assignment_response(data, alloc, solver))
+
+
+@app.route("/api/tracks")
+def api_tracks():
+    """Pistes d'animation précalculées (tournées TSP, vitesses réelles), en deltas dans des tableaux typés."""
+    try:
+        alloc, solver = _alloc_params(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    data = _latest_result(alloc_method=alloc, solver_name=solver)
+    return _cached_json(*_tracks_response(data, alloc, solver))
+
+
+@app.route("/api/stream")
+def api_stream():
+    """
+    Flux SSE : un événement "update" à chaque nouvelle version calculée (POST de commande, fichier de
+    data/ modifié) et "incumbent" pour chaque solution intermédiaire du solveur ; battement de cœur sinon.
+    """
+    try:
+        alloc, solver = _alloc_params(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    sub = broadcaster.subscribe(_result_key(0, alloc, solver)[1:])
+    if sub is None:
+        return jsonify({"error": "Trop de flux ouverts, réessayez plus tard"}), 503
+    # Abonné avant de lire l'état courant : aucune publication ne peut être manquée
+    _initial_stream_frame(sub, _latest_result(alloc_method=alloc, solver_name=solver))
+
+    def on_idle() -> None:
+        # Relance le calcul si la version a changé sans POST (ex. fichier de data/ modifié)
+        _lookup_result(alloc, solver)
+
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    return Response(broadcaster.stream(sub, STREAM_HEARTBEAT, on_idle), mimetype="text/event-stream", headers=headers)
 
 
 @app.route("/api/orders", methods=["POST"])
 def api_add_order():
     """Ajoute une commande (en mémoire). Body: { received_time, deadline, priority, items: [{ product_id, quantity }] }"""
-    global _orders_in_memory
-    body = request.get_json(force=True, silent=True) or {}
-    received_time = body.get("received_time", "12:00")
-    deadline = body.get("deadline", "18:00")
-    priority = body.get("priority", "standard")
-    items = body.get("items", [])
-    if not items:
-        return jsonify({"ok": False, "error": "Au moins un produit requis"}), 400
-    orders = _get_orders_raw()
-    if not isinstance(orders, list):
-        orders = []
-    new_id = f"Order_W{len(orders) + 1:03d}"
-    new_order = {
-        "id": new_id,
-        "received_time": received_time,
-        "deadline": deadline,
-        "priority": priority,
-        "items": [{"product_id": it.get("product_id"), "quantity": int(it.get("quantity", 1))} for it in items],
-    }
-    orders.append(new_order)
-    _orders_in_memory = orders
-    alloc = body.get("alloc", "first_fit")
-    solver = body.get("solver", "cbc")
-    data = _compute_assignment_and_stats(alloc_method=alloc, solver_name=solver)
-    return jsonify({
-        "ok": True,
-        "order_id": new_id,
-        "stats": data["stats"],
-        "assignment": data["assignment"],
-        "agent_positions": data["agent_positions"],
-        "agent_routes": data.get("agent_routes", {}),
-        "orders_metrics": data.get("orders_metrics", []),
-    })
+    payload, status = _add_order(request.get_json(force=True, silent=True) or {})
+    return jsonify(payload), status
+
+
+@app.route("/api/orders/bulk", methods=["POST"])
+def api_add_orders_bulk():
+    """
+    Ingestion en masse : corps NDJSON, une commande par ligne (même format que POST /api/orders).
+    Les commandes valides rejoignent le prochain lot (ids attribués au lot) ; les lignes invalides sont
+    rapportées avec leur numéro. 503 si la file d'attente est pleine.
+    """
+    payload, status = _add_orders_bulk(request.get_data())
+    return jsonify(payload), status
+
+
+@app.route("/api/orders/bulk", methods=["GET"])
+def api_bulk_status():
+    return jsonify(order_batcher.stats())
+
+
+@app.route("/api/jobs", methods=["POST"])
+def api_submit_job():
+    """Lance le calcul de l'affectation. Body: { alloc, solver }. Un calcul identique en cours est partagé."""
+    payload, status = _submit_job_request(request.get_json(force=True, silent=True) or {})
+    return jsonify(payload), status
+
+
+@app.route("/api/jobs/<job_id>")
+def api_job_status(job_id: str):
+    payload, status = _job_status(job_id)
+    return jsonify(payload), status
+
+
+@app.route("/api/jobs/<job_id>/result")
+def api_job_result(job_id: str):
+    """200 avec le résultat si le job est terminé ; 202 s'il est en attente ou en cours."""
+    payload, status = _job_result(job_id)
+    return jsonify(payload), status
+
+
+@app.route("/api/jobs/<job_id>", methods=["DELETE"])
+def api_cancel_job(job_id: str):
+    payload, status = _cancel_job(job_id)
+    return jsonify(payload), status
 
 
 if __name__ == "__main__":
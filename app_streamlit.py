@@ -5,10 +5,17 @@ Même logique que app.py (Flask + JS) : données, allocation First-Fit ou MiniZi
 Lancer :
   streamlit run app_streamlit.py
   (ou depuis le répertoire optipick : streamlit run app_streamlit.py --server.port 8501)
+
+Streamlit réexécute tout le script à chaque interaction ; ce qui coûte est mis en cache :
+  - données JSON parsées et index : st.cache_resource, invalidé par les mtimes de data/ ;
+  - allocation (MiniZinc compris) : st.cache_data, clé = empreinte des commandes, allocateur, solveur ;
+  - carte : une image PNG par résultat ; tableau des commandes paginé.
 """
 from __future__ import annotations
 
+import hashlib
 import json
+import os
 import sys
 from pathlib import Path
 from copy import deepcopy
@@ -18,6 +25,9 @@ sys.path.insert(0, str(Path(__file__).parent))
 import streamlit as st
 
 DATA_DIR = Path(__file__).parent / "data"
+# Budget MiniZinc par rafraîchissement : au-delà, on garde la meilleure solution trouvée
+MINIZINC_TIME_LIMIT = float(os.environ.get("OPTIPICK_MINIZINC_TIME_LIMIT", 5.0))
+DATA_FILES = ("warehouse.json", "products.json", "agents.json", "orders.json")
 
 
 def _load_json(name: str):
@@ -28,13 +38,54 @@ def _load_json(name: str):
         return json.load(f)
 
 
-def _compute_assignment_and_stats(orders_list: list, alloc_method: str = "first_fit", solver_name: str = "cbc"):
-    """Même logique que app.py : allocation + stats + routes + metrics par commande."""
+def _data_mtimes() -> tuple:
+    mtimes = []
+    for name in DATA_FILES:
+        try:
+            mtimes.append((name, (DATA_DIR / name).stat().st_mtime_ns))
+        except OSError:
+            mtimes.append((name, None))
+    return tuple(mtimes)
+
+
+@st.cache_resource(max_entries=2)
+def _load_dataset(data_mtimes: tuple) -> dict:
+    """Données JSON parsées et index, partagés (lecture seule) par toutes les sessions ; data_mtimes sert de clé."""
+    from main import parse_warehouse, parse_products
+    warehouse_data = _load_json("warehouse.json")
+    products = _load_json("products.json")
+    products = products if isinstance(products, list) else []
+    return {
+        "warehouse_data": warehouse_data,
+        "warehouse": parse_warehouse(warehouse_data),
+        "products_by_id": parse_products(products),
+        "product_ids": [p.get("id") for p in products if p.get("id")],
+        "product_names": {p.get("id"): p.get("name", p.get("id")) for p in products if p.get("id")},
+        "agents_raw": _load_json("agents.json"),
+        "orders_raw": _load_json("orders.json"),
+    }
+
+
+def _orders_digest(previous: str, orders: list) -> str:
+    """Empreinte chaînée commande par commande : un ajout ne rehache que la nouvelle commande."""
+    digest = previous
+    for order in orders:
+        payload = json.dumps(order, sort_keys=True, separators=(",", ":")).encode("utf-8")
+        digest = hashlib.sha1(digest.encode("ascii") + payload).hexdigest()
+    return digest
+
+
+@st.cache_data(max_entries=32, show_spinner="Calcul de l'affectation...")
+def _compute_assignment_and_stats(
+    orders_digest: str, alloc_method: str, solver_name: str, data_mtimes: tuple, _orders_list: list, _dataset: dict,
+):
+    """
+    Même logique que app.py : allocation + stats + routes + metrics par commande.
+    Mis en cache par (empreinte des commandes, allocateur, solveur, mtimes de data/) ; les arguments
+    préfixés par _ ne sont pas hachés par Streamlit.
+    """
     try:
         from main import (
-            load_json,
-            parse_warehouse,
-            parse_products,
             parse_agents,
             parse_orders,
             enrich_orders,
@@ -42,25 +93,29 @@ def _compute_assignment_and_stats(orders_list: list, alloc_method: str = "first_
             allocate_first_fit,
             apply_assignment,
         )
-        wh_data = load_json(DATA_DIR / "warehouse.json")
-        pr_data = load_json(DATA_DIR / "products.json")
-        ag_data = _load_json("agents.json")
-        warehouse = parse_warehouse(wh_data)
-        products_by_id = parse_products(pr_data)
-        agents = parse_agents(ag_data)
-        orders = parse_orders(orders_list if isinstance(orders_list, list) else [])
+        from src.allocation import GREEDY_ALLOCATORS, allocate_regret
+        # Entrepôt et produits partagés (lecture seule) ; agents et commandes sont modifiés par l'allocation
+        warehouse = _dataset["warehouse"]
+        products_by_id = _dataset["products_by_id"]
+        ag_data = _dataset["agents_raw"]
+        orders = parse_orders(_orders_list)
         enrich_orders(orders, products_by_id)
         orders_sorted = sort_orders_by_received_time(orders)
         agents_fresh = parse_agents(deepcopy(ag_data))
         if alloc_method == "minizinc":
             try:
-                from src.minizinc_solver import allocate_with_minizinc
-                assignment = allocate_with_minizinc(
-                    orders_sorted, agents_fresh, products_by_id, warehouse, solver_name=solver_name
+                from src.presolve import allocate_with_presolve
+                assignment, _ = allocate_with_presolve(
+                    orders_sorted, agents_fresh, products_by_id, warehouse, solver="minizinc",
+                    time_limit_seconds=MINIZINC_TIME_LIMIT, solver_name=solver_name,
                 )
                 apply_assignment(assignment, orders_sorted, agents_fresh)
             except Exception:
-                assignment = allocate_first_fit(orders_sorted, agents_fresh)
+                # Repli : regret-k (rapide, respecte les restrictions des agents)
+                agents_fresh = parse_agents(deepcopy(ag_data))
+                assignment = allocate_regret(orders_sorted, agents_fresh, products_by_id, warehouse)
+        elif alloc_method in GREEDY_ALLOCATORS:
+            assignment = GREEDY_ALLOCATORS[alloc_method](orders_sorted, agents_fresh, products_by_id, warehouse)
         else:
             assignment = allocate_first_fit(orders_sorted, agents_fresh)
 
@@ -150,8 +205,6 @@ def _compute_assignment_and_stats(orders_list: list, alloc_method: str = "first_
             },
             "agent_routes": agent_routes,
             "orders_metrics": orders_metrics,
-            "warehouse": warehouse,
-            "orders_sorted": orders_sorted,
         }
     except Exception as e:
         return {
@@ -159,8 +212,6 @@ def _compute_assignment_and_stats(orders_list: list, alloc_method: str = "first_
             "stats": {"n_orders": 0, "n_assigned": 0, "n_unassigned": 0, "by_type": {}, "total_distance": 0, "total_time_min": 0, "total_cost_euros": 0},
             "agent_routes": {},
             "orders_metrics": [],
-            "warehouse": None,
-            "orders_sorted": [],
             "error": str(e),
         }
 
@@ -208,28 +259,56 @@ def _draw_warehouse_map(warehouse_data: dict, agent_routes: dict, width: int, he
     return fig
 
 
-# Session state : liste des commandes (initialisée depuis data/orders.json)
-if "orders_list" not in st.session_state:
-    raw = _load_json("orders.json")
-    st.session_state.orders_list = raw if isinstance(raw, list) else []
+@st.cache_data(max_entries=32, show_spinner=False)
+def _render_map_png(result_key: tuple, _warehouse_data: dict, _agent_routes: dict) -> bytes:
+    """Carte rendue une seule fois par résultat (clé : celle de l'allocation), en PNG."""
+    import io
+    import matplotlib.pyplot as plt
+    dims = _warehouse_data.get("dimensions", {})
+    fig = _draw_warehouse_map(_warehouse_data, _agent_routes, dims.get("width", 10), dims.get("height", 8))
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format="png", dpi=100)
+    plt.close(fig)
+    return buffer.getvalue()
+
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def _metrics_frame(result_key: tuple, _orders_metrics: list):
+    import pandas as pd
+    return pd.DataFrame(_orders_metrics)
 
 
 st.set_page_config(page_title="OptiPick — Streamlit", page_icon="📦", layout="wide")
 
+data_mtimes = _data_mtimes()
+dataset = _load_dataset(data_mtimes)
+
+# Session state : liste des commandes (initialisée depuis data/orders.json) et son empreinte
+if "orders_list" not in st.session_state:
+    raw = dataset["orders_raw"]
+    st.session_state.orders_list = list(raw) if isinstance(raw, list) else []
+    st.session_state.orders_digest = _orders_digest("", st.session_state.orders_list)
+
 st.title("📦 OptiPick — Interface entrepôt (Streamlit)")
 
 with st.sidebar:
     st.header("Paramètres")
     alloc_method = st.radio(
         "Méthode d'allocation",
-        ["first_fit", "minizinc"],
-        format_func=lambda x: "First-Fit (rapide)" if x == "first_fit" else "MiniZinc (.mzn)",
+        ["first_fit", "best_fit", "cheapest", "regret", "minizinc"],
+        format_func=lambda x: {
+            "first_fit": "First-Fit (rapide)",
+            "best_fit": "Best-Fit décroissant",
+            "cheapest": "Coût minimal",
+            "regret": "Regret-k",
+        }.get(x, "MiniZinc (.mzn)"),
     )
     solver_name = "cbc"
     if alloc_method == "minizinc":
         solver_name = st.selectbox("Solveur MiniZinc", ["cbc", "coin-bc", "highs", "gecode"], index=1)
 
-data = _compute_assignment_and_stats(st.session_state.orders_list, alloc_method=alloc_method, solver_name=solver_name)
+result_key = (st.session_state.orders_digest, alloc_method, solver_name, data_mtimes)
+data = _compute_assignment_and_stats(*result_key, _orders_list=st.session_state.orders_list, _dataset=dataset)
 
 if data.get("error"):
     st.error("Erreur : " + data["error"])
@@ -248,30 +327,24 @@ st.write("**Par type d'agent :**")
 for t, v in stats.get("by_type", {}).items():
     st.caption(f"  {t}: {v['orders']} commandes / {v['count']} agent(s)")
 
-warehouse_data = _load_json("warehouse.json")
-dims = warehouse_data.get("dimensions", {})
-w = dims.get("width", 10)
-h = dims.get("height", 8)
-fig = _draw_warehouse_map(warehouse_data, data.get("agent_routes", {}), w, h)
-st.pyplot(fig)
-import matplotlib.pyplot as _plt
-_plt.close(fig)
+st.image(_render_map_png(result_key, dataset["warehouse_data"], data.get("agent_routes", {})))
 
 st.subheader("Performance et coût par commande")
-import pandas as pd
-df = pd.DataFrame(data.get("orders_metrics", []))
+df = _metrics_frame(result_key, data.get("orders_metrics", []))
 if not df.empty:
-    st.dataframe(df, use_container_width=True)
+    # Pagination : seule la page affichée est envoyée au navigateur
+    col_size, col_page = st.columns(2)
+    page_size = col_size.selectbox("Lignes par page", [50, 200, 1000], index=1)
+    n_pages = max(1, -(-len(df) // page_size))
+    page = col_page.number_input(f"Page (sur {n_pages})", min_value=1, max_value=n_pages, value=1)
+    st.dataframe(df.iloc[(page - 1) * page_size:page * page_size], use_container_width=True)
+    st.caption(f"{len(df)} commandes")
 else:
     st.info("Aucune commande ou aucune métrique.")
 
 st.subheader("Ajouter une commande")
-products = _load_json("products.json")
-product_ids = []
-product_names = {}
-if isinstance(products, list):
-    product_ids = [p.get("id") for p in products if p.get("id")]
-    product_names = {p.get("id"): p.get("name", p.get("id")) for p in products if p.get("id")}
+product_ids = dataset["product_ids"]
+product_names = dataset["product_names"]
 
 with st.form("add_order_form"):
     received_time = st.text_input("Heure de réception", value="12:00")
@@ -295,6 +368,7 @@ with st.form("add_order_form"):
             "items": [{"product_id": pid, "quantity": int(qty)}],
         }
         st.session_state.orders_list.append(new_order)
+        st.session_state.orders_digest = _orders_digest(st.session_state.orders_digest, [new_order])
         st.success(f"Commande {new_id} ajoutée.")
         st.rerun()
     elif submitted and not product_ids:
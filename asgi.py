@@ -0,0 +1,313 @@
+"""
+Mode ASGI de l'interface web OptiPick : mêmes routes que app.py, servies par une boucle asyncio.
+
+Lancer :
+  - pip install uvicorn  puis  python main.py --asgi
+  - Ou : uvicorn asgi:app --host 0.0.0.0 --port 5001
+  Puis ouvrir http://127.0.0.1:5001
+
+- L'état (jeu de données, commandes, jobs, résultats mémorisés, flux SSE) est celui de app.py :
+  seule la couche HTTP change, les deux modes rendent les mêmes réponses.
+- La boucle ne calcule jamais : les allocations (MiniZinc compris) tournent dans le pool de jobs
+  et la boucle attend leur Future ; sérialisation, compression et lecture NDJSON passent par
+  l'executor par défaut. Un flux SSE attend sur la boucle, sans thread dédié.
+- Application ASGI sans framework : seul un serveur ASGI (uvicorn) est nécessaire.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import mimetypes
+import os
+import re
+import sys
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+from urllib.parse import parse_qsl
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+import app as web
+from src.responses import conditional_json, dumps
+
+STATIC_DIR = Path(__file__).parent / "static"
+# Corps de requête maximal (ingestion NDJSON comprise)
+MAX_BODY_BYTES = int(os.environ.get("OPTIPICK_MAX_BODY_BYTES", 64 * 1024 * 1024))
+
+
+class _Request:
+    __slots__ = ("method", "path", "args", "headers", "body", "receive")
+
+    def __init__(self, scope: dict, body: bytes, receive) -> None:
+        self.method = scope["method"]
+        self.path = scope["path"]
+        self.args = dict(parse_qsl(scope.get("query_string", b"").decode("latin-1")))
+        self.headers = {k.decode("latin-1").lower(): v.decode("latin-1") for k, v in scope.get("headers", [])}
+        self.body = body
+        self.receive = receive
+
+    def json(self) -> dict:
+        """Corps JSON (objet) ; {} s'il est absent ou invalide, comme get_json(silent=True)."""
+        try:
+            data = json.loads(self.body or b"{}")
+        except ValueError:
+            return {}
+        return data if isinstance(data, dict) else {}
+
+
+async def _send(send, status: int, body: bytes = b"", headers: Optional[Dict[str, str]] = None,
+                content_type: str = "application/json") -> None:
+    raw = [(b"content-type", content_type.encode()), (b"content-length", str(len(body)).encode())]
+    raw += [(k.lower().encode(), v.encode()) for k, v in (headers or {}).items()]
+    await send({"type": "http.response.start", "status": status, "headers": raw})
+    await send({"type": "http.response.body", "body": body})
+
+
+async def _json(send, payload: Any, status: int = 200) -> None:
+    await _send(send, status, dumps(payload))
+
+
+async def _conditional(send, request: _Request, etag: str, payload: Callable[[], Any]) -> None:
+    loop = asyncio.get_running_loop()
+    status, headers, body = await loop.run_in_executor(
+        None, conditional_json, etag, payload, web.encoded_bodies,
+        request.headers.get("if-none-match"), request.headers.get("accept-encoding", ""),
+    )
+    await _send(send, status, body, headers)
+
+
+async def _result(alloc: str, solver: str) -> dict:
+    """Comme web._latest_result, mais l'attente du premier calcul ne bloque pas la boucle."""
+    data, job = web._lookup_result(alloc, solver)
+    if data is not None:
+        return data
+    await asyncio.wait([asyncio.wrap_future(job.future)], timeout=web.RESULT_WAIT_TIMEOUT)
+    return web._job_outcome(job)
+
+
+# --- Routes (mêmes réponses que les handlers Flask de app.py) ---
+
+async def _index(request: _Request, send) -> None:
+    global _index_html
+    if _index_html is None:
+        with web.app.test_request_context("/"):
+            _index_html = web.render_template("index.html").encode("utf-8")
+    await _send(send, 200, _index_html, content_type="text/html; charset=utf-8")
+
+
+_index_html: Optional[bytes] = None
+_static_files: Dict[str, Tuple[bytes, str]] = {}
+
+
+async def _static(request: _Request, send, name: str) -> None:
+    entry = _static_files.get(name)
+    if entry is None:
+        path = (STATIC_DIR / name).resolve()
+        if not path.is_relative_to(STATIC_DIR.resolve()) or not path.is_file():
+            return await _json(send, {"error": "Fichier introuvable"}, 404)
+        content_type = mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+        entry = _static_files[name] = (path.read_bytes(), content_type)
+    await _send(send, 200, entry[0], {"Cache-Control": "no-cache"}, content_type=entry[1])
+
+
+def _dataset_route(name: str):
+    async def handler(request: _Request, send) -> None:
+        await _conditional(send, request, *web._dataset_response(name))
+    return handler
+
+
+async def _orders(request: _Request, send) -> None:
+    try:
+        alloc, solver = web._alloc_params(request.args)
+        offset, limit, fields = web._page_params(request.args)
+    except ValueError as e:
+        return await _json(send, {"error": str(e)}, 400)
+    data = await _result(alloc, solver)
+    await _conditional(send, request, *web._orders_response(data, alloc, solver, offset, limit, fields))
+
+
+async def _stats(request: _Request, send) -> None:
+    try:
+        alloc, solver = web._alloc_params(request.args)
+    except ValueError as e:
+        return await _json(send, {"error": str(e)}, 400)
+    data = await _result(alloc, solver)
+    await _conditional(send, request, *web._stats_response(data, alloc, solver))
+
+
+async def _assignment(request: _Request, send) -> None:
+    try:
+        alloc, solver = web._alloc_params(request.args)
+    except ValueError as e:
+        return await _json(send, {"error": str(e)}, 400)
+    data = await _result(alloc, solver)
+    await _conditional(send, request, *web._assignment_response(data, alloc, solver))
+
+
+async def _tracks(request: _Request, send) -> None:
+    try:
+        alloc, solver = web._alloc_params(request.args)
+    except ValueError as e:
+        return await _json(send, {"error": str(e)}, 400)
+    data = await _result(alloc, solver)
+    await _conditional(send, request, *web._tracks_response(data, alloc, solver))
+
+
+async def _stream(request: _Request, send) -> None:
+    try:
+        alloc, solver = web._alloc_params(request.args)
+    except ValueError as e:
+        return await _json(send, {"error": str(e)}, 400)
+    sub = web.broadcaster.subscribe(web._result_key(0, alloc, solver)[1:])
+    if sub is None:
+        return await _json(send, {"error": "Trop de flux ouverts, réessayez plus tard"}, 503)
+    # Abonné avant de lire l'état courant : aucune publication ne peut être manquée
+    web._initial_stream_frame(sub, await _result(alloc, solver))
+
+    async def watch_disconnect() -> None:
+        while (await request.receive())["type"] != "http.disconnect":
+            pass
+
+    # Client parti : la fermeture de l'abonnement réveille et termine le flux
+    disconnect = asyncio.ensure_future(watch_disconnect())
+    disconnect.add_done_callback(lambda _: sub.close())
+    frames = web.broadcaster.astream(sub, web.STREAM_HEARTBEAT, on_idle=lambda: web._lookup_result(alloc, solver))
+    headers = [(b"content-type", b"text/event-stream"), (b"cache-control", b"no-cache"), (b"x-accel-buffering", b"no")]
+    try:
+        await send({"type": "http.response.start", "status": 200, "headers": headers})
+        async for frame in frames:
+            await send({"type": "http.response.body", "body": frame.encode("utf-8"), "more_body": True})
+        await send({"type": "http.response.body", "body": b""})
+    finally:
+        disconnect.cancel()
+        await frames.aclose()
+
+
+async def _add_order(request: _Request, send) -> None:
+    await _json(send, *web._add_order(request.json()))
+
+
+async def _add_orders_bulk(request: _Request, send) -> None:
+    loop = asyncio.get_running_loop()
+    await _json(send, *await loop.run_in_executor(None, web._add_orders_bulk, request.body))
+
+
+async def _bulk_status(request: _Request, send) -> None:
+    await _json(send, web.order_batcher.stats())
+
+
+async def _submit_job(request: _Request, send) -> None:
+    await _json(send, *web._submit_job_request(request.json()))
+
+
+async def _job_status(request: _Request, send, job_id: str) -> None:
+    await _json(send, *web._job_status(job_id))
+
+
+async def _job_result(request: _Request, send, job_id: str) -> None:
+    await _json(send, *web._job_result(job_id))
+
+
+async def _cancel_job(request: _Request, send, job_id: str) -> None:
+    await _json(send, *web._cancel_job(job_id))
+
+
+Handler = Callable[..., Awaitable[None]]
+
+ROUTES: Dict[Tuple[str, str], Handler] = {
+    ("GET", "/"): _index,
+    ("GET", "/api/warehouse"): _dataset_route("warehouse"),
+    ("GET", "/api/products"): _dataset_route("products"),
+    ("GET", "/api/agents"): _dataset_route("agents"),
+    ("GET", "/api/orders"): _orders,
+    ("GET", "/api/stats"): _stats,
+    ("GET", "/api/assignment"): _assignment,
+    ("GET", "/api/tracks"): _tracks,
+    ("GET", "/api/stream"): _stream,
+    ("POST", "/api/orders"): _add_order,
+    ("POST", "/api/orders/bulk"): _add_orders_bulk,
+    ("GET", "/api/orders/bulk"): _bulk_status,
+    ("POST", "/api/jobs"): _submit_job,
+}
+
+# Routes à paramètre : (méthode, motif) -> handler(request, send, *groupes)
+PATTERN_ROUTES = [
+    ("GET", re.compile(r"^/static/(.+)$"), _static),
+    ("GET", re.compile(r"^/api/jobs/([^/]+)$"), _job_status),
+    ("GET", re.compile(r"^/api/jobs/([^/]+)/result$"), _job_result),
+    ("DELETE", re.compile(r"^/api/jobs/([^/]+)$"), _cancel_job),
+]
+
+
+def _route(method: str, path: str) -> Tuple[Optional[Handler], tuple]:
+    handler = ROUTES.get((method, path))
+    if handler is not None:
+        return handler, ()
+    for route_method, pattern, handler in PATTERN_ROUTES:
+        match = pattern.match(path)
+        if match and route_method == method:
+            return handler, match.groups()
+    return None, ()
+
+
+async def _read_body(receive) -> Optional[bytes]:
+    """Corps complet de la requête ; None s'il dépasse MAX_BODY_BYTES."""
+    chunks, size = [], 0
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            return b""
+        chunk = message.get("body", b"")
+        size += len(chunk)
+        if size > MAX_BODY_BYTES:
+            return None
+        chunks.append(chunk)
+        if not message.get("more_body", False):
+            return b"".join(chunks)
+
+
+async def _lifespan(receive, send) -> None:
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            web.order_batcher.close(timeout=5)
+            web.dataset.stop_watching()
+            web.jobs.shutdown()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def app(scope, receive, send) -> None:
+    if scope["type"] == "lifespan":
+        return await _lifespan(receive, send)
+    if scope["type"] != "http":
+        return
+    handler, params = _route(scope["method"], scope["path"])
+    if handler is None:
+        return await _json(send, {"error": f"Route inconnue : {scope['method']} {scope['path']}"}, 404)
+    body = await _read_body(receive)
+    if body is None:
+        return await _json(send, {"error": f"Corps de requête trop volumineux (max {MAX_BODY_BYTES} octets)"}, 413)
+    try:
+        await handler(_Request(scope, body, receive), send, *params)
+    except Exception as e:
+        try:
+            await _json(send, {"error": f"{type(e).__name__}: {e}"}, 500)
+        except Exception:
+            pass  # réponse déjà commencée (flux) ou client parti
+
+
+def run(host: str = "0.0.0.0", port: int = 5001) -> None:
+    try:
+        import uvicorn
+    except ImportError:
+        raise SystemExit("Le mode ASGI nécessite un serveur ASGI : pip install uvicorn")
+    uvicorn.run(app, host=host, port=port, log_level="warning")
+
+
+if __name__ == "__main__":
+    port = int(os.environ.get("FLASK_PORT", 5001))
+    print(f"🌐 Interface web OptiPick (ASGI) — http://127.0.0.1:{port}")
+    run(port=port)
@@ -30,15 +30,17 @@ from src.routing import (
     compute_route_for_agent,
     check_deadlines,
 )
+from src.allocation import HEURISTIC_ALLOCATORS, allocate_regret
+from src.presolve import allocate_with_presolve
 try:
-    from src.minizinc_solver import (
-        allocate_with_minizinc,
-        check_minizinc_available,
-    )
+    from src.minizinc_solver import check_minizinc_available
     MINIZINC_AVAILABLE = check_minizinc_available()
 except ImportError:
     MINIZINC_AVAILABLE = False
 
+# Budget par défaut (s) de l'ALNS et du portefeuille ; MiniZinc n'a pas de limite sauf --time-limit
+DEFAULT_TIME_LIMIT = 10.0
+
 
 # =========================
 # 2) Enrichissement Orders (poids/volume/locations)
@@ -219,6 +221,7 @@ def print_report(
     products_by_id: Optional[Dict[str, Product]] = None,
     use_routing: bool = False,
     use_minizinc: bool = False,
+    alloc_method: str = "first_fit",
 ) -> None:
     total = len(orders)
     assigned = sum(1 for order_id, agent_id in assignment.items() if agent_id is not None)
@@ -242,6 +245,10 @@ def print_report(
         print("JOUR 2 — Allocation optimale avec MiniZinc")
     elif use_routing:
         print("JOUR 3 — Allocation avec Optimisation TSP")
+    elif alloc_method == "alns":
+        print("Allocation ALNS (métaheuristique)")
+    elif alloc_method in HEURISTIC_ALLOCATORS:
+        print(f"Allocation gloutonne ({alloc_method})")
     else:
         print("JOUR 1 — Allocation naïve (First-Fit)")
     print("══════════════════════════════════════")
@@ -308,6 +315,8 @@ def main(
     use_routing: bool = False,
     use_minizinc: bool = False,
     solver_name: str = "cbc",
+    alloc_method: str = "first_fit",
+    time_limit: Optional[float] = None,
 ) -> None:
     wh_data = load_json(Path(warehouse_path))
     pr_data = load_json(Path(products_path))
@@ -326,18 +335,33 @@ def main(
     
     # Choisir la méthode d'allocation
     if use_minizinc and MINIZINC_AVAILABLE:
-        print("🔧 Utilisation de MiniZinc pour l'allocation optimale...")
-        assignment = allocate_with_minizinc(
-            orders_sorted, agents, products_by_id, warehouse, solver_name
+        print("🔧 Utilisation de MiniZinc pour l'allocation optimale (après presolve)...")
+        # Presolve : commandes impossibles/fixées, agents dominés, composantes résolues en parallèle
+        assignment, report = allocate_with_presolve(
+            orders_sorted, agents, products_by_id, warehouse, solver="minizinc",
+            time_limit_seconds=time_limit, solver_name=solver_name,
         )
+        for line in report.summary():
+            print(f"   {line}")
         # Appliquer l'assignment aux agents pour que le détail (poids, volume, commandes) soit correct
         apply_assignment(assignment, orders_sorted, agents)
+    elif use_minizinc:
+        # Repli de production : regret-k respecte les restrictions (contrairement au First-Fit)
+        print("⚠️  MiniZinc non disponible, utilisation de l'algorithme glouton (regret)")
+        assignment = allocate_regret(orders_sorted, agents, products_by_id, warehouse)
+        use_minizinc = False
+        alloc_method = "regret"
+    elif alloc_method == "alns":
+        assignment = HEURISTIC_ALLOCATORS["alns"](
+            orders_sorted, agents, products_by_id, warehouse,
+            time_limit_seconds=time_limit if time_limit is not None else DEFAULT_TIME_LIMIT,
+        )
+    elif alloc_method in HEURISTIC_ALLOCATORS:
+        assignment = HEURISTIC_ALLOCATORS[alloc_method](orders_sorted, agents, products_by_id, warehouse)
     else:
-        if use_minizinc and not MINIZINC_AVAILABLE:
-            print("⚠️  MiniZinc non disponible, utilisation de l'algorithme glouton")
         assignment = allocate_first_fit(orders_sorted, agents)
 
-    print_report(warehouse, orders_sorted, agents, assignment, products_by_id, use_routing, use_minizinc)
+    print_report(warehouse, orders_sorted, agents, assignment, products_by_id, use_routing, use_minizinc, alloc_method)
 
 
 if __name__ == "__main__":
@@ -347,12 +371,23 @@ if __name__ == "__main__":
     parser.add_argument("--routing", action="store_true", help="Activer l'optimisation TSP (Jour 3)")
     parser.add_argument("--minizinc", action="store_true", help="Utiliser MiniZinc pour l'allocation optimale (Jour 2)")
     parser.add_argument("--solver", default="cbc", help="Solveur MiniZinc à utiliser (cbc, coin-bc, highs, gecode)")
+    parser.add_argument("--alloc", default="first_fit", choices=["first_fit", *HEURISTIC_ALLOCATORS],
+                        help="Allocateur heuristique (first_fit, best_fit, cheapest, regret, alns)")
+    parser.add_argument("--time-limit", type=float, default=None,
+                        help=f"Budget de temps (s) de l'ALNS ou du portefeuille (défaut {DEFAULT_TIME_LIMIT:.0f} s) ; "
+                             "MiniZinc n'est limité que si l'option est donnée")
     parser.add_argument("--test", action="store_true", help="Utiliser les fichiers de test (5 commandes, 1 agent)")
     parser.add_argument("--test2", action="store_true", help="Utiliser le 2e jeu de test (10 commandes, 3 robots)")
     parser.add_argument("--test3", action="store_true", help="Utiliser le 3e jeu de test (10 commandes, 3 agents différents: R1, H1, C1)")
     parser.add_argument("--day4", action="store_true", help="Jour 4 : comparaison stratégies (First-Fit, MiniZinc, CP-SAT, Batching+CP-SAT)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Jour 4 : stratégies comparées en parallèle (défaut : nombre de cœurs ; 1 = l'une après l'autre, temps comparables)")
+    parser.add_argument("--portfolio", action="store_true", help="Jour 4 : stratégies en course parallèle sous budget (--time-limit)")
     parser.add_argument("--day5", action="store_true", help="Jour 5 : optimisation stockage, simulation avant/après, dashboard")
+    parser.add_argument("--scenarios", type=int, default=0, help="Jour 5 : nombre de scénarios Monte Carlo (avant/après, IC à 95 %%)")
+    parser.add_argument("--max-moves", type=int, default=0, help="Jour 5 : re-slotting incrémental limité à N produits déplacés (0 = réorganisation complète)")
     parser.add_argument("--day6", action="store_true", help="Jour 6 : lancer l'interface web (Flask)")
+    parser.add_argument("--asgi", action="store_true", help="Jour 6 : lancer l'interface web en mode ASGI (asyncio, uvicorn)")
     parser.add_argument("--warehouse", default="data/warehouse.json", help="Chemin vers warehouse.json")
     parser.add_argument("--products", default="data/products.json", help="Chemin vers products.json")
     parser.add_argument("--agents", default="data/agents.json", help="Chemin vers agents.json")
@@ -374,12 +409,40 @@ if __name__ == "__main__":
         agents_path = args.agents
         orders_path = args.orders
 
-    if args.day6:
+    if args.asgi:
+        import os
+        from asgi import run as run_asgi
+        port = int(os.environ.get("FLASK_PORT", 5001))
+        print(f"🌐 Interface web OptiPick (ASGI) — http://127.0.0.1:{port}")
+        run_asgi(port=port)
+    elif args.day6:
         import os
         from app import app
         port = int(os.environ.get("FLASK_PORT", 5001))
         print(f"🌐 Interface web OptiPick — http://127.0.0.1:{port}")
         app.run(debug=True, host="0.0.0.0", port=port)
+    elif args.portfolio:
+        from src.portfolio import run_portfolio
+        warehouse = parse_warehouse(load_json(Path(args.warehouse)))
+        products_by_id = parse_products(load_json(Path(args.products)))
+        agents = parse_agents(load_json(Path(agents_path)))
+        orders = parse_orders(load_json(Path(orders_path)))
+        enrich_orders(orders, products_by_id)
+        budget = args.time_limit if args.time_limit is not None else DEFAULT_TIME_LIMIT
+        print(f"🏁 Portefeuille de solveurs (budget {budget:.0f} s)...")
+        outcome = run_portfolio(warehouse, orders, agents, products_by_id,
+                                time_limit_seconds=budget, solver_name=args.solver)
+        for name, data in outcome["results"].items():
+            if "error" in data:
+                print(f"  {name}: ❌ {data['error']}")
+            else:
+                print(f"  {name}: {data['n_assigned']}/{data['n_orders']} assignées, "
+                      f"{data['cost_euros']:.2f} €, {data['violations']} violation(s) ({data.get('status', '?')})")
+        for name in outcome["cancelled"]:
+            print(f"  {name}: ⏱️ arrêté à l'échéance")
+        metrics = outcome["metrics"]
+        print(f"\n✅ Meilleure stratégie : {outcome['best']} — {metrics['n_assigned']}/{metrics['n_orders']} assignées, "
+              f"{metrics['cost_euros']:.2f} € (arrêt : {outcome['stopped_on']}, {outcome['elapsed_sec']:.1f} s)")
     elif args.day4:
         from src.day4_comparison import run_comparison
         import json
@@ -396,7 +459,7 @@ if __name__ == "__main__":
         results = run_comparison(warehouse, orders, agents, products_by_id,
                                  use_minizinc=args.minizinc or MINIZINC_AVAILABLE,
                                  use_cpsat=True, use_batching=True,
-                                 solver_name=args.solver)
+                                 solver_name=args.solver, max_workers=args.workers)
         print("\n══════════════════════════════════════")
         print("JOUR 4 — Comparaison quantitative")
         print("══════════════════════════════════════\n")
@@ -411,8 +474,14 @@ if __name__ == "__main__":
             print(f"    Distance (proxy): {data.get('distance_proxy', '?')} unités")
             print(f"    Temps estimé: {data.get('time_min', 0):.1f} min")
             print(f"    Coût estimé: {data.get('cost_euros', 0):.2f} €")
+            print(f"    Résolution: {data.get('wall_time_sec', 0):.2f} s (CPU {data.get('cpu_time_sec', 0):.2f} s), "
+                  f"pic mémoire {data.get('peak_rss_mb', 0):.0f} Mo, statut {data.get('status', '?')}")
             if data.get("n_batches"):
                 print(f"    Lots créés: {data['n_batches']}")
+            if data.get("presolve"):
+                presolve_info = data["presolve"]
+                print(f"    Presolve: {presolve_info['variables_before']} → {presolve_info['variables_after']} variables, "
+                      f"{presolve_info['n_components']} composante(s), accélération x{presolve_info['speedup']}")
             print()
         Path("results").mkdir(exist_ok=True)
         with open("results/day4_metrics.json", "w", encoding="utf-8") as metrics_file:
@@ -450,7 +519,7 @@ if __name__ == "__main__":
                                     for a in agents])
 
         # 5.1 Patterns
-        patterns = run_pattern_analysis(orders_sorted, products_by_id, warehouse, top_n=15)
+        patterns = run_pattern_analysis(orders_sorted, products_by_id, warehouse, top_n=15, include_pairs=False)
         print("5.1 — Analyse des patterns")
         print("  Top produits (fréquence):", patterns["top_products"][:5])
         print("  Zones visitées:", patterns["zone_visits"])
@@ -464,7 +533,8 @@ if __name__ == "__main__":
         print("  📁 results/day5_patterns.json\n")
 
         # 5.2 + 5.3 Réorganisation et simulation
-        out = run_before_after(warehouse, orders_sorted, agents_sim, products_by_id, n_test_orders=50, seed=42)
+        out = run_before_after(warehouse, orders_sorted, agents_sim, products_by_id, n_test_orders=50, seed=42,
+                               method="incremental" if args.max_moves > 0 else "affinity", max_moves=args.max_moves)
         placement = out["placement"]
         metrics = out["metrics"]
         print("5.2–5.3 — Réorganisation et simulation (50 commandes test)")
@@ -477,6 +547,18 @@ if __name__ == "__main__":
             json.dump(metrics, f, indent=2)
         print("  📁 results/day5_placement.json, results/day5_simulation.json\n")
 
+        if args.scenarios > 0:
+            from src.monte_carlo import run_monte_carlo
+            mc = run_monte_carlo(warehouse, agents_sim, products_by_id, out["products_optimized"],
+                                 n_scenarios=args.scenarios, n_orders=50, seed=42)
+            print(f"5.3 bis — Monte Carlo ({args.scenarios} scénarios x 50 commandes, IC à 95 %)")
+            for key in ("distance_current", "distance_optimized", "reduction_percent"):
+                stat = mc["metrics"][key]
+                print(f"  {key}: {stat['mean']:.2f} [{stat['ci_low']:.2f} ; {stat['ci_high']:.2f}]")
+            with open("results/day5_monte_carlo.json", "w", encoding="utf-8") as f:
+                json.dump({key: value for key, value in mc.items() if key != "scenarios"}, f, indent=2)
+            print("  📁 results/day5_monte_carlo.json\n")
+
         # 5.4 Humain–robot
         assign = allocate_first_fit(orders_sorted, agents_alloc)
         rec = recommend(assign, orders_sorted, agents_alloc)
@@ -510,4 +592,6 @@ if __name__ == "__main__":
             use_routing=args.routing,
             use_minizinc=args.minizinc,
             solver_name=args.solver,
+            alloc_method=args.alloc,
+            time_limit=args.time_limit,
         )
\ No newline at end of file
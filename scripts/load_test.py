@@ -0,0 +1,122 @@
+"""
+Test de charge de l'API web : N clients concurrents (connexions keep-alive) pendant D secondes.
+Usage :
+  python app.py            (Flask, port 5001)         puis  python scripts/load_test.py --url http://127.0.0.1:5001/api/stats
+  python main.py --asgi    (ASGI, port 5001)          puis  la même commande
+  Comparer deux serveurs lancés sur des ports différents :
+  python scripts/load_test.py --url http://127.0.0.1:5001/api/stats --url http://127.0.0.1:5002/api/stats
+
+Client asyncio sans dépendance : débit (req/s), latences p50/p95/p99, erreurs.
+"""
+import argparse
+import asyncio
+import time
+from urllib.parse import urlsplit
+
+
+async def _request(reader, writer, host: str, target: str, headers: str):
+    """(statut, keep_alive) d'une requête GET ; le corps est lu et ignoré."""
+    writer.write(f"GET {target} HTTP/1.1\r\nHost: {host}\r\n{headers}\r\n".encode("latin-1"))
+    await writer.drain()
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError("connexion fermée par le serveur")
+    status = int(status_line.split()[1])
+    length, chunked, close = 0, False, False
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        name, value = name.strip().lower(), value.strip().lower()
+        if name == "content-length":
+            length = int(value)
+        elif name == "transfer-encoding" and "chunked" in value:
+            chunked = True
+        elif name == "connection" and value == "close":
+            close = True
+    if chunked:
+        while True:
+            size = int((await reader.readline()).split(b";")[0], 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    elif length:
+        await reader.readexactly(length)
+    return status, not close
+
+
+async def _client(url, deadline: float, latencies: list, errors: list, headers: str) -> None:
+    parts = urlsplit(url)
+    target = parts.path + (f"?{parts.query}" if parts.query else "")
+    host = parts.netloc
+    reader = writer = None
+    while time.perf_counter() < deadline:
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection(parts.hostname, parts.port or 80)
+            start = time.perf_counter()
+            status, keep_alive = await _request(reader, writer, host, target, headers)
+            latencies.append(time.perf_counter() - start)
+            if status >= 400:
+                errors.append(status)
+        except (OSError, ValueError, IndexError, asyncio.IncompleteReadError) as e:
+            errors.append(type(e).__name__)
+            keep_alive = False
+        if not keep_alive and writer is not None:
+            # Serveur sans keep-alive (ex. serveur de développement) : on rouvre une connexion
+            writer.close()
+            reader = writer = None
+    if writer is not None:
+        writer.close()
+
+
+def _percentile(sorted_values: list, q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+async def run_load(url: str, clients: int = 200, duration: float = 10.0, gzip: bool = True) -> dict:
+    latencies: list = []
+    errors: list = []
+    headers = "Accept-Encoding: gzip\r\n" if gzip else ""
+    start = time.perf_counter()
+    deadline = start + duration
+    await asyncio.gather(*(_client(url, deadline, latencies, errors, headers) for _ in range(clients)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "url": url,
+        "clients": clients,
+        "requests": len(latencies),
+        "errors": len(errors),
+        "rps": len(latencies) / elapsed,
+        "p50_ms": _percentile(latencies, 0.50) * 1000,
+        "p95_ms": _percentile(latencies, 0.95) * 1000,
+        "p99_ms": _percentile(latencies, 0.99) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Test de charge de l'API web OptiPick")
+    parser.add_argument("--url", action="append", required=True, help="URL à charger (répétable pour comparer)")
+    parser.add_argument("--clients", type=int, default=200, help="Clients concurrents")
+    parser.add_argument("--duration", type=float, default=10.0, help="Durée par URL (s)")
+    parser.add_argument("--no-gzip", action="store_true", help="Ne pas envoyer Accept-Encoding: gzip")
+    args = parser.parse_args()
+
+    results = []
+    for url in args.url:
+        print(f"⏱️  {url} — {args.clients} clients, {args.duration:.0f} s...")
+        result = asyncio.run(run_load(url, args.clients, args.duration, gzip=not args.no_gzip))
+        results.append(result)
+        print(f"   {result['rps']:.0f} req/s, {result['requests']} requêtes, {result['errors']} erreur(s), "
+              f"p50 {result['p50_ms']:.1f} ms, p95 {result['p95_ms']:.1f} ms, p99 {result['p99_ms']:.1f} ms")
+    if len(results) > 1 and results[0]["rps"] > 0:
+        for result in results[1:]:
+            print(f"📈 {result['url']} : x{result['rps'] / results[0]['rps']:.2f} par rapport à {results[0]['url']}")
+
+
+if __name__ == "__main__":
+    main()
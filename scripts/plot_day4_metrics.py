@@ -32,31 +32,27 @@ def main():
         print("matplotlib non installé. pip install matplotlib pour générer les graphiques.")
         return
 
-    labels = {"first_fit": "First-Fit (J1)", "minizinc": "MiniZinc (J2)", "cpsat": "CP-SAT (J4)", "batching_cpsat": "Batching+CP-SAT"}
+    labels = {"first_fit": "First-Fit (J1)", "minizinc": "MiniZinc (J2)", "cpsat": "CP-SAT (J4)", "batching_cpsat": "Batching+CP-SAT",
+              "cpsat_presolve": "Presolve+CP-SAT", "cpsat_decomposed": "Décomposition"}
     names = [labels.get(strategy_name, strategy_name) for strategy_name in strategies]
+    colors = ["#2ecc71", "#3498db", "#9b59b6", "#e74c3c", "#f39c12", "#1abc9c"]
 
-    fig, axes = plt.subplots(1, 3, figsize=(12, 4))
-
-    # Commandes assignées
-    ax = axes[0]
-    n_assigned = [data[strategy_name].get("n_assigned", 0) for strategy_name in strategies]
-    ax.bar(names, n_assigned, color=["#2ecc71", "#3498db", "#9b59b6", "#e74c3c"])
-    ax.set_ylabel("Commandes assignées")
-    ax.set_title("Nombre de commandes assignées")
-
-    # Distance proxy
-    ax = axes[1]
-    distances = [data[strategy_name].get("distance_proxy", 0) for strategy_name in strategies]
-    ax.bar(names, distances, color=["#2ecc71", "#3498db", "#9b59b6", "#e74c3c"])
-    ax.set_ylabel("Distance (proxy)")
-    ax.set_title("Distance totale estimée")
-
-    # Coût (€)
-    ax = axes[2]
-    costs = [data[strategy_name].get("cost_euros", 0) for strategy_name in strategies]
-    ax.bar(names, costs, color=["#2ecc71", "#3498db", "#9b59b6", "#e74c3c"])
-    ax.set_ylabel("Coût (€)")
-    ax.set_title("Coût total estimé")
+    # Ligne 1 : qualité de la solution ; ligne 2 : coût de calcul (temps mur, CPU, mémoire)
+    panels = [
+        ("n_assigned", "Commandes assignées", "Nombre de commandes assignées"),
+        ("distance_proxy", "Distance (proxy)", "Distance totale estimée"),
+        ("cost_euros", "Coût (€)", "Coût total estimé"),
+        ("wall_time_sec", "Temps mur (s)", "Temps de résolution"),
+        ("cpu_time_sec", "Temps CPU (s)", "Temps CPU consommé"),
+        ("peak_rss_mb", "Pic RSS (Mo)", "Pic mémoire"),
+    ]
+    fig, axes = plt.subplots(2, 3, figsize=(14, 8))
+    for ax, (key, ylabel, title) in zip(axes.flat, panels):
+        values = [data[strategy_name].get(key, 0) for strategy_name in strategies]
+        ax.bar(names, values, color=colors[:len(names)] if len(names) <= len(colors) else None)
+        ax.set_ylabel(ylabel)
+        ax.set_title(title)
+        ax.tick_params(axis="x", rotation=30)
 
     plt.tight_layout()
     output_path = Path(__file__).parent.parent / "results" / "day4_comparison.png"
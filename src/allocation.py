@@ -1 +1,1076 @@
-# Algorithmes d'allocation
\ No newline at end of file
+"""
+Algorithmes d'allocation gloutons (repli de production quand les solveurs exacts sont trop lents).
+- Best-Fit décroissant : commandes les plus lourdes d'abord, agent dont la capacité restante colle le mieux
+- Coût minimal : chaque commande va à l'agent compatible le moins cher
+- Regret-k : on traite d'abord les commandes qui perdraient le plus à ne pas avoir leur meilleur agent
+
+Contrairement à allocate_first_fit, ces allocateurs respectent les restrictions des agents
+(matrice de faisabilité, comme CP-SAT) et les incompatibilités entre produits.
+Les agents interchangeables (mêmes restrictions, vitesse et coût) forment une classe ;
+ses agents sont répartis par groupe de conflit (mêmes produits incompatibles portés), chaque groupe
+les indexant par capacité restante (arbre équilibré, voir _CapacityIndex) : trouver le meilleur agent
+ou constater qu'aucun ne peut prendre la commande, puis mettre l'index à jour après une affectation,
+coûte O(g log m) pour g groupes de conflit (une poignée en pratique).
+"""
+from __future__ import annotations
+
+import heapq
+import math
+import random
+import time
+from bisect import bisect_left, insort
+from dataclasses import dataclass
+from itertools import islice
+from typing import Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+from src.models import Agent, Order, Product, Warehouse
+from src.constraints import build_profile_feasibility, order_conflict_sets, restriction_profile
+
+PICKING_SECONDS_PER_ITEM = 30
+_EPS = 1e-9
+
+
+def order_distance(warehouse: Warehouse, order: Order) -> int:
+    """Distance proxy d'une commande : somme des distances entrée <-> emplacements."""
+    entry = warehouse.entry_point
+    return sum(entry.manhattan(loc) for loc in order.unique_locations)
+
+
+def order_time_seconds(order: Order, agent: Agent, distance: float) -> float:
+    """Temps estimé (déplacement + 30 s de ramassage par article) d'une commande pour un agent."""
+    n_items = sum(item.quantity for item in order.items)
+    travel_sec = distance / agent.speed if agent.speed > 0 else 0.0
+    return travel_sec + n_items * PICKING_SECONDS_PER_ITEM
+
+
+def order_cost_euros(order: Order, agent: Agent, distance: float) -> float:
+    """Coût estimé (€) d'une commande pour un agent."""
+    return order_time_seconds(order, agent, distance) * agent.cost_per_hour / 3600.0
+
+
+class _Node:
+    __slots__ = ("key", "volume", "priority", "left", "right", "max_volume")
+
+    def __init__(self, key: Tuple[float, float], volume: float, priority: float) -> None:
+        self.key = key
+        self.volume = volume
+        self.priority = priority
+        self.left: Optional[_Node] = None
+        self.right: Optional[_Node] = None
+        self.max_volume = volume
+
+
+def _pull(node: _Node) -> _Node:
+    best = node.volume
+    if node.left is not None and node.left.max_volume > best:
+        best = node.left.max_volume
+    if node.right is not None and node.right.max_volume > best:
+        best = node.right.max_volume
+    node.max_volume = best
+    return node
+
+
+def _split(node: Optional[_Node], key: tuple) -> Tuple[Optional[_Node], Optional[_Node]]:
+    """(nœuds de clé < key, nœuds de clé >= key)."""
+    if node is None:
+        return None, None
+    if node.key < key:
+        node.right, right = _split(node.right, key)
+        return _pull(node), right
+    left, node.left = _split(node.left, key)
+    return left, _pull(node)
+
+
+def _merge(left: Optional[_Node], right: Optional[_Node]) -> Optional[_Node]:
+    if left is None:
+        return right
+    if right is None:
+        return left
+    if left.priority > right.priority:
+        left.right = _merge(left.right, right)
+        return _pull(left)
+    right.left = _merge(left, right.left)
+    return _pull(right)
+
+
+def _first(node: Optional[_Node], low: tuple, volume: float) -> Optional[_Node]:
+    """Premier nœud (ordre des clés) de clé >= low et de volume >= volume."""
+    if node is None or node.max_volume < volume:
+        return None
+    if node.key < low:
+        return _first(node.right, low, volume)
+    found = _first(node.left, low, volume)
+    if found is not None:
+        return found
+    if node.volume >= volume:
+        return node
+    return _first(node.right, low, volume)
+
+
+class _CapacityIndex:
+    """
+    Agents triés par (capacité poids restante, indice) dans un treap ; chaque nœud garde le volume
+    restant maximal de son sous-arbre. first() trouve en O(log m) l'agent de plus petite capacité
+    poids suffisante qui a aussi assez de volume : un agent sans volume n'est jamais examiné.
+    """
+
+    def __init__(self, seed: int = 0) -> None:
+        self.root: Optional[_Node] = None
+        self.size = 0
+        self._rng = random.Random(seed)
+
+    def insert(self, weight: float, agent_idx: int, volume: float) -> None:
+        left, right = _split(self.root, (weight, agent_idx))
+        node = _Node((weight, agent_idx), volume, self._rng.random())
+        self.root = _merge(_merge(left, node), right)
+        self.size += 1
+
+    def remove(self, weight: float, agent_idx: int) -> None:
+        left, rest = _split(self.root, (weight, agent_idx))
+        removed, right = _split(rest, (weight, agent_idx + 0.5))
+        self.root = _merge(left, right)
+        self.size -= removed is not None
+
+    def first(self, weight: float, volume: float) -> Optional[Tuple[float, int]]:
+        """Clé (poids restant, agent) du premier agent ayant poids >= weight et volume >= volume."""
+        node = _first(self.root, (weight, -1), volume)
+        return node.key if node is not None else None
+
+    def ascending_from(self, weight: float) -> Iterator[int]:
+        """Agents de capacité poids restante >= weight, de la plus petite à la plus grande."""
+        stack: List[_Node] = []
+        node = self.root
+        while node is not None:
+            if node.key < (weight, -1):
+                node = node.right
+            else:
+                stack.append(node)
+                node = node.left
+        while stack:
+            node = stack.pop()
+            yield node.key[1]
+            node = node.right
+            while node is not None:
+                stack.append(node)
+                node = node.left
+
+    def descending(self) -> Iterator[int]:
+        """Agents de la plus grande capacité poids restante à la plus petite."""
+        stack: List[_Node] = []
+        node = self.root
+        while node is not None:
+            stack.append(node)
+            node = node.right
+        while stack:
+            node = stack.pop()
+            yield node.key[1]
+            node = node.left
+            while node is not None:
+                stack.append(node)
+                node = node.right
+
+
+class _ConflictGroup:
+    """
+    Agents d'une classe qui portent les mêmes produits « à incompatibilité » : une commande est
+    compatible avec tous ou avec aucun, la compatibilité se teste donc une fois par groupe.
+    """
+
+    def __init__(self, held: frozenset, forbidden: frozenset) -> None:
+        self.held = held
+        self.forbidden = forbidden
+        self.index = _CapacityIndex()
+
+
+class _AgentClass:
+    """Agents interchangeables, indexés par capacité restante dans leur groupe de conflit (et à part les vides)."""
+
+    def __init__(self, agent_indices: List[int], speed: float, cost_per_hour: float) -> None:
+        self.agent_indices = agent_indices
+        self.speed = speed
+        self.cost_per_hour = cost_per_hour
+        self.groups: Dict[frozenset, _ConflictGroup] = {}
+        self.empty = _CapacityIndex()
+
+
+class _GreedyContext:
+    """
+    État partagé par les allocateurs gloutons : attributs des commandes précalculés,
+    matrice de faisabilité par classe d'agents, capacités restantes indexées.
+    """
+
+    def __init__(
+        self,
+        orders: List[Order],
+        agents: List[Agent],
+        products_by_id: Dict[str, Product],
+        warehouse: Warehouse,
+    ) -> None:
+        self.orders = orders
+        self.agents = agents
+        self.products_by_id = products_by_id
+        self.warehouse = warehouse
+
+        # Classes d'agents (profil de restrictions, vitesse, coût)
+        class_by_key: Dict[tuple, int] = {}
+        class_profiles: List[tuple] = []
+        self.classes: List[_AgentClass] = []
+        self.class_of_agent: List[int] = []
+        for agent_idx, agent in enumerate(agents):
+            profile = restriction_profile(agent)
+            key = (profile, agent.speed, agent.cost_per_hour)
+            if key not in class_by_key:
+                class_by_key[key] = len(self.classes)
+                class_profiles.append(profile)
+                self.classes.append(_AgentClass([], agent.speed, agent.cost_per_hour))
+            class_idx = class_by_key[key]
+            self.classes[class_idx].agent_indices.append(agent_idx)
+            self.class_of_agent.append(class_idx)
+        self.class_profiles = class_profiles
+
+        # Incompatibilités : produits portés par l'agent / produits qu'il ne peut plus accepter
+        self.held: List[Set[str]] = [set() for _ in agents]
+        self.forbidden: List[Set[str]] = [set() for _ in agents]
+        # Commandes portées par agent, dont celles incompatibles avec elles-mêmes (comme CP-SAT et
+        # MiniZinc : une telle commande voyage seule, sur un agent vide qu'elle bloque ensuite)
+        self.n_carried = [len(agent.assigned_orders) for agent in agents]
+        self.n_exclusive = [0] * len(agents)
+        # Seuls les produits cités dans une incompatibilité distinguent deux agents d'une même classe
+        conflict_products: Set[str] = set()
+        for product in products_by_id.values():
+            if product.incompatible_with:
+                conflict_products.add(product.id)
+                conflict_products.update(product.incompatible_with)
+        self.conflict_products = frozenset(conflict_products)
+        self.signature: List[Optional[frozenset]] = [None] * len(agents)
+
+        # Capacités restantes (tient compte d'éventuelles affectations déjà faites), indexées par classe
+        self.rem_w = [agent.capacity_weight - agent.used_weight for agent in agents]
+        self.rem_v = [agent.capacity_volume - agent.used_volume for agent in agents]
+        self.enabled = [True] * len(agents)
+        for agent_idx in range(len(agents)):
+            self._index(agent_idx)
+
+        # Attributs des commandes
+        self.weight = [order.total_weight for order in orders]
+        self.volume = [order.total_volume for order in orders]
+        self.distance = [order_distance(warehouse, order) for order in orders]
+        self.n_items = [sum(item.quantity for item in order.items) for order in orders]
+        self.pids: List[frozenset] = []
+        self.incompatible: List[frozenset] = []
+        for order in orders:
+            pids, incompatible = self._product_sets(order)
+            self.pids.append(pids)
+            self.incompatible.append(incompatible)
+        self.self_incompatible: List[bool] = order_conflict_sets(orders, products_by_id)[2]
+
+        # Faisabilité : une colonne par classe suffit (agents d'une classe = même profil)
+        matrix = build_profile_feasibility(orders, class_profiles, warehouse, products_by_id)
+        self.allowed_classes: List[List[int]] = [
+            [class_idx for class_idx, allowed in enumerate(row) if allowed]
+            for row in matrix
+        ]
+
+    def _product_sets(self, order: Order) -> Tuple[frozenset, frozenset]:
+        """(produits de la commande, produits incompatibles avec eux)."""
+        pids = frozenset(item.product_id for item in order.items)
+        incompatible: Set[str] = set()
+        for pid in pids:
+            product = self.products_by_id.get(pid)
+            if product is not None:
+                incompatible.update(product.incompatible_with)
+        return pids, frozenset(incompatible)
+
+    def add_order(self, order: Order) -> int:
+        """Ajoute une commande arrivée en cours de route (non assignée) ; retourne son indice."""
+        order_idx = len(self.orders)
+        self.orders.append(order)
+        self.weight.append(order.total_weight)
+        self.volume.append(order.total_volume)
+        self.distance.append(order_distance(self.warehouse, order))
+        self.n_items.append(sum(item.quantity for item in order.items))
+        pids, incompatible = self._product_sets(order)
+        self.pids.append(pids)
+        self.incompatible.append(incompatible)
+        self.self_incompatible.append(order_conflict_sets([order], self.products_by_id)[2][0])
+        row = build_profile_feasibility([order], self.class_profiles, self.warehouse, self.products_by_id)[0]
+        self.allowed_classes.append([class_idx for class_idx, allowed in enumerate(row) if allowed])
+        return order_idx
+
+    def disable_agent(self, agent_idx: int) -> None:
+        """Retire un agent des index de capacité : il ne reçoit plus aucune commande."""
+        if self.enabled[agent_idx]:
+            self._unindex(agent_idx)
+            self.enabled[agent_idx] = False
+
+    def _index(self, agent_idx: int) -> None:
+        # Un agent bloqué par une commande exclusive ne peut plus rien recevoir : il sort des index
+        if self.n_exclusive[agent_idx]:
+            return
+        agent_class = self.classes[self.class_of_agent[agent_idx]]
+        signature = self.conflict_products.intersection(self.held[agent_idx])
+        group = agent_class.groups.get(signature)
+        if group is None:
+            forbidden: Set[str] = set()
+            for pid in signature:
+                product = self.products_by_id.get(pid)
+                if product is not None:
+                    forbidden.update(product.incompatible_with)
+            group = agent_class.groups[signature] = _ConflictGroup(signature, frozenset(forbidden))
+        group.index.insert(self.rem_w[agent_idx], agent_idx, self.rem_v[agent_idx])
+        self.signature[agent_idx] = signature
+        if not self.n_carried[agent_idx]:
+            agent_class.empty.insert(self.rem_w[agent_idx], agent_idx, self.rem_v[agent_idx])
+
+    def _unindex(self, agent_idx: int) -> None:
+        signature = self.signature[agent_idx]
+        if signature is None:
+            return
+        agent_class = self.classes[self.class_of_agent[agent_idx]]
+        agent_class.groups[signature].index.remove(self.rem_w[agent_idx], agent_idx)
+        self.signature[agent_idx] = None
+        if not self.n_carried[agent_idx]:
+            agent_class.empty.remove(self.rem_w[agent_idx], agent_idx)
+
+    def cost(self, order_idx: int, class_idx: int) -> float:
+        agent_class = self.classes[class_idx]
+        travel_sec = self.distance[order_idx] / agent_class.speed if agent_class.speed > 0 else 0.0
+        time_sec = travel_sec + self.n_items[order_idx] * PICKING_SECONDS_PER_ITEM
+        return time_sec * agent_class.cost_per_hour / 3600.0
+
+    def shares_allowed(self, order_idx: int, agent_idx: int) -> bool:
+        """False si l'agent porte une commande exclusive, ou si la commande est exclusive et l'agent non vide."""
+        if self.n_exclusive[agent_idx]:
+            return False
+        return not (self.self_incompatible[order_idx] and self.n_carried[agent_idx])
+
+    def compatible(self, order_idx: int, agent_idx: int) -> bool:
+        if not self.shares_allowed(order_idx, agent_idx):
+            return False
+        held = self.held[agent_idx]
+        if not held:
+            return True
+        return self.pids[order_idx].isdisjoint(self.forbidden[agent_idx]) and self.incompatible[order_idx].isdisjoint(held)
+
+    def fits(self, order_idx: int, agent_idx: int) -> bool:
+        return (
+            self.rem_w[agent_idx] + _EPS >= self.weight[order_idx]
+            and self.rem_v[agent_idx] + _EPS >= self.volume[order_idx]
+            and self.compatible(order_idx, agent_idx)
+        )
+
+    def find_agent(self, order_idx: int, class_idx: int) -> Optional[int]:
+        """
+        Agent de la classe avec la plus petite capacité poids restante suffisante (best-fit) parmi ceux
+        qui ont assez de volume et sont compatibles ; None seulement si aucun agent de la classe ne convient.
+        """
+        agent_class = self.classes[class_idx]
+        weight, volume = self.weight[order_idx] - _EPS, self.volume[order_idx] - _EPS
+        # Une commande exclusive ne cherche que parmi les agents vides
+        if self.self_incompatible[order_idx]:
+            key = agent_class.empty.first(weight, volume)
+            return key[1] if key is not None else None
+        pids, incompatible = self.pids[order_idx], self.incompatible[order_idx]
+        best = None
+        for group in agent_class.groups.values():
+            if not group.index.size or not (pids.isdisjoint(group.forbidden) and incompatible.isdisjoint(group.held)):
+                continue
+            key = group.index.first(weight, volume)
+            if key is not None and (best is None or key < best):
+                best = key
+        return best[1] if best is not None else None
+
+    def _update_capacity(
+        self, agent_idx: int, delta_weight: float, delta_volume: float, delta_orders: int = 0, delta_exclusive: int = 0,
+    ) -> None:
+        """Met à jour les capacités restantes (et le nombre de commandes) d'un agent et sa place dans les index."""
+        if self.enabled[agent_idx]:
+            self._unindex(agent_idx)
+        self.rem_w[agent_idx] += delta_weight
+        self.rem_v[agent_idx] += delta_volume
+        self.n_carried[agent_idx] += delta_orders
+        self.n_exclusive[agent_idx] += delta_exclusive
+        if self.enabled[agent_idx]:
+            self._index(agent_idx)
+
+    def assign(self, order_idx: int, agent_idx: int) -> None:
+        self.held[agent_idx].update(self.pids[order_idx])
+        self.forbidden[agent_idx].update(self.incompatible[order_idx])
+        self._update_capacity(
+            agent_idx, -self.weight[order_idx], -self.volume[order_idx], 1, int(self.self_incompatible[order_idx]),
+        )
+
+    def options(self, order_idx: int, k: int) -> List[Tuple[float, int]]:
+        """Les k meilleures options (coût, agent) parmi les classes autorisées ayant un agent libre."""
+        ranked = sorted(self.allowed_classes[order_idx], key=lambda class_idx: self.cost(order_idx, class_idx))
+        found: List[Tuple[float, int]] = []
+        for class_idx in ranked:
+            agent_idx = self.find_agent(order_idx, class_idx)
+            if agent_idx is not None:
+                found.append((self.cost(order_idx, class_idx), agent_idx))
+                if len(found) == k:
+                    break
+        return found
+
+
+def _finalize(context: _GreedyContext, chosen: List[Optional[int]]) -> Dict[str, Optional[str]]:
+    """Applique les choix aux agents (agent.assign) et retourne {order_id: agent_id or None}."""
+    assignment: Dict[str, Optional[str]] = {}
+    for order_idx, order in enumerate(context.orders):
+        agent_idx = chosen[order_idx]
+        if agent_idx is None:
+            assignment[order.id] = None
+        else:
+            agent = context.agents[agent_idx]
+            agent.assign(order)
+            assignment[order.id] = agent.id
+    return assignment
+
+
+def _priority_key(order: Order) -> Tuple[int, str]:
+    """Express d'abord, puis deadline la plus proche."""
+    return (0 if order.priority == "express" else 1, order.deadline.zfill(5))
+
+
+def allocate_best_fit_decreasing(
+    orders: List[Order],
+    agents: List[Agent],
+    products_by_id: Dict[str, Product],
+    warehouse: Warehouse,
+) -> Dict[str, Optional[str]]:
+    """
+    Best-Fit décroissant : commandes triées par poids décroissant, chacune va à l'agent
+    autorisé dont la capacité restante après ajout est la plus faible.
+
+    Returns:
+        {order_id: agent_id or None}
+    """
+    context = _GreedyContext(orders, agents, products_by_id, warehouse)
+    chosen: List[Optional[int]] = [None] * len(orders)
+    order_indices = sorted(range(len(orders)), key=lambda i: (-context.weight[i], -context.volume[i]))
+    for order_idx in order_indices:
+        best_agent = None
+        best_remaining = None
+        for class_idx in context.allowed_classes[order_idx]:
+            agent_idx = context.find_agent(order_idx, class_idx)
+            if agent_idx is None:
+                continue
+            remaining = context.rem_w[agent_idx] - context.weight[order_idx]
+            if best_remaining is None or remaining < best_remaining:
+                best_agent, best_remaining = agent_idx, remaining
+        if best_agent is not None:
+            context.assign(order_idx, best_agent)
+            chosen[order_idx] = best_agent
+    return _finalize(context, chosen)
+
+
+def allocate_cheapest_cost(
+    orders: List[Order],
+    agents: List[Agent],
+    products_by_id: Dict[str, Product],
+    warehouse: Warehouse,
+) -> Dict[str, Optional[str]]:
+    """
+    Coût minimal : commandes traitées par priorité (express puis deadline), chacune
+    assignée à l'agent autorisé le moins cher qui a encore la capacité.
+
+    Returns:
+        {order_id: agent_id or None}
+    """
+    context = _GreedyContext(orders, agents, products_by_id, warehouse)
+    chosen: List[Optional[int]] = [None] * len(orders)
+    order_indices = sorted(range(len(orders)), key=lambda i: _priority_key(orders[i]))
+    for order_idx in order_indices:
+        found = context.options(order_idx, k=1)
+        if found:
+            _, agent_idx = found[0]
+            context.assign(order_idx, agent_idx)
+            chosen[order_idx] = agent_idx
+    return _finalize(context, chosen)
+
+
+def allocate_regret(
+    orders: List[Order],
+    agents: List[Agent],
+    products_by_id: Dict[str, Product],
+    warehouse: Warehouse,
+    k: int = 2,
+) -> Dict[str, Optional[str]]:
+    """
+    Insertion par regret-k : à chaque étape, on assigne la commande dont le regret
+    (somme des surcoûts de ses k-1 options suivantes par rapport à la meilleure) est maximal.
+    Une commande qui n'a plus qu'une option passe en premier.
+
+    Les regrets sont réévalués paresseusement (tas) : seule la commande en tête est recalculée.
+
+    Returns:
+        {order_id: agent_id or None}
+    """
+    context = _GreedyContext(orders, agents, products_by_id, warehouse)
+    return _finalize(context, _regret_fill(context, k))
+
+
+def _regret_fill(context: _GreedyContext, k: int = 2) -> List[Optional[int]]:
+    """Insertion regret-k sur un contexte ; retourne l'indice d'agent choisi par commande."""
+    chosen: List[Optional[int]] = [None] * len(context.orders)
+    k = max(2, k)
+
+    def regret_of(found: List[Tuple[float, int]]) -> float:
+        if len(found) == 1:
+            return float("inf")
+        # Chaque option manquante (moins de k classes possibles) compte comme un surcoût très élevé
+        missing = k - len(found)
+        return sum(cost - found[0][0] for cost, _ in found[1:]) + missing * 1e6
+
+    heap: List[Tuple[float, int, int]] = []
+    for order_idx in range(len(context.orders)):
+        found = context.options(order_idx, k)
+        if found:
+            heap.append((-regret_of(found), found[0][0], order_idx))
+    heapq.heapify(heap)
+
+    while heap:
+        neg_regret, _, order_idx = heapq.heappop(heap)
+        found = context.options(order_idx, k)
+        if not found:
+            continue
+        regret = regret_of(found)
+        if heap and regret < -heap[0][0] and regret != -neg_regret:
+            # Le regret a baissé depuis l'insertion : on la remet à sa place
+            heapq.heappush(heap, (-regret, found[0][0], order_idx))
+            continue
+        _, agent_idx = found[0]
+        context.assign(order_idx, agent_idx)
+        chosen[order_idx] = agent_idx
+    return chosen
+
+
+# =========================
+# ALNS (Adaptive Large Neighbourhood Search)
+# =========================
+
+# Destroy/repair : taille de voisinage bornée => coût d'une itération indépendant du nombre de commandes
+_ALNS_CANDIDATES = 8          # agents examinés par classe et par côté de l'index pour une insertion
+_ALNS_MAX_REMOVED = 40        # commandes retirées au plus par destroy
+_ALNS_SEGMENT = 50            # itérations entre deux mises à jour des poids adaptatifs
+_ALNS_REACTION = 0.2          # vitesse d'adaptation des poids des opérateurs
+# Récompenses : nouvelle meilleure solution, amélioration, solution moins bonne acceptée
+_ALNS_REWARDS = (33.0, 9.0, 13.0)
+_CPSAT_REPAIR_MAX_ORDERS = 30
+
+
+@dataclass
+class ScoreWeights:
+    """Poids w1..w5 du score du README, plus la pénalité de complétude."""
+    distance: float = 1.0      # w1 : par unité de distance (proxy entrée <-> emplacements)
+    time: float = 1.0          # w2 : par minute de travail
+    cost: float = 1.0          # w3 : par euro
+    imbalance: float = 1.0     # w4 : écart-type des temps de travail des agents (minutes)
+    lateness: float = 1.0      # w5 : par minute de retard cumulé
+    unassigned: float = 1000.0  # par commande non assignée (toutes doivent être préparées)
+
+
+def _hhmm_to_seconds(hhmm: str) -> int:
+    h, m = hhmm.split(":")
+    return int(h) * 3600 + int(m) * 60
+
+
+def _add_counts(counts: Dict[str, int], keys) -> None:
+    for key in keys:
+        counts[key] = counts.get(key, 0) + 1
+
+
+def _remove_counts(counts: Dict[str, int], keys) -> None:
+    for key in keys:
+        remaining = counts[key] - 1
+        if remaining:
+            counts[key] = remaining
+        else:
+            del counts[key]
+
+
+class _AlnsState(_GreedyContext):
+    """
+    Solution courante de l'ALNS : affectations réversibles et agrégats par agent
+    (temps, retard, deadlines triées) pour des deltas de score incrémentaux.
+
+    Le temps d'un agent est la somme des temps de ses commandes ; comme check_deadlines,
+    toutes ses commandes sont considérées terminées à la fin de sa tournée.
+    """
+
+    def __init__(
+        self,
+        orders: List[Order],
+        agents: List[Agent],
+        products_by_id: Dict[str, Product],
+        warehouse: Warehouse,
+        weights: ScoreWeights,
+    ) -> None:
+        super().__init__(orders, agents, products_by_id, warehouse)
+        self.weights = weights
+        # Compteurs (et non ensembles) : un produit peut être libéré par un retrait
+        self.held: List[Dict[str, int]] = [{} for _ in agents]
+        self.forbidden: List[Dict[str, int]] = [{} for _ in agents]
+
+        self.agent_of: List[Optional[int]] = [None] * len(orders)
+        self.deadline_sec = [_hhmm_to_seconds(order.deadline) for order in orders]
+        self.start_sec = min((_hhmm_to_seconds(order.received_time) for order in orders), default=0)
+        self.deadlines: List[List[int]] = [[] for _ in agents]
+        self.time_sec = [0.0] * len(agents)
+        self.lateness_sec = [0.0] * len(agents)
+
+        self.total_distance = 0.0
+        self.sum_time = 0.0
+        self.sum_time_sq = 0.0
+        self.total_cost = 0.0
+        self.total_lateness = 0.0
+        self.n_unassigned = len(orders)
+        self.current_score = self.score()
+
+    def add_order(self, order: Order) -> int:
+        order_idx = super().add_order(order)
+        self.agent_of.append(None)
+        self.deadline_sec.append(_hhmm_to_seconds(order.deadline))
+        self.n_unassigned += 1
+        self.current_score = self.score()
+        return order_idx
+
+    # --- Score ---
+
+    def _objective(
+        self,
+        total_distance: float,
+        sum_time: float,
+        sum_time_sq: float,
+        total_cost: float,
+        total_lateness: float,
+        n_unassigned: int,
+    ) -> float:
+        weights = self.weights
+        n_agents = len(self.agents)
+        mean = sum_time / n_agents
+        std_dev = math.sqrt(max(0.0, sum_time_sq / n_agents - mean * mean))
+        return (
+            weights.distance * total_distance
+            + weights.time * sum_time / 60.0
+            + weights.cost * total_cost
+            + weights.imbalance * std_dev / 60.0
+            + weights.lateness * total_lateness / 60.0
+            + weights.unassigned * n_unassigned
+        )
+
+    def score(self) -> float:
+        return self._objective(
+            self.total_distance, self.sum_time, self.sum_time_sq,
+            self.total_cost, self.total_lateness, self.n_unassigned,
+        )
+
+    def order_time(self, order_idx: int, agent_idx: int) -> float:
+        agent_class = self.classes[self.class_of_agent[agent_idx]]
+        travel_sec = self.distance[order_idx] / agent_class.speed if agent_class.speed > 0 else 0.0
+        return travel_sec + self.n_items[order_idx] * PICKING_SECONDS_PER_ITEM
+
+    def _lateness(self, deadlines: List[int], finish: float) -> float:
+        """Retard cumulé (s) des commandes dont la deadline est avant la fin de tournée."""
+        k = bisect_left(deadlines, finish)
+        return k * finish - sum(deadlines[:k])
+
+    def _delta(self, order_idx: int, agent_idx: int, sign: int) -> Tuple[float, float, float]:
+        """(nouveau temps, nouveau retard, nouveau score) si on ajoute (+1) / retire (-1) la commande."""
+        duration = self.order_time(order_idx, agent_idx)
+        old_time = self.time_sec[agent_idx]
+        new_time = old_time + sign * duration
+        finish = self.start_sec + new_time
+        deadlines = self.deadlines[agent_idx]
+        new_lateness = self._lateness(deadlines, finish)
+        own_lateness = max(0.0, finish - self.deadline_sec[order_idx])
+        # La commande retirée est encore dans la liste : on enlève sa contribution
+        new_lateness += own_lateness if sign > 0 else -own_lateness
+        cost_per_hour = self.classes[self.class_of_agent[agent_idx]].cost_per_hour
+        new_score = self._objective(
+            self.total_distance + sign * self.distance[order_idx],
+            self.sum_time + sign * duration,
+            self.sum_time_sq - old_time * old_time + new_time * new_time,
+            self.total_cost + sign * duration * cost_per_hour / 3600.0,
+            self.total_lateness - self.lateness_sec[agent_idx] + new_lateness,
+            self.n_unassigned - sign,
+        )
+        return new_time, new_lateness, new_score
+
+    def insertion_delta(self, order_idx: int, agent_idx: int) -> float:
+        return self._delta(order_idx, agent_idx, +1)[2] - self.current_score
+
+    def removal_delta(self, order_idx: int) -> float:
+        return self._delta(order_idx, self.agent_of[order_idx], -1)[2] - self.current_score
+
+    # --- Mouvements ---
+
+    def compatible(self, order_idx: int, agent_idx: int) -> bool:
+        if not self.shares_allowed(order_idx, agent_idx):
+            return False
+        held = self.held[agent_idx]
+        if not held:
+            return True
+        forbidden = self.forbidden[agent_idx]
+        return (
+            not any(pid in forbidden for pid in self.pids[order_idx])
+            and not any(pid in held for pid in self.incompatible[order_idx])
+        )
+
+    def _apply(self, order_idx: int, agent_idx: int, sign: int) -> None:
+        new_time, new_lateness, new_score = self._delta(order_idx, agent_idx, sign)
+        duration = self.order_time(order_idx, agent_idx)
+        old_time = self.time_sec[agent_idx]
+        cost_per_hour = self.classes[self.class_of_agent[agent_idx]].cost_per_hour
+        self.total_distance += sign * self.distance[order_idx]
+        self.sum_time += sign * duration
+        self.sum_time_sq += new_time * new_time - old_time * old_time
+        self.total_cost += sign * duration * cost_per_hour / 3600.0
+        self.total_lateness += new_lateness - self.lateness_sec[agent_idx]
+        self.n_unassigned -= sign
+        self.time_sec[agent_idx] = new_time
+        self.lateness_sec[agent_idx] = new_lateness
+        self.current_score = new_score
+        self._update_capacity(
+            agent_idx, -sign * self.weight[order_idx], -sign * self.volume[order_idx],
+            sign, sign * int(self.self_incompatible[order_idx]),
+        )
+
+    def assign(self, order_idx: int, agent_idx: int) -> None:
+        # Produits mis à jour avant _apply : l'agent est réindexé dans son nouveau groupe de conflit
+        _add_counts(self.held[agent_idx], self.pids[order_idx])
+        _add_counts(self.forbidden[agent_idx], self.incompatible[order_idx])
+        self._apply(order_idx, agent_idx, +1)
+        insort(self.deadlines[agent_idx], self.deadline_sec[order_idx])
+        self.agent_of[order_idx] = agent_idx
+
+    def unassign(self, order_idx: int) -> None:
+        agent_idx = self.agent_of[order_idx]
+        _remove_counts(self.held[agent_idx], self.pids[order_idx])
+        _remove_counts(self.forbidden[agent_idx], self.incompatible[order_idx])
+        self._apply(order_idx, agent_idx, -1)
+        deadlines = self.deadlines[agent_idx]
+        del deadlines[bisect_left(deadlines, self.deadline_sec[order_idx])]
+        self.agent_of[order_idx] = None
+
+    def best_insertions(self, order_idx: int, n: int = 2) -> List[Tuple[float, int]]:
+        """Les n meilleures insertions (delta de score, agent) parmi un voisinage borné d'agents."""
+        weight = self.weight[order_idx]
+        seen: Set[int] = set()
+        found: List[Tuple[float, int]] = []
+        for class_idx in self.allowed_classes[order_idx]:
+            for group in self.classes[class_idx].groups.values():
+                index = group.index
+                nearest = list(islice(index.ascending_from(weight - _EPS), _ALNS_CANDIDATES))
+                for agent_idx in nearest + list(islice(index.descending(), _ALNS_CANDIDATES)):
+                    if agent_idx in seen or not self.fits(order_idx, agent_idx):
+                        continue
+                    seen.add(agent_idx)
+                    found.append((self.insertion_delta(order_idx, agent_idx), agent_idx))
+        return heapq.nsmallest(n, found)
+
+
+class _Alns:
+    """Boucle ALNS : opérateurs destroy/repair pondérés adaptativement, acceptation par recuit simulé."""
+
+    def __init__(self, state: _AlnsState, rng: random.Random, use_cpsat_repair: bool) -> None:
+        self.state = state
+        self.rng = rng
+        n_orders = len(state.orders)
+        self.by_deadline = sorted(range(n_orders), key=lambda i: state.deadline_sec[i])
+        self.orders_by_zone = self._group_orders_by_zone()
+        self._removed_from: List[Optional[int]] = []
+
+        self.destroy_ops: List[Callable[[int], List[int]]] = [
+            self.destroy_random, self.destroy_worst, self.destroy_zone, self.destroy_deadline,
+        ]
+        self.repair_ops: List[Callable[[List[int]], None]] = [self.repair_greedy, self.repair_regret]
+        if use_cpsat_repair:
+            from src.allocation_cpsat import CPSAT_AVAILABLE
+            if CPSAT_AVAILABLE:
+                self.repair_ops.append(self.repair_cpsat)
+
+    def _group_orders_by_zone(self) -> List[List[int]]:
+        """Zone principale de chaque commande = zone la plus proche de son premier emplacement."""
+        state = self.state
+        zone_coords = [
+            (loc, zone_name) for zone_name, locs in state.warehouse.zones.items() for loc in locs
+        ]
+        groups: Dict[str, List[int]] = {}
+        for order_idx, order in enumerate(state.orders):
+            if not order.unique_locations or not zone_coords:
+                zone_name = "?"
+            else:
+                first = order.unique_locations[0]
+                zone_name = min(zone_coords, key=lambda pair: pair[0].manhattan(first))[1]
+            groups.setdefault(zone_name, []).append(order_idx)
+        return list(groups.values())
+
+    # --- Destroy ---
+
+    def _sample_assigned(self, n: int, population: Optional[List[int]] = None) -> List[int]:
+        """Tirage (avec rejet) de n commandes assignées distinctes ; O(n) en moyenne."""
+        state = self.state
+        population = population if population is not None else range(len(state.orders))
+        picked: Set[int] = set()
+        for _ in range(4 * n):
+            order_idx = population[self.rng.randrange(len(population))]
+            if state.agent_of[order_idx] is not None:
+                picked.add(order_idx)
+                if len(picked) == n:
+                    break
+        return list(picked)
+
+    def _remove(self, order_indices: List[int]) -> List[int]:
+        # Agents d'origine conservés pour pouvoir annuler le mouvement en cas de rejet
+        self._removed_from = [self.state.agent_of[order_idx] for order_idx in order_indices]
+        for order_idx in order_indices:
+            self.state.unassign(order_idx)
+        return order_indices
+
+    def destroy_random(self, q: int) -> List[int]:
+        return self._remove(self._sample_assigned(q))
+
+    def destroy_worst(self, q: int) -> List[int]:
+        """Retire les commandes qui coûtent le plus (échantillon de 4q, tirage biaisé p=3)."""
+        state = self.state
+        sample = self._sample_assigned(4 * q)
+        ranked = sorted(sample, key=state.removal_delta)
+        removed: List[int] = []
+        while ranked and len(removed) < q:
+            removed.append(ranked.pop(int(len(ranked) * self.rng.random() ** 3)))
+        return self._remove(removed)
+
+    def destroy_zone(self, q: int) -> List[int]:
+        group = self.orders_by_zone[self.rng.randrange(len(self.orders_by_zone))]
+        return self._remove(self._sample_assigned(q, group))
+
+    def destroy_deadline(self, q: int) -> List[int]:
+        """Retire des commandes de deadlines voisines d'une commande pivot."""
+        state = self.state
+        n_orders = len(self.by_deadline)
+        pivot = self.rng.randrange(n_orders)
+        removed: List[int] = []
+        for offset in range(min(n_orders, 10 * q)):
+            order_idx = self.by_deadline[(pivot + offset) % n_orders]
+            if state.agent_of[order_idx] is not None:
+                removed.append(order_idx)
+                if len(removed) == q:
+                    break
+        return self._remove(removed)
+
+    # --- Repair ---
+
+    def repair_greedy(self, pool: List[int]) -> None:
+        state = self.state
+        self.rng.shuffle(pool)
+        for order_idx in pool:
+            found = state.best_insertions(order_idx, n=1)
+            if found and found[0][0] < 0:
+                state.assign(order_idx, found[0][1])
+
+    def repair_regret(self, pool: List[int]) -> None:
+        """Regret-2 sur le pool ; seules les commandes dont une option touchait l'agent modifié sont réévaluées."""
+        state = self.state
+        options = {order_idx: state.best_insertions(order_idx, n=2) for order_idx in pool}
+        while options:
+            def regret(order_idx: int) -> float:
+                found = options[order_idx]
+                if not found:
+                    return -math.inf
+                return found[1][0] - found[0][0] if len(found) > 1 else math.inf
+            order_idx = max(options, key=regret)
+            found = options.pop(order_idx)
+            if not found or found[0][0] >= 0:
+                continue
+            agent_idx = found[0][1]
+            state.assign(order_idx, agent_idx)
+            for other, other_found in options.items():
+                if any(candidate == agent_idx for _, candidate in other_found):
+                    options[other] = state.best_insertions(other, n=2)
+
+    def repair_cpsat(self, pool: List[int]) -> None:
+        """Petit voisinage : CP-SAT sur les agents candidats (capacités résiduelles), puis glouton."""
+        from dataclasses import replace
+        from src.allocation_cpsat import allocate_with_cpsat
+
+        state = self.state
+        if len(pool) > _CPSAT_REPAIR_MAX_ORDERS:
+            self.repair_greedy(pool)
+            return
+        candidates: List[int] = []
+        for order_idx in pool:
+            for _, agent_idx in state.best_insertions(order_idx, n=3):
+                if agent_idx not in candidates:
+                    candidates.append(agent_idx)
+        if candidates:
+            residual_agents = [
+                replace(
+                    state.agents[agent_idx],
+                    capacity_weight=max(0.0, state.rem_w[agent_idx]),
+                    capacity_volume=max(0.0, state.rem_v[agent_idx]),
+                    assigned_orders=[], used_weight=0.0, used_volume=0.0,
+                )
+                for agent_idx in candidates
+            ]
+            index_of = {state.agents[agent_idx].id: agent_idx for agent_idx in candidates}
+            sub_assignment = allocate_with_cpsat(
+                [state.orders[order_idx] for order_idx in pool], residual_agents,
+                state.products_by_id, state.warehouse, objective="assign", time_limit_seconds=1,
+            )
+            for order_idx in pool:
+                agent_idx = index_of.get(sub_assignment.get(state.orders[order_idx].id))
+                # CP-SAT ignore les produits déjà portés par l'agent : on revérifie
+                if agent_idx is not None and state.fits(order_idx, agent_idx):
+                    state.assign(order_idx, agent_idx)
+        self.repair_greedy([order_idx for order_idx in pool if state.agent_of[order_idx] is None])
+
+    # --- Boucle principale ---
+
+    def _pick(self, weights: List[float]) -> int:
+        threshold = self.rng.random() * sum(weights)
+        for idx, weight in enumerate(weights):
+            threshold -= weight
+            if threshold <= 0:
+                return idx
+        return len(weights) - 1
+
+    def _unassigned_sample(self, n: int) -> List[int]:
+        state = self.state
+        if state.n_unassigned == 0:
+            return []
+        picked: Set[int] = set()
+        for _ in range(4 * n):
+            order_idx = self.rng.randrange(len(state.orders))
+            if state.agent_of[order_idx] is None:
+                picked.add(order_idx)
+                if len(picked) == n:
+                    break
+        return list(picked)
+
+    def run(self, time_limit_seconds: float, max_iterations: Optional[int]) -> List[Optional[int]]:
+        state, rng = self.state, self.rng
+        best = list(state.agent_of)
+        best_score = current_score = state.current_score
+        n_orders = len(state.orders)
+        q_max = max(1, min(_ALNS_MAX_REMOVED, n_orders // 5))
+        q_min = max(1, q_max // 4)
+
+        # Température initiale : une dégradation de 0,5 % est acceptée avec probabilité 1/2
+        t_start = max(1e-6, 0.005 * abs(current_score) / math.log(2))
+        t_end = t_start / 1000.0
+
+        d_weights = [1.0] * len(self.destroy_ops)
+        r_weights = [1.0] * len(self.repair_ops)
+        d_scores, d_uses = [0.0] * len(d_weights), [0] * len(d_weights)
+        r_scores, r_uses = [0.0] * len(r_weights), [0] * len(r_weights)
+
+        started = time.perf_counter()
+        iteration = 0
+        while True:
+            elapsed = time.perf_counter() - started
+            progress = elapsed / time_limit_seconds if time_limit_seconds > 0 else 1.0
+            if max_iterations is not None:
+                progress = max(progress, iteration / max_iterations) if max_iterations > 0 else 1.0
+            if progress >= 1.0:
+                break
+            temperature = t_start * (t_end / t_start) ** progress
+            iteration += 1
+
+            d_idx, r_idx = self._pick(d_weights), self._pick(r_weights)
+            q = rng.randint(q_min, q_max)
+            removed = self.destroy_ops[d_idx](q)
+            # Le pool de réinsertion inclut aussi quelques commandes restées non assignées
+            removed_set = set(removed)
+            pool = removed + [
+                order_idx for order_idx in self._unassigned_sample(max(1, q // 2)) if order_idx not in removed_set
+            ]
+            self.repair_ops[r_idx](pool)
+
+            new_score = state.current_score
+            reward = 0.0
+            if new_score < best_score - 1e-9:
+                best, best_score = list(state.agent_of), new_score
+                current_score = new_score
+                reward = _ALNS_REWARDS[0]
+            elif new_score < current_score - 1e-9:
+                current_score = new_score
+                reward = _ALNS_REWARDS[1]
+            elif rng.random() < math.exp(-(new_score - current_score) / temperature):
+                current_score = new_score
+                reward = _ALNS_REWARDS[2]
+            else:
+                # Rejet : on annule le repair puis le destroy
+                for order_idx in pool:
+                    if state.agent_of[order_idx] is not None:
+                        state.unassign(order_idx)
+                for order_idx, agent_idx in zip(removed, self._removed_from):
+                    state.assign(order_idx, agent_idx)
+
+            d_scores[d_idx] += reward
+            d_uses[d_idx] += 1
+            r_scores[r_idx] += reward
+            r_uses[r_idx] += 1
+            if iteration % _ALNS_SEGMENT == 0:
+                for op_weights, op_scores, op_uses in ((d_weights, d_scores, d_uses), (r_weights, r_scores, r_uses)):
+                    for idx in range(len(op_weights)):
+                        if op_uses[idx]:
+                            op_weights[idx] = max(
+                                0.05,
+                                (1 - _ALNS_REACTION) * op_weights[idx] + _ALNS_REACTION * op_scores[idx] / op_uses[idx],
+                            )
+                        op_scores[idx], op_uses[idx] = 0.0, 0
+        return best
+
+
+def allocate_alns(
+    orders: List[Order],
+    agents: List[Agent],
+    products_by_id: Dict[str, Product],
+    warehouse: Warehouse,
+    time_limit_seconds: float = 10.0,
+    weights: Optional[ScoreWeights] = None,
+    seed: int = 0,
+    max_iterations: Optional[int] = None,
+    use_cpsat_repair: bool = False,
+) -> Dict[str, Optional[str]]:
+    """
+    Allocation par ALNS (Adaptive Large Neighbourhood Search), pour les grosses journées
+    où CP-SAT et MiniZinc ne terminent pas.
+
+    - Solution initiale : regret-2
+    - Destroy : aléatoire, pires coûts, même zone, deadlines voisines
+    - Repair : glouton, regret-2 (et CP-SAT sur les petits voisinages si use_cpsat_repair)
+    - Acceptation : recuit simulé, température décroissante avec le temps écoulé
+    - Score du README (distance, temps, coût, déséquilibre, retard) évalué par deltas incrémentaux
+
+    Une itération touche au plus quelques dizaines de commandes : le coût total est
+    linéaire en nombre de commandes (construction) plus le budget de temps.
+
+    Returns:
+        {order_id: agent_id or None}
+    """
+    if not orders or not agents:
+        return {order.id: None for order in orders}
+    started = time.perf_counter()
+    state = _AlnsState(orders, agents, products_by_id, warehouse, weights or ScoreWeights())
+    _regret_fill(state)
+    search = _Alns(state, random.Random(seed), use_cpsat_repair)
+    # Le budget couvre aussi la construction de la solution initiale
+    remaining = max(0.0, time_limit_seconds - (time.perf_counter() - started))
+    best = search.run(remaining, max_iterations)
+    return _finalize(state, best)
+
+
+# Allocateurs gloutons disponibles (main.py --alloc, app.py ?alloc=...)
+GREEDY_ALLOCATORS: Dict[str, Callable[..., Dict[str, Optional[str]]]] = {
+    "best_fit": allocate_best_fit_decreasing,
+    "cheapest": allocate_cheapest_cost,
+    "regret": allocate_regret,
+}
+
+# Allocateurs heuristiques (gloutons + ALNS, budget de temps par défaut) : main.py --alloc
+HEURISTIC_ALLOCATORS: Dict[str, Callable[..., Dict[str, Optional[str]]]] = {
+    **GREEDY_ALLOCATORS,
+    "alns": allocate_alns,
+}
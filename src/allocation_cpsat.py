@@ -5,7 +5,7 @@ restrictions, objectif minimiser coût total.
 """
 from __future__ import annotations
 
-from typing import Dict, List, Optional
+from typing import Any, Dict, List, Optional
 
 try:
     from ortools.sat.python import cp_model
@@ -14,7 +14,7 @@ except ImportError:
     CPSAT_AVAILABLE = False
 
 from src.models import Agent, Order, Product, Warehouse, Location
-from src.constraints import get_product_zone, can_combine
+from src.constraints import get_product_zone, can_combine, build_feasibility_matrix
 
 
 def _zone_to_int(zone: Optional[str]) -> int:
@@ -83,6 +83,7 @@ def allocate_with_cpsat(
     warehouse: Warehouse,
     objective: str = "cost",
     time_limit_seconds: int = 30,
+    stats: Optional[Dict[str, Any]] = None,
 ) -> Dict[str, Optional[str]]:
     """
     Allocation par CSP avec OR-Tools CP-SAT.
@@ -90,6 +91,7 @@ def allocate_with_cpsat(
     Variables : assign[order_i] ∈ {0, 1, ..., n_agents} (0 = non assigné).
     Contraintes : capacité, incompatibilités, restrictions (zones, fragile, poids max).
     Objectif : minimiser coût total ou maximiser nombre assigné.
+    Si stats est fourni, il reçoit le statut du solveur ("OPTIMAL", "FEASIBLE", ...).
 
     Returns:
         {order_id: agent_id or None}
@@ -106,12 +108,7 @@ def allocate_with_cpsat(
     scale = 100
 
     # allowed[order_idx][agent_idx] = True si la commande peut aller à l'agent
-    allowed = []
-    for order_idx, order in enumerate(orders):
-        row = []
-        for agent in agents:
-            row.append(_order_can_go_to_agent(order, agent, warehouse, products_by_id))
-        allowed.append(row)
+    allowed = build_feasibility_matrix(orders, agents, warehouse, products_by_id)
 
     # assignment_vars[order_idx][slot] = 1 si commande assignée (slot 0 = non assigné, 1..n_agents = agent)
     assignment_vars = []
@@ -180,6 +177,9 @@ def allocate_with_cpsat(
     solver.parameters.max_time_in_seconds = float(time_limit_seconds)
 
     status = solver.Solve(model)
+    if stats is not None:
+        stats["status"] = solver.StatusName(status)
+        stats["wall_time"] = solver.WallTime()
 
     if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
         return {orders[order_idx].id: None for order_idx in range(n_orders)}
@@ -0,0 +1,101 @@
+"""
+Micro-batching : les éléments reçus un à un sont regroupés et traités par lots.
+
+- Un lot part dès qu'il atteint max_items éléments, ou max_delay secondes après l'arrivée du
+  premier élément en attente : la latence est bornée, le coût par lot (recalcul, publication)
+  est amorti sur tous ses éléments.
+- flush(lot) s'exécute dans un thread dédié, jamais dans le thread de l'appelant ; les lots
+  sont traités un par un, dans l'ordre d'arrivée.
+- Contre-pression : au-delà de max_pending éléments en attente, add() refuse le lot entier.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from typing import Any, Callable, Iterable, List, Optional
+
+
+class MicroBatcher:
+    def __init__(
+        self,
+        flush: Callable[[List[Any]], Any],
+        max_items: int = 1000,
+        max_delay: float = 0.25,
+        max_pending: int = 100_000,
+        name: str = "micro-batcher",
+    ) -> None:
+        self.flush = flush
+        self.max_items = max_items
+        self.max_delay = max_delay
+        self.max_pending = max_pending
+        self.n_batches = 0
+        self.n_items = 0
+        self.last_error: Optional[str] = None
+        self._pending: List[Any] = []
+        self._first_at: Optional[float] = None
+        self._closed = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._loop, name=name, daemon=True)
+        self._thread.start()
+
+    def add(self, items: Iterable[Any]) -> Optional[int]:
+        """Met items en attente ; retourne le nombre d'éléments en attente, ou None si la file est pleine."""
+        items = list(items)
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("MicroBatcher fermé")
+            if len(self._pending) + len(items) > self.max_pending:
+                return None
+            if not items:
+                return len(self._pending)
+            if not self._pending:
+                self._first_at = time.monotonic()
+            self._pending.extend(items)
+            self._cond.notify()
+            return len(self._pending)
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def _take_locked(self) -> List[Any]:
+        batch = self._pending[:self.max_items]
+        self._pending = self._pending[self.max_items:]
+        self._first_at = time.monotonic() if self._pending else None
+        return batch
+
+    def _next_batch(self) -> Optional[List[Any]]:
+        with self._cond:
+            while True:
+                if not self._pending:
+                    if self._closed:
+                        return None
+                    self._cond.wait()
+                    continue
+                remaining = self._first_at + self.max_delay - time.monotonic()
+                if self._closed or remaining <= 0 or len(self._pending) >= self.max_items:
+                    return self._take_locked()
+                self._cond.wait(remaining)
+
+    def _loop(self) -> None:
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            try:
+                self.flush(batch)
+                self.last_error = None
+            except Exception as e:
+                self.last_error = f"{type(e).__name__}: {e}"
+            self.n_batches += 1
+            self.n_items += len(batch)
+
+    def stats(self) -> dict:
+        return {"batches": self.n_batches, "items": self.n_items, "pending": self.pending, "last_error": self.last_error}
+
+    def close(self, timeout: Optional[float] = None) -> None:
+        """Traite les éléments en attente puis arrête le thread."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join(timeout=timeout)
@@ -0,0 +1,172 @@
+"""
+Diffusion d'événements aux clients connectés (Server-Sent Events).
+
+- Chaque événement est sérialisé une seule fois, quel que soit le nombre d'abonnés.
+- Contre-pression : chaque abonné a une file bornée ; un client lent perd les événements les
+  plus anciens (ce sont des instantanés complets, seul le dernier compte) au lieu de faire
+  grossir la mémoire du serveur. Le nombre d'abonnés est lui aussi borné.
+- Un abonné sans événement reçoit un battement de cœur (commentaire SSE) toutes les
+  heartbeat_seconds, ce qui garde la connexion ouverte à travers les proxys.
+- Serveur asyncio : aget()/astream() attendent sur la boucle d'événements (réveil par
+  call_soon_threadsafe), sans occuper un thread par connexion.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import threading
+from collections import deque
+from typing import Any, AsyncIterator, Dict, Hashable, Iterator, List, Optional, Set, Tuple
+
+
+def format_sse(data: str, event: Optional[str] = None, event_id: Optional[Any] = None) -> str:
+    """Trame SSE (data déjà sérialisée, une ligne)."""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    if event:
+        lines.append(f"event: {event}")
+    lines.append(f"data: {data}")
+    return "\n".join(lines) + "\n\n"
+
+
+HEARTBEAT = ": heartbeat\n\n"
+
+
+class Subscription:
+    def __init__(self, topic: Hashable, queue_size: int) -> None:
+        self.topic = topic
+        self.dropped = 0
+        self.closed = False
+        self._frames: deque = deque(maxlen=queue_size)
+        self._cond = threading.Condition()
+        self._waiters: List[Tuple[asyncio.AbstractEventLoop, asyncio.Event]] = []
+
+    def _wake_waiters_locked(self) -> None:
+        for loop, event in self._waiters:
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                pass  # boucle déjà fermée
+
+    def push(self, frame: str) -> None:
+        with self._cond:
+            if len(self._frames) == self._frames.maxlen:
+                self.dropped += 1
+            self._frames.append(frame)
+            self._cond.notify()
+            self._wake_waiters_locked()
+
+    def get(self, timeout: float) -> Optional[str]:
+        """Prochaine trame, ou None après timeout secondes sans événement (ou si fermé)."""
+        with self._cond:
+            self._cond.wait_for(lambda: self._frames or self.closed, timeout=timeout)
+            return self._frames.popleft() if self._frames else None
+
+    async def aget(self, timeout: float) -> Optional[str]:
+        """Comme get(), sans bloquer la boucle d'événements."""
+        with self._cond:
+            if self._frames or self.closed:
+                return self._frames.popleft() if self._frames else None
+            waiter = (asyncio.get_running_loop(), asyncio.Event())
+            self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter[1].wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            with self._cond:
+                self._waiters.remove(waiter)
+        with self._cond:
+            return self._frames.popleft() if self._frames else None
+
+    @property
+    def pending(self) -> int:
+        return len(self._frames)
+
+    def close(self) -> None:
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+            self._wake_waiters_locked()
+
+
+class Broadcaster:
+    def __init__(self, max_subscribers: int = 1000, queue_size: int = 8) -> None:
+        self.max_subscribers = max_subscribers
+        self.queue_size = queue_size
+        self._lock = threading.Lock()
+        self._topics: Dict[Hashable, Set[Subscription]] = {}
+        self._count = 0
+
+    def subscribe(self, topic: Hashable) -> Optional[Subscription]:
+        """Nouvel abonné au sujet topic ; None si le nombre maximal d'abonnés est atteint."""
+        with self._lock:
+            if self._count >= self.max_subscribers:
+                return None
+            sub = Subscription(topic, self.queue_size)
+            self._topics.setdefault(topic, set()).add(sub)
+            self._count += 1
+            return sub
+
+    def unsubscribe(self, sub: Subscription) -> None:
+        with self._lock:
+            subs = self._topics.get(sub.topic)
+            if subs is not None and sub in subs:
+                subs.discard(sub)
+                self._count -= 1
+                if not subs:
+                    del self._topics[sub.topic]
+        sub.close()
+
+    def publish(self, topic: Hashable, event: str, payload: Any, event_id: Optional[Any] = None) -> int:
+        """Envoie l'événement aux abonnés de topic. Retourne le nombre d'abonnés servis."""
+        with self._lock:
+            subs = list(self._topics.get(topic, ()))
+        if not subs:
+            return 0
+        frame = format_sse(json.dumps(payload, separators=(",", ":")), event, event_id)
+        for sub in subs:
+            sub.push(frame)
+        return len(subs)
+
+    @property
+    def n_subscribers(self) -> int:
+        return self._count
+
+    def stream(
+        self, sub: Subscription, heartbeat_seconds: float = 15.0, on_idle=None, retry_ms: int = 5000,
+    ) -> Iterator[str]:
+        """
+        Générateur de trames pour une réponse HTTP en flux ; on_idle() est appelé à chaque battement
+        (ex. détecter un changement de fichier). Désabonne à la fermeture de la connexion.
+        """
+        try:
+            yield f"retry: {retry_ms}\n\n"
+            while not sub.closed:
+                frame = sub.get(heartbeat_seconds)
+                if frame is None:
+                    if on_idle is not None:
+                        on_idle()
+                    yield HEARTBEAT
+                else:
+                    yield frame
+        finally:
+            self.unsubscribe(sub)
+
+    async def astream(
+        self, sub: Subscription, heartbeat_seconds: float = 15.0, on_idle=None, retry_ms: int = 5000,
+    ) -> AsyncIterator[str]:
+        """Version asyncio de stream() ; on_idle() doit être non bloquant."""
+        try:
+            yield f"retry: {retry_ms}\n\n"
+            while not sub.closed:
+                frame = await sub.aget(heartbeat_seconds)
+                if frame is None:
+                    if on_idle is not None:
+                        on_idle()
+                    yield HEARTBEAT
+                else:
+                    yield frame
+        finally:
+            self.unsubscribe(sub)
@@ -4,7 +4,7 @@ Jour 2 : Contraintes dures (capacité, incompatibilités, restrictions robots, c
 """
 from __future__ import annotations
 
-from typing import List, Optional
+from typing import Dict, FrozenSet, List, Optional, Tuple
 from src.models import Warehouse, Location, Product, Agent, Order
 
 
@@ -46,3 +46,168 @@ def can_combine(products: List[Product]) -> bool:
                 if product_first.id in product_second.incompatible_with:
                     return False
     return True
+
+
+def order_conflict_sets(
+    orders: List[Order],
+    products_by_id: Dict[str, Product],
+) -> Tuple[List[FrozenSet[str]], List[FrozenSet[str]], List[bool]]:
+    """
+    Pour chaque commande : (produits, produits en conflit avec elle, commande incompatible avec elle-même).
+    Les conflits sont symétriques ; deux commandes i et j sont incompatibles (au sens de
+    can_combine sur leurs produits réunis) si pids[i] & conflicts[j] ou si l'une est incompatible avec elle-même.
+    """
+    incompatible: Dict[str, set] = {pid: set(p.incompatible_with) for pid, p in products_by_id.items()}
+    for pid, product in products_by_id.items():
+        for other in product.incompatible_with:
+            incompatible.setdefault(other, set()).add(pid)
+    pids_list: List[FrozenSet[str]] = []
+    conflicts_list: List[FrozenSet[str]] = []
+    self_list: List[bool] = []
+    for order in orders:
+        products = [products_by_id[item.product_id] for item in order.items if item.product_id in products_by_id]
+        pids = frozenset(product.id for product in products)
+        conflicts: set = set()
+        for pid in pids:
+            conflicts |= incompatible.get(pid, set())
+        pids_list.append(pids)
+        conflicts_list.append(frozenset(conflicts))
+        self_list.append(bool(pids & conflicts) and not can_combine(products))
+    return pids_list, conflicts_list, self_list
+
+
+def build_zone_index(warehouse: Warehouse) -> Dict[Tuple[int, int], str]:
+    """
+    Index (x, y) -> zone construit une seule fois (évite le parcours linéaire de get_product_zone).
+    """
+    index: Dict[Tuple[int, int], str] = {}
+    for zone_name, zone_locations in warehouse.zones.items():
+        for loc in zone_locations:
+            index.setdefault((loc.x, loc.y), zone_name)
+    return index
+
+
+def restriction_profile(agent: Agent) -> Tuple[Tuple[str, ...], bool, float]:
+    """
+    Clé hashable des restrictions d'un agent : deux agents de même profil
+    acceptent exactement les mêmes commandes.
+    """
+    restrictions = agent.restrictions
+    return (
+        tuple(sorted(restrictions.get("no_zones", []))),
+        bool(restrictions.get("no_fragile", False)),
+        float(restrictions.get("max_item_weight", 0.0) or 0.0),
+    )
+
+
+def build_profile_feasibility(
+    orders: List[Order],
+    profiles: List[Tuple[Tuple[str, ...], bool, float]],
+    warehouse: Warehouse,
+    products_by_id: Dict[str, Product],
+) -> List[List[bool]]:
+    """
+    Matrice n_orders x n_profiles : allowed[i][p] = True si la commande i respecte le profil
+    de restrictions p (zones interdites, objets fragiles, poids max par article).
+    Les attributs de chaque commande (zones, fragile, article le plus lourd) sont calculés une seule fois.
+    """
+    zone_index = build_zone_index(warehouse)
+    matrix: List[List[bool]] = []
+    for order in orders:
+        zones = {zone_index.get((loc.x, loc.y)) for loc in order.unique_locations}
+        has_fragile = False
+        max_weight = 0.0
+        for item in order.items:
+            product = products_by_id.get(item.product_id)
+            if product is None:
+                continue
+            if product.fragile:
+                has_fragile = True
+            if product.weight > max_weight:
+                max_weight = product.weight
+        matrix.append([
+            not (
+                any(zone in zones for zone in no_zones)
+                or (no_fragile and has_fragile)
+                or (max_item_weight > 0 and max_weight > max_item_weight)
+            )
+            for no_zones, no_fragile, max_item_weight in profiles
+        ])
+    return matrix
+
+
+def build_feasibility_matrix(
+    orders: List[Order],
+    agents: List[Agent],
+    warehouse: Warehouse,
+    products_by_id: Dict[str, Product],
+) -> List[List[bool]]:
+    """
+    Matrice n_orders x n_agents : allowed[i][j] = True si la commande i peut aller à l'agent j.
+    Les agents de même profil de restrictions partagent leur colonne (calculée une seule fois).
+    """
+    profiles = [restriction_profile(agent) for agent in agents]
+    unique_profiles = list(dict.fromkeys(profiles))
+    column_of = {profile: col for col, profile in enumerate(unique_profiles)}
+    columns = [column_of[profile] for profile in profiles]
+    return [
+        [row[col] for col in columns]
+        for row in build_profile_feasibility(orders, unique_profiles, warehouse, products_by_id)
+    ]
+
+
+def count_violations(
+    warehouse: Warehouse,
+    orders: List[Order],
+    agents: List[Agent],
+    assignment: Dict[str, Optional[str]],
+    products_by_id: Dict[str, Product],
+) -> int:
+    """
+    Nombre de contraintes dures violées par un assignment : commandes confiées à un agent
+    interdit (restrictions), agents en surcharge (poids ou volume), agents portant des commandes incompatibles entre elles.
+    """
+    orders_by_id = {order.id: order for order in orders}
+    agent_index = {agent.id: agent_idx for agent_idx, agent in enumerate(agents)}
+    profiles = [restriction_profile(agent) for agent in agents]
+    unique_profiles = list(dict.fromkeys(profiles))
+    column_of = {profile: col for col, profile in enumerate(unique_profiles)}
+
+    assigned_orders = [orders_by_id[oid] for oid, aid in assignment.items() if aid is not None and oid in orders_by_id]
+    feasibility = build_profile_feasibility(assigned_orders, unique_profiles, warehouse, products_by_id)
+    violations = 0
+    orders_of_agent: Dict[str, List[Order]] = {}
+    for order, row in zip(assigned_orders, feasibility):
+        agent_id = assignment[order.id]
+        agent_idx = agent_index.get(agent_id)
+        if agent_idx is None or not row[column_of[profiles[agent_idx]]]:
+            violations += 1
+        orders_of_agent.setdefault(agent_id, []).append(order)
+
+    for agent_id, agent_orders in orders_of_agent.items():
+        agent_idx = agent_index.get(agent_id)
+        if agent_idx is None:
+            continue
+        agent = agents[agent_idx]
+        if sum(order.total_weight for order in agent_orders) > agent.capacity_weight + 1e-9:
+            violations += 1
+        if sum(order.total_volume for order in agent_orders) > agent.capacity_volume + 1e-9:
+            violations += 1
+        # Incompatibilités entre commandes différentes (le contenu d'une même commande est imposé par le client)
+        pid_counts: Dict[str, int] = {}
+        order_pids = []
+        for order in agent_orders:
+            pids = {item.product_id for item in order.items}
+            order_pids.append(pids)
+            for pid in pids:
+                pid_counts[pid] = pid_counts.get(pid, 0) + 1
+        for order, pids in zip(agent_orders, order_pids):
+            forbidden = {
+                other
+                for pid in pids if pid in products_by_id
+                for other in products_by_id[pid].incompatible_with
+            }
+            if any(pid_counts.get(other, 0) > (1 if other in pids else 0) for other in forbidden):
+                violations += 1
+                break
+    return violations
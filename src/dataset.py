@@ -0,0 +1,132 @@
+"""
+Jeu de données en mémoire pour le serveur web, rechargé quand les fichiers changent.
+
+- Les fichiers JSON sont lus et transformés (build : modèle, index, projections) une seule fois
+  par version, dans un instantané immuable.
+- Un thread de surveillance compare les mtimes toutes les poll_interval secondes ; si un fichier
+  a changé, un nouvel instantané est construit à côté puis publié par une seule affectation :
+  les lecteurs ne bloquent jamais et voient soit l'ancien, soit le nouvel instantané complet.
+- Un fichier illisible (ex. en cours d'écriture) laisse l'instantané courant en place ; le
+  chargement est retenté au passage suivant.
+"""
+from __future__ import annotations
+
+import json
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+
+@dataclass(frozen=True)
+class DatasetSnapshot:
+    version: int
+    mtimes: Dict[str, Optional[int]]
+    raw: Dict[str, Any]                       # contenu JSON par nom de fichier
+    derived: Dict[str, Any] = field(default_factory=dict)  # résultat de build(raw)
+    loaded_at: float = 0.0
+
+
+class DatasetStore:
+    def __init__(
+        self,
+        data_dir: Path,
+        files: Sequence[str],
+        build: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None,
+        defaults: Optional[Dict[str, Any]] = None,
+        poll_interval: float = 1.0,
+        watch: bool = True,
+    ) -> None:
+        self.data_dir = Path(data_dir)
+        self.files = tuple(files)
+        self.build = build
+        self.defaults = defaults or {}
+        self.poll_interval = poll_interval
+        self.last_error: Optional[str] = None
+        self._listeners: List[Callable[[DatasetSnapshot, DatasetSnapshot], None]] = []
+        self._reload_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._watcher: Optional[threading.Thread] = None
+        self._snapshot = self._load(self._mtimes(), version=0, previous=None)
+        if watch:
+            self.start_watching()
+
+    @property
+    def snapshot(self) -> DatasetSnapshot:
+        """Instantané courant (lecture d'une référence : jamais bloquante)."""
+        return self._snapshot
+
+    def add_listener(self, listener: Callable[[DatasetSnapshot, DatasetSnapshot], None]) -> None:
+        """listener(ancien, nouveau) est appelé après chaque remplacement d'instantané."""
+        self._listeners.append(listener)
+
+    def _mtimes(self) -> Dict[str, Optional[int]]:
+        mtimes: Dict[str, Optional[int]] = {}
+        for name in self.files:
+            try:
+                mtimes[name] = (self.data_dir / name).stat().st_mtime_ns
+            except OSError:
+                mtimes[name] = None
+        return mtimes
+
+    def _load(
+        self, mtimes: Dict[str, Optional[int]], version: int, previous: Optional[DatasetSnapshot],
+    ) -> DatasetSnapshot:
+        raw: Dict[str, Any] = {}
+        try:
+            for name in self.files:
+                if mtimes[name] is None:
+                    raw[name] = self.defaults.get(name)
+                    continue
+                with open(self.data_dir / name, "r", encoding="utf-8") as f:
+                    raw[name] = json.load(f)
+            derived = self.build(raw) if self.build is not None else {}
+        except Exception as e:
+            self.last_error = f"{type(e).__name__}: {e}"
+            if previous is not None:
+                return previous
+            # Premier chargement impossible : instantané vide, retenté à chaque passage
+            return DatasetSnapshot(version, {name: None for name in self.files},
+                                   {name: self.defaults.get(name) for name in self.files}, {}, time.time())
+        self.last_error = None
+        return DatasetSnapshot(version, mtimes, raw, derived, time.time())
+
+    def refresh(self) -> bool:
+        """Recharge si un fichier a changé. Retourne True si un nouvel instantané a été publié."""
+        if not self._reload_lock.acquire(blocking=False):
+            return False  # un autre thread recharge déjà
+        try:
+            current = self._snapshot
+            mtimes = self._mtimes()
+            if mtimes == current.mtimes:
+                return False
+            snapshot = self._load(mtimes, current.version + 1, current)
+            if snapshot is current:
+                return False
+            self._snapshot = snapshot
+        finally:
+            self._reload_lock.release()
+        for listener in list(self._listeners):
+            listener(current, snapshot)
+        return True
+
+    def _watch(self) -> None:
+        while not self._stop.wait(self.poll_interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                self.last_error = f"{type(e).__name__}: {e}"
+
+    def start_watching(self) -> None:
+        if self._watcher is not None and self._watcher.is_alive():
+            return
+        self._stop.clear()
+        self._watcher = threading.Thread(target=self._watch, name="dataset-watcher", daemon=True)
+        self._watcher.start()
+
+    def stop_watching(self) -> None:
+        self._stop.set()
+        if self._watcher is not None:
+            self._watcher.join(timeout=self.poll_interval + 1)
+            self._watcher = None
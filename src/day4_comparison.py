@@ -1,13 +1,23 @@
 """
 Jour 4 : Comparaison des stratégies d'allocation.
-Métriques : distance (proxy), temps (estimé), coût.
+Métriques : distance (proxy), temps (estimé), coût ; et pour chaque stratégie
+temps mur, temps CPU, pic mémoire (RSS) et statut du solveur.
 """
 from __future__ import annotations
 
-from typing import Dict, List, Optional, Any
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
 
-from src.models import Order, Agent, Product, Warehouse
-from src.loader import parse_orders, parse_agents
+try:
+    import resource
+    HAS_RESOURCE = True
+except ImportError:  # Windows
+    HAS_RESOURCE = False
+
+from src.models import Order, Agent, Product, Warehouse, clone_agents
+from src.loader import parse_orders
 from src.constraints import get_product_zone
 
 
@@ -78,6 +88,150 @@ def _sort_orders_by_received_time(orders: List[Order]) -> List[Order]:
     return sorted(orders, key=lambda order: to_minutes(order.received_time))
 
 
+# Stratégies : fonctions de module (exécutables dans un autre processus).
+# Signature commune : (warehouse, orders, agents, products_by_id, solver_name, time_limit_seconds)
+# -> {"assignment": {order_id: agent_id or None}, "status": str, ...infos propres à la stratégie}
+
+def _strategy_first_fit(warehouse, orders, agents, products_by_id, solver_name, time_limit_seconds):
+    from main import allocate_first_fit
+    return {"assignment": allocate_first_fit(orders, agents), "status": "HEURISTIC"}
+
+
+def _strategy_regret(warehouse, orders, agents, products_by_id, solver_name, time_limit_seconds):
+    from src.allocation import allocate_regret
+    return {"assignment": allocate_regret(orders, agents, products_by_id, warehouse), "status": "HEURISTIC"}
+
+
+def _strategy_alns(warehouse, orders, agents, products_by_id, solver_name, time_limit_seconds):
+    from src.allocation import allocate_alns
+    # Marge pour renvoyer le résultat avant l'échéance
+    assignment = allocate_alns(orders, agents, products_by_id, warehouse,
+                               time_limit_seconds=0.8 * time_limit_seconds)
+    return {"assignment": assignment, "status": "HEURISTIC"}
+
+
+def _strategy_minizinc(warehouse, orders, agents, products_by_id, solver_name, time_limit_seconds):
+    from main import apply_assignment
+    from src.minizinc_solver import allocate_with_minizinc
+    stats: Dict[str, Any] = {}
+    assignment = allocate_with_minizinc(orders, agents, products_by_id, warehouse, solver_name, stats=stats,
+                                        time_limit_seconds=time_limit_seconds)
+    apply_assignment(assignment, orders, agents)
+    status = "OPTIMAL" if stats.get("status") == "OPTIMAL_SOLUTION" else stats.get("status", "UNKNOWN")
+    return {"assignment": assignment, "status": status}
+
+
+def _strategy_cpsat(warehouse, orders, agents, products_by_id, solver_name, time_limit_seconds):
+    from main import apply_assignment
+    from src.allocation_cpsat import allocate_with_cpsat
+    stats: Dict[str, Any] = {}
+    assignment = allocate_with_cpsat(orders, agents, products_by_id, warehouse, objective="assign",
+                                     time_limit_seconds=time_limit_seconds, stats=stats)
+    apply_assignment(assignment, orders, agents)
+    return {"assignment": assignment, "status": stats.get("status", "UNKNOWN")}
+
+
+def _strategy_cpsat_presolve(warehouse, orders, agents, products_by_id, solver_name, time_limit_seconds):
+    from main import apply_assignment
+    from src.presolve import allocate_with_presolve
+    assignment, report = allocate_with_presolve(orders, agents, products_by_id, warehouse, solver="cpsat",
+                                                objective="assign", time_limit_seconds=time_limit_seconds,
+                                                compare_baseline=True)
+    apply_assignment(assignment, orders, agents)
+    return {"assignment": assignment, "status": "FEASIBLE", "presolve": report.as_dict()}
+
+
+def _strategy_cpsat_decomposed(warehouse, orders, agents, products_by_id, solver_name, time_limit_seconds):
+    from main import apply_assignment
+    from src.decomposition import allocate_decomposed
+    assignment, report = allocate_decomposed(orders, agents, products_by_id, warehouse, solver="cpsat",
+                                             objective="assign", time_limit_seconds=time_limit_seconds)
+    apply_assignment(assignment, orders, agents)
+    return {"assignment": assignment, "status": "FEASIBLE", "n_subproblems": report.n_subproblems}
+
+
+def _strategy_batching_cpsat(warehouse, orders, agents, products_by_id, solver_name, time_limit_seconds):
+    from main import apply_assignment
+    from src.batching import build_batches
+    from src.allocation_cpsat import allocate_batches_with_cpsat
+    max_w = max(agent.capacity_weight for agent in agents) if agents else 100
+    max_v = max(agent.capacity_volume for agent in agents) if agents else 100
+    batches = build_batches(orders, products_by_id, max_batch_weight=max_w, max_batch_volume=max_v)
+    if not batches:
+        raise ValueError("Aucun lot créé")
+    assign_batch = allocate_batches_with_cpsat(batches, agents, products_by_id, warehouse)
+    order_assign = {order.id: None for order in orders}
+    for batch_idx, batch in enumerate(batches):
+        agent_id_batch = assign_batch.get(batch_idx)
+        if agent_id_batch:
+            for order in batch.orders:
+                order_assign[order.id] = agent_id_batch
+    apply_assignment(order_assign, orders, agents)
+    return {"assignment": order_assign, "status": "UNKNOWN", "n_batches": len(batches)}
+
+
+STRATEGIES: Dict[str, Callable[..., Dict[str, Any]]] = {
+    "first_fit": _strategy_first_fit,
+    "regret": _strategy_regret,
+    "alns": _strategy_alns,
+    "minizinc": _strategy_minizinc,
+    "cpsat": _strategy_cpsat,
+    "cpsat_presolve": _strategy_cpsat_presolve,
+    "cpsat_decomposed": _strategy_cpsat_decomposed,
+    "batching_cpsat": _strategy_batching_cpsat,
+}
+
+
+def _usage() -> Dict[str, float]:
+    """CPU (s) du processus et de ses enfants terminés, pic RSS (Mo) du processus."""
+    if not HAS_RESOURCE:
+        return {"cpu": time.process_time(), "rss_mb": 0.0}
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return {
+        "cpu": own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime,
+        "rss_mb": max(own.ru_maxrss, children.ru_maxrss) / 1024.0,  # ru_maxrss en Ko sous Linux
+    }
+
+
+def run_strategy(
+    name: str,
+    warehouse: Warehouse,
+    orders: List[Order],
+    agents: List[Agent],
+    products_by_id: Dict[str, Product],
+    solver_name: str = "cbc",
+    time_limit_seconds: float = 30.0,
+) -> Dict[str, Any]:
+    """
+    Lance une stratégie sur des agents neufs et retourne ses métriques (+ assignment, status)
+    ainsi que wall_time_sec, cpu_time_sec et peak_rss_mb. Le pic RSS n'est propre à la stratégie
+    que si elle tourne dans un processus neuf (voir run_comparison).
+    """
+    agents_fresh = clone_agents(agents)
+    usage_before = _usage()
+    started = time.perf_counter()
+    try:
+        outcome = STRATEGIES[name](warehouse, orders, agents_fresh, products_by_id, solver_name, time_limit_seconds)
+    except Exception as e:
+        outcome = {"error": str(e)}
+    wall_time = time.perf_counter() - started
+    usage_after = _usage()
+    timing = {
+        "wall_time_sec": round(wall_time, 4),
+        "cpu_time_sec": round(usage_after["cpu"] - usage_before["cpu"], 4),
+        "peak_rss_mb": round(usage_after["rss_mb"], 1),
+    }
+    if "error" in outcome:
+        outcome.update(timing)
+        outcome["status"] = "ERROR"
+        return outcome
+    metrics = compute_metrics(warehouse, orders, agents_fresh, outcome["assignment"], products_by_id)
+    metrics.update(outcome)
+    metrics.update(timing)
+    return metrics
+
+
 def run_comparison(
     warehouse: Warehouse,
     orders: List[Order],
@@ -87,82 +241,43 @@ def run_comparison(
     use_cpsat: bool = True,
     use_batching: bool = True,
     solver_name: str = "cbc",
+    use_presolve: bool = True,
+    use_decomposition: bool = True,
+    max_workers: Optional[int] = None,
 ) -> Dict[str, Dict[str, Any]]:
     """
-    Lance les stratégies demandées et retourne les métriques par stratégie.
+    Lance les stratégies demandées, chacune dans un processus neuf (pour que le pic mémoire lui
+    soit propre), et retourne les métriques par stratégie.
+    Par défaut (max_workers=None : os.cpu_count()) les stratégies tournent en parallèle et se
+    disputent les cœurs : les temps mur/CPU et le pic mémoire ne sont plus comparables entre
+    stratégies (chaque résultat indique "workers"). Avec max_workers=1 elles tournent l'une après
+    l'autre et leurs temps sont comparables.
     """
-    results = {}
     orders_sorted = _sort_orders_by_received_time(orders)
 
-    # 1. Glouton First-Fit (Jour 1)
-    from main import allocate_first_fit, apply_assignment
-    agents_ff = parse_agents([{"id": agent.id, "type": agent.type, "capacity_weight": agent.capacity_weight,
-                              "capacity_volume": agent.capacity_volume, "speed": agent.speed,
-                              "cost_per_hour": agent.cost_per_hour, "restrictions": getattr(agent, "restrictions", {})}
-                             for agent in agents])
-    assign_ff = allocate_first_fit(orders_sorted, agents_ff)
-    results["first_fit"] = compute_metrics(warehouse, orders_sorted, agents_ff, assign_ff, products_by_id)
-    results["first_fit"]["assignment"] = assign_ff
-
-    # 2. MiniZinc (Jour 2) si demandé
+    names = ["first_fit"]                     # 1. Glouton First-Fit (Jour 1)
     if use_minizinc:
-        try:
-            from src.minizinc_solver import allocate_with_minizinc
-            agents_mz = parse_agents([{"id": agent.id, "type": agent.type, "capacity_weight": agent.capacity_weight,
-                                      "capacity_volume": agent.capacity_volume, "speed": agent.speed,
-                                      "cost_per_hour": agent.cost_per_hour, "restrictions": getattr(agent, "restrictions", {})}
-                                     for agent in agents])
-            assign_mz = allocate_with_minizinc(orders_sorted, agents_mz, products_by_id, warehouse, solver_name)
-            apply_assignment(assign_mz, orders_sorted, agents_mz)
-            results["minizinc"] = compute_metrics(warehouse, orders_sorted, agents_mz, assign_mz, products_by_id)
-            results["minizinc"]["assignment"] = assign_mz
-        except Exception as e:
-            results["minizinc"] = {"error": str(e)}
-
-    # 3. CP-SAT (Jour 4)
+        names.append("minizinc")              # 2. MiniZinc (Jour 2)
     if use_cpsat:
-        try:
-            from src.allocation_cpsat import allocate_with_cpsat
-            agents_cp = parse_agents([{"id": agent.id, "type": agent.type, "capacity_weight": agent.capacity_weight,
-                                      "capacity_volume": agent.capacity_volume, "speed": agent.speed,
-                                      "cost_per_hour": agent.cost_per_hour, "restrictions": getattr(agent, "restrictions", {})}
-                                     for agent in agents])
-            assign_cp = allocate_with_cpsat(orders_sorted, agents_cp, products_by_id, warehouse, objective="assign")
-            apply_assignment(assign_cp, orders_sorted, agents_cp)
-            results["cpsat"] = compute_metrics(warehouse, orders_sorted, agents_cp, assign_cp, products_by_id)
-            results["cpsat"]["assignment"] = assign_cp
-        except Exception as e:
-            results["cpsat"] = {"error": str(e)}
-
-    # 4. Batching + CP-SAT
-    if use_batching and use_cpsat:
-        try:
-            from src.batching import build_batches, batches_to_assignment
-            from src.allocation_cpsat import allocate_batches_with_cpsat
-            max_w = max(agent.capacity_weight for agent in agents) if agents else 100
-            max_v = max(agent.capacity_volume for agent in agents) if agents else 100
-            batches = build_batches(orders_sorted, products_by_id, max_batch_weight=max_w, max_batch_volume=max_v)
-            if batches:
-                assign_batch = allocate_batches_with_cpsat(batches, agents, products_by_id, warehouse)
-                order_assign = {}
-                for order in orders_sorted:
-                    order_assign[order.id] = None
-                for batch_idx, batch in enumerate(batches):
-                    agent_id_batch = assign_batch.get(batch_idx)
-                    if agent_id_batch:
-                        for order in batch.orders:
-                            order_assign[order.id] = agent_id_batch
-                agents_b = parse_agents([{"id": agent.id, "type": agent.type, "capacity_weight": agent.capacity_weight,
-                                         "capacity_volume": agent.capacity_volume, "speed": agent.speed,
-                                         "cost_per_hour": agent.cost_per_hour, "restrictions": getattr(agent, "restrictions", {})}
-                                        for agent in agents])
-                apply_assignment(order_assign, orders_sorted, agents_b)
-                results["batching_cpsat"] = compute_metrics(warehouse, orders_sorted, agents_b, order_assign, products_by_id)
-                results["batching_cpsat"]["assignment"] = order_assign
-                results["batching_cpsat"]["n_batches"] = len(batches)
-            else:
-                results["batching_cpsat"] = {"error": "Aucun lot créé"}
-        except Exception as e:
-            results["batching_cpsat"] = {"error": str(e)}
+        names.append("cpsat")                 # 3. CP-SAT (Jour 4)
+        if use_presolve:
+            names.append("cpsat_presolve")    # 3 bis. Presolve + CP-SAT par composantes
+        if use_decomposition:
+            names.append("cpsat_decomposed")  # 3 ter. Décomposition résolue en parallèle
+        if use_batching:
+            names.append("batching_cpsat")    # 4. Batching + CP-SAT
 
+    n_workers = max(1, min(max_workers or os.cpu_count() or 1, len(names)))
+    results: Dict[str, Dict[str, Any]] = {}
+    with ProcessPoolExecutor(max_workers=n_workers, max_tasks_per_child=1) as pool:
+        futures = {
+            name: pool.submit(run_strategy, name, warehouse, orders_sorted, agents, products_by_id, solver_name)
+            for name in names
+        }
+        for name, future in futures.items():
+            try:
+                results[name] = future.result()
+            except Exception as e:
+                results[name] = {"error": str(e), "status": "ERROR"}
+            results[name]["workers"] = n_workers
     return results
@@ -3,14 +3,33 @@ Jour 5.1 : Analyse des patterns de commandes (historique).
 - Produits les plus commandés
 - Paires de produits souvent commandées ensemble
 - Zones les plus visitées
+
+Les co-occurrences sont une matrice creuse (C = X^T X, X = incidence commandes x produits),
+accumulée par blocs de commandes : un historique de plusieurs dizaines de millions de lignes
+tient en mémoire bornée (un bloc + les paires distinctes). Avec scipy, chaque bloc est une
+matrice CSR ; sans scipy, les paires sont encodées en entiers et réduites avec numpy.
 """
 from __future__ import annotations
 
 from collections import defaultdict
-from typing import Dict, List, Tuple, Any
+from dataclasses import dataclass
+from itertools import islice
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    from scipy import sparse
+    HAS_SCIPY = True
+except ImportError:
+    HAS_SCIPY = False
 
 from src.models import Order, Product, Warehouse
-from src.constraints import get_product_zone
+from src.constraints import build_zone_index
+
+# Commandes traitées par bloc lors de l'accumulation des co-occurrences
+DEFAULT_CHUNK_ORDERS = 200_000
+_PAIR_SHIFT = np.int64(32)
 
 
 def product_frequency(orders: List[Order]) -> Dict[str, int]:
@@ -32,37 +51,177 @@ def top_products(orders: List[Order], n: int = 20) -> List[Tuple[str, int]]:
     return sorted_items[:n]
 
 
+@dataclass
+class CoOccurrence:
+    """
+    Co-occurrences au format COO (triangle supérieur : rows[k] < cols[k], indices dans product_ids).
+    frequency[i] = nombre de commandes contenant product_ids[i] (diagonale de X^T X).
+    """
+    product_ids: List[str]
+    frequency: np.ndarray
+    rows: np.ndarray
+    cols: np.ndarray
+    counts: np.ndarray
+    n_orders: int
+
+    def _pair(self, k: int) -> Tuple[str, str]:
+        a, b = self.product_ids[self.rows[k]], self.product_ids[self.cols[k]]
+        return (a, b) if a < b else (b, a)
+
+    def top_pairs(self, n: int = 20) -> List[Tuple[Tuple[str, str], int]]:
+        """Les n paires les plus fréquentes (sélection argpartition, puis tri des seules candidates)."""
+        if n <= 0 or len(self.counts) == 0:
+            return []
+        if n < len(self.counts):
+            # On garde toutes les paires ex aequo avec la n-ième pour un départage stable par identifiants
+            threshold = np.partition(self.counts, len(self.counts) - n)[len(self.counts) - n]
+            candidates = np.flatnonzero(self.counts >= threshold)
+        else:
+            candidates = np.arange(len(self.counts))
+        ranked = sorted(((int(self.counts[k]), self._pair(k)) for k in candidates), key=lambda e: (-e[0], e[1]))
+        return [(pair, count) for count, pair in ranked[:n]]
+
+    def top_products(self, n: int = 20) -> List[Tuple[str, int]]:
+        order = sorted(range(len(self.product_ids)), key=lambda i: (-int(self.frequency[i]), self.product_ids[i]))
+        return [(self.product_ids[i], int(self.frequency[i])) for i in order[:n] if self.frequency[i] > 0]
+
+    def frequency_dict(self) -> Dict[str, int]:
+        return {pid: int(count) for pid, count in zip(self.product_ids, self.frequency.tolist()) if count}
+
+    def to_dict(self) -> Dict[Tuple[str, str], int]:
+        """Format historique de co_ordered_pairs : {(pid_min, pid_max): nb_commandes}."""
+        return {self._pair(k): int(count) for k, count in enumerate(self.counts.tolist())}
+
+    def to_csr(self):
+        """Matrice creuse symétrique n_produits x n_produits (nécessite scipy)."""
+        if not HAS_SCIPY:
+            raise ImportError("scipy n'est pas installé : pip install scipy")
+        n = len(self.product_ids)
+        upper = sparse.coo_matrix((self.counts, (self.rows, self.cols)), shape=(n, n))
+        return (upper + upper.T).tocsr()
+
+
+class CoOccurrenceAccumulator:
+    """Accumulation par blocs : add(orders) autant de fois que nécessaire, puis result()."""
+
+    def __init__(self, product_ids: Optional[Iterable[str]] = None, use_scipy: Optional[bool] = None) -> None:
+        self.product_ids: List[str] = []
+        self.index: Dict[str, int] = {}
+        for pid in product_ids or ():
+            self._index_of(pid)
+        self.use_scipy = HAS_SCIPY if use_scipy is None else (use_scipy and HAS_SCIPY)
+        self.frequency = np.zeros(len(self.product_ids), dtype=np.int64)
+        self.n_orders = 0
+        self._upper = None                                  # CSR (scipy)
+        self._codes = np.empty(0, dtype=np.int64)           # paires encodées (numpy)
+        self._counts = np.empty(0, dtype=np.int64)
+
+    def _index_of(self, pid: str) -> int:
+        idx = self.index.get(pid)
+        if idx is None:
+            idx = self.index[pid] = len(self.product_ids)
+            self.product_ids.append(pid)
+        return idx
+
+    def add(self, orders: Iterable[Order]) -> None:
+        """Ajoute un bloc de commandes (chaque produit compte une fois par commande)."""
+        baskets = [sorted({self._index_of(item.product_id) for item in order.items}) for order in orders]
+        self.n_orders += len(baskets)
+        n_products = len(self.product_ids)
+        if len(self.frequency) < n_products:
+            self.frequency = np.concatenate([self.frequency, np.zeros(n_products - len(self.frequency), dtype=np.int64)])
+        lengths = np.fromiter((len(b) for b in baskets), dtype=np.int64, count=len(baskets))
+        indices = np.fromiter((i for b in baskets for i in b), dtype=np.int64, count=int(lengths.sum()))
+        self.frequency += np.bincount(indices, minlength=n_products)
+        if self.use_scipy:
+            self._add_sparse(lengths, indices, n_products)
+        else:
+            self._add_codes(baskets, lengths)
+
+    def _add_sparse(self, lengths: np.ndarray, indices: np.ndarray, n_products: int) -> None:
+        indptr = np.zeros(len(lengths) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=indptr[1:])
+        incidence = sparse.csr_matrix(
+            (np.ones(len(indices), dtype=np.int32), indices, indptr), shape=(len(lengths), n_products),
+        )
+        upper = sparse.triu(incidence.T @ incidence, k=1, format="csr")
+        if self._upper is None:
+            self._upper = upper
+        else:
+            self._upper.resize((n_products, n_products))
+            self._upper = self._upper + upper
+
+    def _add_codes(self, baskets: List[List[int]], lengths: np.ndarray) -> None:
+        # Paires i < j de chaque commande, vectorisées par taille de commande
+        parts = []
+        for size in np.unique(lengths[lengths >= 2]).tolist():
+            members = np.array([b for b in baskets if len(b) == size], dtype=np.int64)
+            first, second = np.triu_indices(size, k=1)
+            parts.append(((members[:, first] << _PAIR_SHIFT) | members[:, second]).ravel())
+        if not parts:
+            return
+        codes, counts = np.unique(np.concatenate(parts), return_counts=True)
+        merged, inverse = np.unique(np.concatenate([self._codes, codes]), return_inverse=True)
+        self._counts = np.bincount(inverse, weights=np.concatenate([self._counts, counts]), minlength=len(merged)).astype(np.int64)
+        self._codes = merged
+
+    def result(self) -> CoOccurrence:
+        if self.use_scipy:
+            if self._upper is None:
+                rows = cols = counts = np.empty(0, dtype=np.int64)
+            else:
+                upper = self._upper.tocoo()
+                rows, cols, counts = upper.row.astype(np.int64), upper.col.astype(np.int64), upper.data.astype(np.int64)
+        else:
+            rows, cols, counts = self._codes >> _PAIR_SHIFT, self._codes & np.int64(0xFFFFFFFF), self._counts
+        return CoOccurrence(list(self.product_ids), self.frequency.copy(), rows, cols, counts, self.n_orders)
+
+
+def _chunks(orders: Iterable[Order], chunk_size: int):
+    iterator = iter(orders)
+    while True:
+        chunk = list(islice(iterator, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def co_occurrence(
+    orders: Iterable[Order],
+    chunk_size: int = DEFAULT_CHUNK_ORDERS,
+    product_ids: Optional[Iterable[str]] = None,
+) -> CoOccurrence:
+    """Co-occurrences de produits (matrice creuse), commandes lues par blocs de chunk_size (itérable accepté)."""
+    accumulator = CoOccurrenceAccumulator(product_ids)
+    for chunk in _chunks(orders, chunk_size):
+        accumulator.add(chunk)
+    return accumulator.result()
+
+
 def co_ordered_pairs(orders: List[Order]) -> Dict[Tuple[str, str], int]:
     """Pour chaque paire de produits commandés ensemble, compte le nombre de commandes."""
-    pair_count: Dict[Tuple[str, str], int] = defaultdict(int)
-    for order in orders:
-        pids = sorted(set(item.product_id for item in order.items))
-        for i in range(len(pids)):
-            for j in range(i + 1, len(pids)):
-                pair_count[(pids[i], pids[j])] += 1
-    return dict(pair_count)
+    return co_occurrence(orders).to_dict()
 
 
 def top_co_ordered_pairs(orders: List[Order], n: int = 20) -> List[Tuple[Tuple[str, str], int]]:
     """Retourne les n paires les plus souvent commandées ensemble."""
-    pairs = co_ordered_pairs(orders)
-    sorted_pairs = sorted(pairs.items(), key=lambda x: -x[1])
-    return sorted_pairs[:n]
+    return co_occurrence(orders).top_pairs(n)
 
 
 def zone_visits(
-    orders: List[Order],
+    orders: Iterable[Order],
     products_by_id: Dict[str, Product],
     warehouse: Warehouse,
 ) -> Dict[str, int]:
     """Compte combien de fois chaque zone est visitée (une commande peut visiter une zone une fois)."""
+    zone_index = build_zone_index(warehouse)
     zone_count: Dict[str, int] = defaultdict(int)
     for order in orders:
         zones_in_order: set[str] = set()
         for item in order.items:
             product = products_by_id.get(item.product_id)
             if product:
-                z = get_product_zone(warehouse, product.location)
+                z = zone_index.get((product.location.x, product.location.y))
                 if z:
                     zones_in_order.add(z)
         for z in zones_in_order:
@@ -71,25 +230,36 @@ def zone_visits(
 
 
 def run_pattern_analysis(
-    orders: List[Order],
+    orders: Iterable[Order],
     products_by_id: Dict[str, Product],
     warehouse: Warehouse,
     top_n: int = 20,
+    chunk_size: int = DEFAULT_CHUNK_ORDERS,
+    include_pairs: bool = True,
 ) -> Dict[str, Any]:
     """
     Lance l'analyse des patterns et retourne un dictionnaire avec tous les résultats.
+    Un seul passage sur les commandes, par blocs : orders peut être un générateur (historique en flux).
+    "co_occurrence" contient la matrice creuse complète (CoOccurrence, to_csr au besoin) ;
+    "co_ordered_pairs" garde le format historique (dict simple) {(pid_min, pid_max): nb_commandes},
+    sauf avec include_pairs=False (évite de matérialiser un dict par paire sur un gros historique).
     """
-    freq = product_frequency(orders)
-    top_p = top_products(orders, n=top_n)
-    pairs = co_ordered_pairs(orders)
-    top_pairs = top_co_ordered_pairs(orders, n=top_n)
-    zones = zone_visits(orders, products_by_id, warehouse)
-
-    return {
-        "product_frequency": freq,
-        "top_products": [(pid, count) for pid, count in top_p],
-        "co_ordered_pairs": pairs,
-        "top_co_ordered_pairs": [((p1, p2), c) for (p1, p2), c in top_pairs],
-        "zone_visits": zones,
-        "n_orders": len(orders),
+    accumulator = CoOccurrenceAccumulator(products_by_id)
+    zones: Dict[str, int] = defaultdict(int)
+    for chunk in _chunks(orders, chunk_size):
+        accumulator.add(chunk)
+        for zone, count in zone_visits(chunk, products_by_id, warehouse).items():
+            zones[zone] += count
+    matrix = accumulator.result()
+
+    result: Dict[str, Any] = {
+        "product_frequency": matrix.frequency_dict(),
+        "top_products": matrix.top_products(top_n),
+        "co_occurrence": matrix,
+        "top_co_ordered_pairs": matrix.top_pairs(top_n),
+        "zone_visits": dict(zones),
+        "n_orders": matrix.n_orders,
     }
+    if include_pairs:
+        result["co_ordered_pairs"] = matrix.to_dict()
+    return result
@@ -14,6 +14,7 @@ from src.models import Order, Warehouse, Product, Agent
 from src.loader import parse_agents
 from src.day5_patterns import run_pattern_analysis
 from src.day5_storage import compute_optimized_placement, build_optimized_products
+from src.event_simulation import simulate_day
 
 
 def _clone_agents(agents: List[Agent]) -> List[Agent]:
@@ -64,29 +65,32 @@ def generate_test_orders(
     max_items: int = 5,
     seed: Optional[int] = None,
 ) -> List[Order]:
-    """Génère n_orders commandes aléatoires (échantillonnage parmi les produits)."""
+    """
+    Génère n_orders commandes aléatoires (échantillonnage parmi les produits).
+    Le générateur est local (random.Random(seed)) : l'état global du module random n'est pas touché.
+    Pour de nombreux scénarios ou des millions de commandes, voir src.monte_carlo.
+    """
     from src.models import Order, OrderItem
 
-    if seed is not None:
-        random.seed(seed)
+    rng = random.Random(seed)
     product_ids = list(products_by_id.keys())
     if not product_ids:
         return []
 
     orders = []
     for i in range(n_orders):
-        n_items = random.randint(min_items, max_items)
-        chosen = random.sample(product_ids, min(n_items, len(product_ids)))
+        n_items = rng.randint(min_items, max_items)
+        chosen = rng.sample(product_ids, min(n_items, len(product_ids)))
         items = []
         seen_pid: set[str] = set()
         for pid in chosen:
             if pid in seen_pid:
                 continue
             seen_pid.add(pid)
-            qty = random.randint(1, 3)
+            qty = rng.randint(1, 3)
             items.append(OrderItem(product_id=pid, quantity=qty))
         if not items:
-            items.append(OrderItem(product_id=random.choice(product_ids), quantity=1))
+            items.append(OrderItem(product_id=rng.choice(product_ids), quantity=1))
         orders.append(
             Order(
                 id=f"Sim_Order_{i+1:03d}",
@@ -106,23 +110,28 @@ def run_simulation(
     products_current: Dict[str, Product],
     products_optimized: Dict[str, Product],
     allocate_fn,
+    simulate_events: bool = False,
 ) -> Dict[str, Any]:
     """
     Exécute la simulation avec stockage actuel puis optimisé.
     allocate_fn(orders, agents) -> assignment dict.
     Les distances dépendent des emplacements produits (enrichis avant chaque run).
+    Avec simulate_events, chaque placement est aussi joué par le simulateur à événements discrets
+    (temps, files d'attente, congestion) : clés "events_current" et "events_optimized".
     """
     # Enrichir avec stockage actuel
     _enrich_orders(orders, products_current)
     agents1 = _clone_agents(agents)
     assign_current = allocate_fn(orders, agents1)
     dist_current = sum(_estimate_order_distance(warehouse, order) for order in orders)
+    events_current = simulate_day(warehouse, orders, agents, products_current) if simulate_events else None
 
     # Ré-enrichir avec stockage optimisé (mêmes commandes, autres emplacements)
     _enrich_orders(orders, products_optimized)
     agents2 = _clone_agents(agents)
     assign_optimized = allocate_fn(orders, agents2)
     dist_optimized = sum(_estimate_order_distance(warehouse, order) for order in orders)
+    events_optimized = simulate_day(warehouse, orders, agents, products_optimized) if simulate_events else None
 
     n = len(orders)
     n_assigned_current = sum(1 for a in assign_current.values() if a is not None)
@@ -132,7 +141,7 @@ def run_simulation(
     if dist_current > 0:
         reduction = (dist_current - dist_optimized) / dist_current * 100
 
-    return {
+    metrics = {
         "n_orders": n,
         "distance_current": dist_current,
         "distance_optimized": dist_optimized,
@@ -140,6 +149,10 @@ def run_simulation(
         "n_assigned_current": n_assigned_current,
         "n_assigned_optimized": n_assigned_opt,
     }
+    if simulate_events:
+        metrics["events_current"] = events_current
+        metrics["events_optimized"] = events_optimized
+    return metrics
 
 
 def run_before_after(
@@ -149,13 +162,16 @@ def run_before_after(
     products_by_id: Dict[str, Product],
     n_test_orders: int = 50,
     seed: int = 42,
+    method: str = "affinity",
+    max_moves: int = 50,
 ):
     """
     Pipeline complet : calcule le placement optimisé, génère 50 commandes test,
     simule avant/après et retourne les métriques + placement.
+    method / max_moves : voir compute_optimized_placement (ex. "incremental" : K déplacements au plus).
     """
     placement = compute_optimized_placement(
-        orders_historical, products_by_id, warehouse
+        orders_historical, products_by_id, warehouse, method=method, max_moves=max_moves
     )
     products_optimized = build_optimized_products(products_by_id, placement)
     test_orders = generate_test_orders(
@@ -93,12 +93,37 @@ def compute_optimized_placement(
     orders: List[Order],
     products_by_id: Dict[str, Product],
     warehouse: Warehouse,
+    method: str = "affinity",
+    time_limit_seconds: float = 5.0,
+    max_moves: int = 50,
 ) -> Dict[str, Location]:
     """
     Propose une réorganisation : product_id -> nouveau Location.
-    Respecte Règle 1 (top 20% fréquents en zone proche entrée), Règle 2 (affinités voisines),
-    Règle 3 (food->C, chemical->D).
+    method="affinity" (défaut) : slotting par recuit simulé sur fréquence + affinités (src.slotting),
+    Règles 1, 2 et 3. method="frequency" : placement glouton par fréquence (Règles 1 et 3 seulement).
+    method="incremental" : au plus max_moves produits déplacés depuis leurs emplacements actuels.
     """
+    if method == "affinity":
+        from src.slotting import optimize_slotting
+        placement, _ = optimize_slotting(orders, products_by_id, warehouse, time_limit_seconds=time_limit_seconds)
+        return placement
+    if method == "incremental":
+        from src.slotting import incremental_reslotting
+        placement, _ = incremental_reslotting(
+            orders, products_by_id, warehouse, max_moves=max_moves, time_limit_seconds=time_limit_seconds,
+        )
+        return placement
+    if method != "frequency":
+        raise ValueError(f"Méthode de placement inconnue : {method} (attendu : affinity, incremental, frequency)")
+    return _frequency_placement(orders, products_by_id, warehouse)
+
+
+def _frequency_placement(
+    orders: List[Order],
+    products_by_id: Dict[str, Product],
+    warehouse: Warehouse,
+) -> Dict[str, Location]:
+    """Règle 1 (top 20% fréquents en zone proche entrée) et Règle 3 (food->C, chemical->D)."""
     freq = product_frequency(orders)
     pairs = co_ordered_pairs(orders)
 
@@ -161,10 +186,7 @@ def compute_optimized_placement(
         else:
             assign(pid, rest_flexible, "rest")
 
-    # Règle 2 : on ne réassigne pas ici les positions à l'intérieur des pools pour "voisins",
-    # on a déjà placé par fréquence. Pour une optimisation plus fine on pourrait réordonner
-    # rest_flexible pour que paires à forte affinité soient adjacentes (greedy).
-    # Pour garder le code simple, la répartition C/D/A/rest est déjà appliquée.
+    # Règle 2 (affinités) : voir src.slotting (method="affinity")
 
     return placement
 
@@ -0,0 +1,195 @@
+"""
+Décomposition de l'allocation en sous-problèmes résolus en parallèle (CP-SAT ou MiniZinc).
+
+1. presolve : composantes connexes exactes du graphe commandes–agents ;
+2. une composante trop grande est découpée par type d'agent (robots / humains / chariots) :
+   chaque commande partagée entre plusieurs types est confiée au type le moins cher
+   qui a encore du budget de capacité (couplage faible) ;
+3. les sous-problèmes sont résolus en parallèle puis fusionnés ;
+4. réparation gloutonne : les commandes restées sans agent sont replacées sur les capacités
+   résiduelles de tous les agents (le découpage par type n'est pas exact).
+"""
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from src.models import Agent, Order, Product, Warehouse
+from src.presolve import Component, OrderGroup, PresolveReport, presolve, solve_components
+from src.allocation import _GreedyContext, _priority_key, order_distance, order_time_seconds
+
+DEFAULT_MAX_COMPONENT_ORDERS = 60
+
+
+@dataclass
+class DecompositionReport:
+    presolve: PresolveReport
+    n_subproblems: int = 0
+    largest_subproblem: int = 0
+    n_split_components: int = 0
+    n_repaired: int = 0
+    solve_seconds: float = 0.0
+    repair_seconds: float = 0.0
+    n_assigned: int = 0
+
+    def summary(self) -> List[str]:
+        return self.presolve.summary()[:-1] + [
+            f"Sous-problèmes : {self.n_subproblems} (le plus grand : {self.largest_subproblem} commandes, "
+            f"{self.n_split_components} composante(s) découpée(s) par type d'agent)",
+            f"Temps : presolve {self.presolve.presolve_seconds:.2f} s + résolution {self.solve_seconds:.2f} s "
+            f"+ réparation {self.repair_seconds:.2f} s ({self.n_repaired} commande(s) replacée(s))",
+        ]
+
+
+def split_by_agent_type(
+    component: Component,
+    agents: List[Agent],
+    warehouse: Warehouse,
+) -> List[Component]:
+    """
+    Découpe une composante en un sous-problème par type d'agent.
+    Les commandes exclusives à un type y vont directement ; les commandes partagées sont
+    traitées des plus lourdes aux plus légères et confiées au type le moins cher dont le budget
+    (somme des capacités restantes) peut encore les contenir, sinon au type le moins rempli.
+    """
+    agents_of_type: Dict[str, List[int]] = {}
+    for agent_col in component.agents:
+        agents_of_type.setdefault(agents[agent_col].type, []).append(agent_col)
+    if len(agents_of_type) < 2:
+        return [component]
+    types = list(agents_of_type)
+    type_of = {agent_col: agents[agent_col].type for agent_col in component.agents}
+    budget_w = {t: sum(agents[a].capacity_weight for a in cols) for t, cols in agents_of_type.items()}
+    budget_v = {t: sum(agents[a].capacity_volume for a in cols) for t, cols in agents_of_type.items()}
+    chosen: Dict[str, List[Tuple[OrderGroup, List[Order]]]] = {t: [] for t in types}
+
+    shared: List[Tuple[OrderGroup, List[str]]] = []
+    for group in component.groups:
+        group_types = list(dict.fromkeys(type_of[a] for a in group.agents))
+        if len(group_types) == 1:
+            t = group_types[0]
+            chosen[t].append((group, group.orders))
+            budget_w[t] -= sum(order.total_weight for order in group.orders)
+            budget_v[t] -= sum(order.total_volume for order in group.orders)
+        else:
+            shared.append((group, group_types))
+
+    shared.sort(key=lambda entry: -entry[0].orders[0].total_weight)
+    for group, group_types in shared:
+        order = group.orders[0]
+        distance = order_distance(warehouse, order)
+        cost_of = {
+            t: min(
+                order_time_seconds(order, agents[a], distance) * agents[a].cost_per_hour
+                for a in group.agents if type_of[a] == t
+            )
+            for t in group_types
+        }
+        per_type: Dict[str, List[Order]] = {t: [] for t in group_types}
+        for member in group.orders:
+            fitting = [
+                t for t in group_types
+                if budget_w[t] >= member.total_weight and budget_v[t] >= member.total_volume
+            ]
+            if fitting:
+                t = min(fitting, key=lambda t: cost_of[t])
+            else:
+                t = max(group_types, key=lambda t: budget_w[t])
+            per_type[t].append(member)
+            budget_w[t] -= member.total_weight
+            budget_v[t] -= member.total_volume
+        for t, members in per_type.items():
+            if members:
+                chosen[t].append((group, members))
+
+    parts = []
+    for t in types:
+        groups = [
+            OrderGroup(orders=members, agents=[a for a in group.agents if type_of[a] == t])
+            for group, members in chosen[t]
+        ]
+        if groups:
+            parts.append(Component(groups=groups, agents=agents_of_type[t]))
+    return parts
+
+
+def _repair(
+    orders: List[Order],
+    agents: List[Agent],
+    products_by_id: Dict[str, Product],
+    warehouse: Warehouse,
+    assignment: Dict[str, Optional[str]],
+) -> int:
+    """Replace les commandes non assignées sur les capacités résiduelles (coût minimal). Modifie assignment."""
+    context = _GreedyContext(orders, agents, products_by_id, warehouse)
+    index_of_agent = {agent.id: agent_idx for agent_idx, agent in enumerate(agents)}
+    pending = []
+    for order_idx, order in enumerate(orders):
+        agent_id = assignment.get(order.id)
+        if agent_id is None:
+            pending.append(order_idx)
+        else:
+            context.assign(order_idx, index_of_agent[agent_id])
+    repaired = 0
+    for order_idx in sorted(pending, key=lambda i: _priority_key(orders[i])):
+        found = context.options(order_idx, k=1)
+        if found:
+            _, agent_idx = found[0]
+            context.assign(order_idx, agent_idx)
+            assignment[orders[order_idx].id] = agents[agent_idx].id
+            repaired += 1
+    return repaired
+
+
+def allocate_decomposed(
+    orders: List[Order],
+    agents: List[Agent],
+    products_by_id: Dict[str, Product],
+    warehouse: Warehouse,
+    solver: str = "cpsat",
+    objective: str = "assign",
+    time_limit_seconds: float = 30.0,
+    solver_name: str = "cbc",
+    max_workers: Optional[int] = None,
+    max_component_orders: int = DEFAULT_MAX_COMPONENT_ORDERS,
+) -> Tuple[Dict[str, Optional[str]], DecompositionReport]:
+    """
+    Allocation par décomposition : composantes connexes (exact), découpage par type d'agent
+    des composantes de plus de max_component_orders commandes, résolution parallèle,
+    fusion puis réparation gloutonne (objectif "assign" uniquement).
+
+    Returns:
+        ({order_id: agent_id or None}, rapport)
+    """
+    result = presolve(orders, agents, products_by_id, warehouse, objective=objective)
+    report = DecompositionReport(presolve=result.report)
+
+    subproblems: List[Component] = []
+    for component in result.components:
+        if component.n_orders > max_component_orders:
+            parts = split_by_agent_type(component, result.agents, warehouse)
+            if len(parts) > 1:
+                report.n_split_components += 1
+            subproblems.extend(parts)
+        else:
+            subproblems.append(component)
+    report.n_subproblems = len(subproblems)
+    report.largest_subproblem = max((part.n_orders for part in subproblems), default=0)
+
+    started = time.perf_counter()
+    assignment: Dict[str, Optional[str]] = {order.id: None for order in orders}
+    assignment.update(result.fixed)
+    assignment.update(solve_components(
+        subproblems, result.agents, products_by_id, warehouse, solver=solver, objective=objective,
+        time_limit_seconds=time_limit_seconds, solver_name=solver_name, max_workers=max_workers,
+    ))
+    report.solve_seconds = time.perf_counter() - started
+
+    if objective == "assign":
+        started = time.perf_counter()
+        report.n_repaired = _repair(orders, agents, products_by_id, warehouse, assignment)
+        report.repair_seconds = time.perf_counter() - started
+
+    report.n_assigned = sum(1 for agent_id in assignment.values() if agent_id is not None)
+    return assignment, report
@@ -0,0 +1,338 @@
+"""
+Simulateur à événements discrets de l'entrepôt (file d'événements heapq).
+
+Contrairement à day5_simulation.run_simulation (somme des distances entrée <-> emplacements),
+on simule le temps :
+- les commandes arrivent à leur received_time et attendent dans une file par classe d'agents
+  (express d'abord, puis deadline la plus proche) ;
+- un agent libre part immédiatement avec un lot de commandes compatibles qui tient dans sa capacité,
+  suit une tournée (plus proche voisin + 2-opt) à sa vitesse et passe 30 s par ligne de commande ;
+- congestion : au-delà de zone_capacity agents en tournée dans une même zone, le ramassage
+  dans cette zone est ralenti de congestion_penalty par agent en trop ;
+- les commandes d'un lot sont terminées au retour de l'agent (comme check_deadlines).
+
+Sorties : débit, utilisation des agents et retard par tranche de temps, plus un résumé.
+Chaque décision coûte O(log n) (tas par classe d'agents) : une journée de 50 000 commandes
+se simule en quelques secondes.
+"""
+from __future__ import annotations
+
+import heapq
+import math
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from src.models import Agent, Location, Order, Product, Warehouse
+from src.constraints import build_profile_feasibility, build_zone_index, restriction_profile
+from src.routing import solve_tsp_nearest_neighbor
+
+PICKING_SECONDS_PER_LINE = 30
+_EPS = 1e-9
+# Refus consécutifs tolérés par départ d'agent (borne le coût quand la file est longue)
+_MAX_SKIPS = 8
+
+# Types d'événements (l'ordre sert à départager deux événements simultanés)
+_AGENT_FREE = 0
+_ARRIVAL = 1
+
+
+@dataclass
+class SimulationConfig:
+    zone_capacity: int = 2             # agents simultanés par zone sans ralentissement
+    congestion_penalty: float = 0.5    # +50 % de temps de ramassage par agent au-delà de la capacité
+    bucket_minutes: int = 15           # largeur des tranches des séries temporelles
+    max_orders_per_trip: Optional[int] = None
+
+
+def _hhmm_to_seconds(hhmm: str) -> int:
+    h, m = hhmm.split(":")
+    return int(h) * 3600 + int(m) * 60
+
+
+def _seconds_to_hhmm(seconds: float) -> str:
+    minutes = int(seconds // 60)
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+class _Trip:
+    __slots__ = ("agent_idx", "orders", "start", "end", "zones", "distance")
+
+    def __init__(self, agent_idx: int, orders: List[int], start: float, end: float, zones: Set[str], distance: int):
+        self.agent_idx = agent_idx
+        self.orders = orders
+        self.start = start
+        self.end = end
+        self.zones = zones
+        self.distance = distance
+
+
+class WarehouseSimulator:
+    """Simulation d'une journée : run() traite les événements jusqu'à épuisement de la file."""
+
+    def __init__(
+        self,
+        warehouse: Warehouse,
+        orders: List[Order],
+        agents: List[Agent],
+        products_by_id: Dict[str, Product],
+        config: Optional[SimulationConfig] = None,
+    ) -> None:
+        self.warehouse = warehouse
+        self.orders = orders
+        self.agents = agents
+        self.products_by_id = products_by_id
+        self.config = config or SimulationConfig()
+        self.zone_of = build_zone_index(warehouse)
+
+        # Classes d'agents (même profil de restrictions et mêmes capacités) : une file d'attente par classe.
+        # Deux agents libres d'une classe composent le même lot : si le premier n'en trouve pas, aucun autre.
+        class_by_key: Dict[tuple, int] = {}
+        profiles: List[tuple] = []
+        self.class_of_agent: List[int] = []
+        for agent in agents:
+            key = (restriction_profile(agent), agent.capacity_weight, agent.capacity_volume)
+            if key not in class_by_key:
+                class_by_key[key] = len(profiles)
+                profiles.append(key[0])
+            self.class_of_agent.append(class_by_key[key])
+        self.n_classes = len(profiles)
+        max_w = [0.0] * self.n_classes
+        max_v = [0.0] * self.n_classes
+        for agent_idx, agent in enumerate(agents):
+            class_idx = self.class_of_agent[agent_idx]
+            max_w[class_idx] = max(max_w[class_idx], agent.capacity_weight)
+            max_v[class_idx] = max(max_v[class_idx], agent.capacity_volume)
+
+        # Attributs des commandes
+        self.arrival = [_hhmm_to_seconds(order.received_time) for order in orders]
+        self.deadline = [_hhmm_to_seconds(order.deadline) for order in orders]
+        self.priority = [0 if order.priority == "express" else 1 for order in orders]
+        self.pids: List[frozenset] = []
+        self.incompatible: List[frozenset] = []
+        for order in orders:
+            pids = frozenset(item.product_id for item in order.items)
+            incompatible: Set[str] = set()
+            for pid in pids:
+                product = products_by_id.get(pid)
+                if product is not None:
+                    incompatible.update(product.incompatible_with)
+            self.pids.append(pids)
+            self.incompatible.append(frozenset(incompatible))
+        matrix = build_profile_feasibility(orders, profiles, warehouse, products_by_id)
+        self.allowed_classes: List[List[int]] = [
+            [
+                class_idx for class_idx, allowed in enumerate(row)
+                if allowed
+                and order.total_weight <= max_w[class_idx] + _EPS
+                and order.total_volume <= max_v[class_idx] + _EPS
+            ]
+            for order, row in zip(orders, matrix)
+        ]
+
+    # --- Boucle principale ---
+
+    def run(self) -> Dict[str, Any]:
+        n_agents = len(self.agents)
+        events: List[Tuple[float, int, int, int]] = []
+        for order_idx, arrival in enumerate(self.arrival):
+            if self.allowed_classes[order_idx]:
+                events.append((arrival, _ARRIVAL, order_idx, order_idx))
+        heapq.heapify(events)
+        seq = len(self.orders)
+
+        self.queues: List[List[Tuple[int, int, float, int]]] = [[] for _ in range(self.n_classes)]
+        self.done = [False] * len(self.orders)
+        self.taken = [False] * len(self.orders)
+        # Agents libres par classe (pile : le dernier rentré repart en premier)
+        self.idle: List[List[int]] = [[] for _ in range(self.n_classes)]
+        for agent_idx in reversed(range(n_agents)):
+            self.idle[self.class_of_agent[agent_idx]].append(agent_idx)
+        self.zone_load: Dict[str, int] = {}
+        self.completion = [math.nan] * len(self.orders)
+        self.trips: List[_Trip] = []
+        busy_seconds = [0.0] * n_agents
+
+        while events:
+            now, kind, _, payload = heapq.heappop(events)
+            if kind == _ARRIVAL:
+                order_idx = payload
+                key = (self.priority[order_idx], self.deadline[order_idx], self.arrival[order_idx], order_idx)
+                for class_idx in self.allowed_classes[order_idx]:
+                    heapq.heappush(self.queues[class_idx], key)
+                candidates = [c for c in self.allowed_classes[order_idx] if self.idle[c]]
+            else:
+                trip = self.trips[payload]
+                for order_idx in trip.orders:
+                    self.done[order_idx] = True
+                    self.completion[order_idx] = now
+                for zone in trip.zones:
+                    self.zone_load[zone] -= 1
+                busy_seconds[trip.agent_idx] += trip.end - trip.start
+                class_idx = self.class_of_agent[trip.agent_idx]
+                self.idle[class_idx].append(trip.agent_idx)
+                candidates = [class_idx]
+            # Départs : un agent libre des classes concernées prend un lot
+            for class_idx in candidates:
+                while self.idle[class_idx] and self.queues[class_idx]:
+                    agent_idx = self.idle[class_idx][-1]
+                    trip = self._start_trip(agent_idx, now)
+                    if trip is None:
+                        break
+                    self.idle[class_idx].pop()
+                    self.trips.append(trip)
+                    heapq.heappush(events, (trip.end, _AGENT_FREE, seq, len(self.trips) - 1))
+                    seq += 1
+
+        return self._results(busy_seconds)
+
+    def _start_trip(self, agent_idx: int, now: float) -> Optional[_Trip]:
+        """Compose un lot (file de la classe de l'agent) et calcule la durée de la tournée."""
+        agent = self.agents[agent_idx]
+        queue = self.queues[self.class_of_agent[agent_idx]]
+        rem_w, rem_v = agent.capacity_weight, agent.capacity_volume
+        held: Set[str] = set()
+        forbidden: Set[str] = set()
+        batch: List[int] = []
+        skipped: List[Tuple[int, int, float, int]] = []
+        max_orders = self.config.max_orders_per_trip
+        while queue and len(skipped) < _MAX_SKIPS and (max_orders is None or len(batch) < max_orders):
+            key = heapq.heappop(queue)
+            order_idx = key[3]
+            if self.taken[order_idx]:
+                continue  # déjà partie avec un agent d'une autre classe
+            order = self.orders[order_idx]
+            if (
+                order.total_weight > rem_w + _EPS
+                or order.total_volume > rem_v + _EPS
+                or not self.pids[order_idx].isdisjoint(forbidden)
+                or not self.incompatible[order_idx].isdisjoint(held)
+            ):
+                skipped.append(key)
+                continue
+            batch.append(order_idx)
+            self.taken[order_idx] = True
+            rem_w -= order.total_weight
+            rem_v -= order.total_volume
+            held.update(self.pids[order_idx])
+            forbidden.update(self.incompatible[order_idx])
+        for key in skipped:
+            heapq.heappush(queue, key)
+        if not batch:
+            return None
+
+        # Tournée sur les emplacements uniques du lot
+        locations: List[Location] = []
+        seen: Set[Tuple[int, int]] = set()
+        lines_per_zone: Dict[str, int] = {}
+        for order_idx in batch:
+            for item in self.orders[order_idx].items:
+                product = self.products_by_id.get(item.product_id)
+                if product is None:
+                    continue
+                xy = (product.location.x, product.location.y)
+                zone = self.zone_of.get(xy, "")
+                lines_per_zone[zone] = lines_per_zone.get(zone, 0) + 1
+                if xy not in seen:
+                    seen.add(xy)
+                    locations.append(product.location)
+        _, distance = solve_tsp_nearest_neighbor(locations, self.warehouse.entry_point, max_passes=1)
+
+        # Ramassage ralenti dans les zones déjà saturées
+        config = self.config
+        picking = 0.0
+        for zone, lines in lines_per_zone.items():
+            load = self.zone_load.get(zone, 0) + 1
+            self.zone_load[zone] = load
+            factor = 1.0 + config.congestion_penalty * max(0, load - config.zone_capacity)
+            picking += lines * PICKING_SECONDS_PER_LINE * factor
+        travel = distance / agent.speed if agent.speed > 0 else 0.0
+        return _Trip(agent_idx, batch, now, now + travel + picking, set(lines_per_zone), distance)
+
+    # --- Résultats ---
+
+    def _results(self, busy_seconds: List[float]) -> Dict[str, Any]:
+        n_agents = len(self.agents)
+        bucket = self.config.bucket_minutes * 60
+        served = [i for i in range(len(self.orders)) if self.done[i]]
+        unserved = [self.orders[i].id for i in range(len(self.orders)) if not self.done[i]]
+        start = min(self.arrival, default=0)
+        end = max((trip.end for trip in self.trips), default=start)
+        n_buckets = max(1, math.ceil((end - start) / bucket)) if end > start else 1
+
+        completed = [0] * n_buckets
+        late = [0] * n_buckets
+        lateness_sum = [0.0] * n_buckets
+        for order_idx in served:
+            b = min(n_buckets - 1, int((self.completion[order_idx] - start) // bucket))
+            completed[b] += 1
+            lateness = self.completion[order_idx] - self.deadline[order_idx]
+            if lateness > 0:
+                late[b] += 1
+                lateness_sum[b] += lateness
+
+        # Utilisation : part du temps agent passée en tournée, répartie sur les tranches couvertes
+        busy = [0.0] * n_buckets
+        for trip in self.trips:
+            t = trip.start
+            while t < trip.end:
+                b = min(n_buckets - 1, int((t - start) // bucket))
+                bucket_end = start + (b + 1) * bucket
+                step = min(trip.end, bucket_end) - t
+                if step <= 0:
+                    step = trip.end - t
+                busy[b] += step
+                t += step
+
+        timeline = [
+            {
+                "start": _seconds_to_hhmm(start + b * bucket),
+                "completed": completed[b],
+                "throughput_per_hour": round(completed[b] * 3600 / bucket, 1),
+                "utilization": round(busy[b] / (n_agents * bucket), 3) if n_agents else 0.0,
+                "late": late[b],
+                "mean_lateness_min": round(lateness_sum[b] / late[b] / 60, 1) if late[b] else 0.0,
+            }
+            for b in range(n_buckets)
+        ]
+        waits = sorted(
+            trip.start - self.arrival[order_idx] for trip in self.trips for order_idx in trip.orders
+        )
+        total_lateness = [
+            max(0.0, self.completion[i] - self.deadline[i]) for i in served
+        ]
+        horizon = max(end - start, 1)
+        return {
+            "n_orders": len(self.orders),
+            "n_completed": len(served),
+            "unserved": unserved,
+            "n_trips": len(self.trips),
+            "makespan": _seconds_to_hhmm(end),
+            "throughput_per_hour": round(len(served) * 3600 / horizon, 1),
+            "total_distance": sum(trip.distance for trip in self.trips),
+            "n_late": sum(1 for lateness in total_lateness if lateness > 0),
+            "mean_lateness_min": round(sum(total_lateness) / len(served) / 60, 2) if served else 0.0,
+            "p95_wait_min": round(waits[int(0.95 * (len(waits) - 1))] / 60, 1) if waits else 0.0,
+            "utilization": {
+                agent.id: round(busy_seconds[agent_idx] / horizon, 3)
+                for agent_idx, agent in enumerate(self.agents)
+            },
+            "timeline": timeline,
+        }
+
+
+def simulate_day(
+    warehouse: Warehouse,
+    orders: List[Order],
+    agents: List[Agent],
+    products_by_id: Dict[str, Product],
+    config: Optional[SimulationConfig] = None,
+) -> Dict[str, Any]:
+    """
+    Simule une journée (commandes enrichies : total_weight, total_volume, unique_locations).
+
+    Returns:
+        {"n_completed", "unserved", "n_trips", "makespan", "throughput_per_hour", "total_distance",
+         "n_late", "mean_lateness_min", "p95_wait_min", "utilization": {agent_id: part},
+         "timeline": [{"start", "completed", "throughput_per_hour", "utilization", "late", "mean_lateness_min"}]}
+    """
+    return WarehouseSimulator(warehouse, orders, agents, products_by_id, config).run()
@@ -0,0 +1,148 @@
+"""
+Jobs de calcul en arrière-plan pour l'interface web (allocation, MiniZinc, ...).
+
+- Un pool de threads exécute les jobs : un handler HTTP soumet et répond aussitôt.
+- Singleflight : deux soumissions de même clé pendant qu'un job est en attente ou en cours
+  partagent le même job (un seul calcul pour tous les clients).
+- Annulation : un job en attente est retiré de la file ; un job en cours ne peut pas être
+  interrompu (le solveur s'arrête à son échéance), son résultat est alors ignoré.
+- Les jobs terminés sont conservés (max_history) pour que les clients lisent statut et résultat.
+"""
+from __future__ import annotations
+
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED = (DONE, FAILED, CANCELLED)
+
+
+@dataclass
+class Job:
+    id: str
+    key: Hashable
+    submitted_at: float
+    status: str = QUEUED
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    result: Any = None
+    error: Optional[str] = None
+    cancel_requested: bool = False
+    future: Optional[Future] = field(default=None, repr=False)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Statut sérialisable (sans le résultat)."""
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "submitted_at": self.submitted_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "duration_sec": round(self.finished_at - self.started_at, 3)
+            if self.finished_at is not None and self.started_at is not None else None,
+            "error": self.error,
+        }
+
+
+class JobManager:
+    def __init__(self, max_workers: int = 2, max_history: int = 200) -> None:
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="optipick-job")
+        self._lock = threading.Lock()
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._inflight: Dict[Hashable, Job] = {}
+        self._ids = itertools.count(1)
+        self.max_history = max_history
+
+    def submit(self, key: Hashable, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Tuple[Job, bool]:
+        """
+        Soumet fn(*args, **kwargs) sous la clé key.
+
+        Returns:
+            (job, coalesced) : coalesced=True si un job de même clé était déjà en attente ou en cours.
+        """
+        with self._lock:
+            job = self._inflight.get(key)
+            if job is not None:
+                return job, True
+            job = Job(id=f"job-{next(self._ids)}", key=key, submitted_at=time.time())
+            self._jobs[job.id] = job
+            self._inflight[key] = job
+            self._trim_history()
+            job.future = self._executor.submit(self._run, job, fn, args, kwargs)
+        return job, False
+
+    def _run(self, job: Job, fn: Callable[..., Any], args: tuple, kwargs: dict) -> Any:
+        with self._lock:
+            if job.cancel_requested:
+                job.status = CANCELLED
+                job.finished_at = time.time()
+                return None
+            job.status = RUNNING
+            job.started_at = time.time()
+        try:
+            result, error, status = fn(*args, **kwargs), None, DONE
+        except Exception as e:
+            result, error, status = None, str(e), FAILED
+        with self._lock:
+            job.finished_at = time.time()
+            if job.cancel_requested:
+                job.status = CANCELLED
+            else:
+                job.status, job.result, job.error = status, result, error
+            if self._inflight.get(job.key) is job:
+                del self._inflight[job.key]
+        return job.result
+
+    def _trim_history(self) -> None:
+        # Les plus anciens jobs terminés sont oubliés (ceux en cours sont toujours gardés)
+        excess = len(self._jobs) - self.max_history
+        if excess <= 0:
+            return
+        for job_id in [jid for jid, job in self._jobs.items() if job.status in FINISHED][:excess]:
+            del self._jobs[job_id]
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list(self) -> List[Job]:
+        with self._lock:
+            return list(self._jobs.values())
+
+    def cancel(self, job_id: str) -> bool:
+        """Annule un job non terminé. Retourne False si le job est inconnu ou déjà terminé."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.status in FINISHED:
+                return False
+            job.cancel_requested = True
+            if self._inflight.get(job.key) is job:
+                del self._inflight[job.key]
+            if job.status == QUEUED and job.future is not None and job.future.cancel():
+                job.status = CANCELLED
+                job.finished_at = time.time()
+            return True
+
+    def wait(self, job_id: str, timeout: Optional[float] = None) -> Optional[Job]:
+        """Attend la fin du job (au plus timeout secondes) et le retourne ; None si inconnu."""
+        job = self.get(job_id)
+        if job is None or job.future is None:
+            return job
+        try:
+            job.future.result(timeout=timeout)
+        except Exception:
+            # Échéance dépassée ou job annulé : le statut du job le dit
+            pass
+        return job
+
+    def shutdown(self, wait: bool = False) -> None:
+        self._executor.shutdown(wait=wait, cancel_futures=True)
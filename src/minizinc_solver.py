@@ -2,18 +2,46 @@
 Interface MiniZinc pour l'allocation optimale (Jour 2).
 Charge models/allocation.mzn, construit les paramètres depuis les données Python,
 et retourne l'assignment {order_id: agent_id or None}.
+
+Instance de base par (hash du modèle, solveur) : seule l'analyse de l'interface du modèle
+(paramètres et variables, faite par le package minizinc à la création d'une Instance) est évitée,
+chaque appel partant d'une branche de cette instance. Chaque résolution relance en revanche
+l'exécutable minizinc, qui relit le modèle et l'aplatit à nouveau avec les données : la FlatZinc
+embarquant les données, elle n'est pas réutilisable d'un jeu de données à l'autre, et minizinc n'a
+pas de mode serveur. Le gain réel vient du cache de solutions par (hash du modèle, solveur, hash des
+données), qui évite le solveur lors du rafraîchissement périodique de l'interface web sur données inchangées.
+Les données sont transmises en bloc JSON. Un mode asyncio (allocate_with_minizinc_async) lit les
+solutions intermédiaires et rend la meilleure trouvée à l'échéance.
 """
 from __future__ import annotations
 
+import asyncio
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from datetime import timedelta
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
 
 from src.models import Agent, Order, Product, Warehouse
-from src.constraints import get_product_zone, can_combine
+from src.constraints import build_zone_index, order_conflict_sets
 
 MINIZINC_AVAILABLE = False
 _minizinc_checked = False
 
+MODEL_PATH = Path(__file__).parent.parent / "models" / "allocation.mzn"
+RESULT_CACHE_SIZE = 32
+# Solveurs MiniZinc acceptés par l'API web (noms passés à Solver.lookup)
+KNOWN_SOLVERS = ("cbc", "coin-bc", "highs", "gecode", "chuffed")
+_ASYNC_GRACE_SECONDS = 2.0
+
+_session_lock = threading.Lock()
+_model_hashes: Dict[Tuple[str, float], str] = {}
+_base_instances: Dict[Tuple[str, str], Any] = {}
+_solver_flags: Dict[str, set] = {}  # options standard acceptées par chaque solveur (-p, -i, -a...)
+_result_cache: "OrderedDict[str, Tuple[List[int], str]]" = OrderedDict()
+
 
 def check_minizinc_available() -> bool:
     """Vérifie si MiniZinc est installé et utilisable (package Python + exécutable)."""
@@ -31,6 +59,38 @@ def check_minizinc_available() -> bool:
         return False
 
 
+def _model_hash(model_path: Path) -> str:
+    """Hash du fichier .mzn, recalculé seulement si le fichier a changé (mtime)."""
+    key = (str(model_path), model_path.stat().st_mtime)
+    if key not in _model_hashes:
+        _model_hashes[key] = hashlib.sha1(model_path.read_bytes()).hexdigest()
+    return _model_hashes[key]
+
+
+def _get_base_instance(solver_name: str, model_path: Path = MODEL_PATH) -> Tuple[Any, str]:
+    """Instance dont l'interface est analysée une fois par (modèle, solveur) ; les appels travaillent sur des branches."""
+    from minizinc import Instance, Model, Solver
+
+    model_hash = _model_hash(model_path)
+    key = (model_hash, solver_name)
+    with _session_lock:
+        base = _base_instances.get(key)
+        if base is None:
+            solver = Solver.lookup(solver_name)
+            _solver_flags[solver_name] = set(getattr(solver, "stdFlags", []) or [])
+            base = Instance(solver, Model(str(model_path)))
+            _base_instances[key] = base
+    return base, model_hash
+
+
+def clear_minizinc_cache() -> None:
+    """Vide les instances de base et le cache de solutions (ex. après modification du modèle)."""
+    with _session_lock:
+        _base_instances.clear()
+        _result_cache.clear()
+        _model_hashes.clear()
+
+
 def _zone_to_int(zone: Optional[str]) -> int:
     zone_map = {"A": 0, "B": 1, "C": 2, "D": 3, "E": 4}
     return zone_map.get(zone, 0) if zone else 0
@@ -40,59 +100,56 @@ def _build_incompatible_matrix(
     orders: List[Order],
     products_by_id: Dict[str, Product],
 ) -> List[List[bool]]:
-    """Matrice n_orders x n_orders : incompatible[i][j] = True si commandes i et j incompatibles."""
+    """
+    Matrice n_orders x n_orders : incompatible[i][j] = True si commandes i et j incompatibles.
+    Même règle que can_combine, mais seules les paires partageant un produit en conflit sont visitées.
+    """
     n = len(orders)
     mat = [[False] * n for _ in range(n)]
+    pids, conflicts, self_incompatible = order_conflict_sets(orders, products_by_id)
+    orders_of_pid: Dict[str, List[int]] = {}
+    for i, order_pids in enumerate(pids):
+        for pid in order_pids:
+            orders_of_pid.setdefault(pid, []).append(i)
     for i in range(n):
-        for j in range(i + 1, n):
-            prods_i = [products_by_id[it.product_id] for it in orders[i].items if it.product_id in products_by_id]
-            prods_j = [products_by_id[it.product_id] for it in orders[j].items if it.product_id in products_by_id]
-            if not can_combine(prods_i + prods_j):
-                mat[i][j] = True
-                mat[j][i] = True
+        for pid in conflicts[i]:
+            for j in orders_of_pid.get(pid, ()):
+                if j != i:
+                    mat[i][j] = True
+                    mat[j][i] = True
+        if self_incompatible[i]:
+            for j in range(n):
+                if j != i:
+                    mat[i][j] = True
+                    mat[j][i] = True
     return mat
 
 
-def allocate_with_minizinc(
+def _build_instance_data(
     orders: List[Order],
     agents: List[Agent],
     products_by_id: Dict[str, Product],
     warehouse: Warehouse,
-    solver_name: str = "cbc",
-) -> Dict[str, Optional[str]]:
+    unavailable_agents: Optional[Set[str]] = None,
+    unavailable_orders: Optional[Set[str]] = None,
+) -> Dict[str, Any]:
     """
-    Allocation optimale avec MiniZinc (modèle allocation.mzn).
-    Maximise le nombre de commandes assignées sous les contraintes.
-
-    Returns:
-        {order_id: agent_id or None}
+    Paramètres du modèle allocation.mzn (sérialisables en JSON).
+    unavailable_agents / unavailable_orders (ids) alimentent l'extension 3 :
+    agents en panne ou en pause, commandes en rupture de stock.
     """
-    if not check_minizinc_available():
-        raise RuntimeError(
-            "MiniZinc non disponible. Installez : 1) MiniZinc depuis https://www.minizinc.org/ "
-            "2) pip install minizinc"
-        )
-
-    from minizinc import Instance, Model, Solver
-
     n_orders = len(orders)
     n_agents = len(agents)
-    if n_orders == 0 or n_agents == 0:
-        return {o.id: None for o in orders}
-
-    model_path = Path(__file__).parent.parent / "models" / "allocation.mzn"
-    model = Model(str(model_path))
-    solver = Solver.lookup(solver_name)
-    instance = Instance(solver, model)
-
-    instance["n_orders"] = n_orders
-    instance["n_agents"] = n_agents
-    instance["capacity_weight"] = [a.capacity_weight for a in agents]
-    instance["capacity_volume"] = [a.capacity_volume for a in agents]
+    data: Dict[str, Any] = {
+        "n_orders": n_orders,
+        "n_agents": n_agents,
+        "capacity_weight": [a.capacity_weight for a in agents],
+        "capacity_volume": [a.capacity_volume for a in agents],
+    }
     agent_type_map = {"robot": 0, "human": 1, "cart": 2}
-    instance["agent_type"] = [agent_type_map.get(a.type, 0) for a in agents]
-    instance["order_weight"] = [o.total_weight for o in orders]
-    instance["order_volume"] = [o.total_volume for o in orders]
+    data["agent_type"] = [agent_type_map.get(a.type, 0) for a in agents]
+    data["order_weight"] = [o.total_weight for o in orders]
+    data["order_volume"] = [o.total_volume for o in orders]
 
     no_zones_map = {"A": 0, "B": 1, "C": 2, "D": 3, "E": 4}
     forbidden_zones = []
@@ -104,11 +161,12 @@ def allocate_with_minizinc(
             if idx is not None:
                 row[idx] = True
         forbidden_zones.append(row)
-    instance["forbidden_zones"] = forbidden_zones
+    data["forbidden_zones"] = forbidden_zones
 
-    instance["no_fragile"] = [agent.restrictions.get("no_fragile", False) for agent in agents]
-    instance["max_item_weight"] = [float(agent.restrictions.get("max_item_weight", 0) or 0) for agent in agents]
+    data["no_fragile"] = [agent.restrictions.get("no_fragile", False) for agent in agents]
+    data["max_item_weight"] = [float(agent.restrictions.get("max_item_weight", 0) or 0) for agent in agents]
 
+    zone_index = build_zone_index(warehouse)
     order_zones = []
     order_has_fragile = []
     order_max_item_weight = []
@@ -121,8 +179,7 @@ def allocate_with_minizinc(
         for item in order.items:
             prod = products_by_id.get(item.product_id)
             if prod:
-                loc = prod.location
-                zn = get_product_zone(warehouse, loc)
+                zn = zone_index.get((prod.location.x, prod.location.y))
                 zone_int = _zone_to_int(zn) if zn else 0
                 if getattr(prod, "fragile", False):
                     has_fragile = True
@@ -136,51 +193,244 @@ def allocate_with_minizinc(
         order_has_fragile.append(has_fragile)
         order_max_item_weight.append(max_w)
         order_has_high_level.append(has_high)
-    instance["order_zones"] = order_zones
-    instance["order_has_fragile"] = order_has_fragile
-    instance["order_max_item_weight"] = order_max_item_weight
-    instance["order_has_high_level"] = order_has_high_level
+    data["order_zones"] = order_zones
+    data["order_has_fragile"] = order_has_fragile
+    data["order_max_item_weight"] = order_max_item_weight
+    data["order_has_high_level"] = order_has_high_level
 
     # EXTENSION 2 : Commandes express (par défaut toutes standard)
-    instance["order_is_express"] = [
-        getattr(order, "priority", "standard") == "express" 
+    data["order_is_express"] = [
+        getattr(order, "priority", "standard") == "express"
         for order in orders
     ]
 
     # EXTENSION 3 : Agents disponibles (par défaut tous disponibles)
-    instance["agent_available"] = [True] * n_agents
-    
+    unavailable_agents = unavailable_agents or set()
+    data["agent_available"] = [a.id not in unavailable_agents for a in agents]
+
     # EXTENSION 3 : Commandes disponibles (par défaut toutes disponibles)
-    instance["order_available"] = [True] * n_orders
+    unavailable_orders = unavailable_orders or set()
+    data["order_available"] = [o.id not in unavailable_orders for o in orders]
 
     # EXTENSION 4 : Zones congestionnées (par défaut pas de congestion)
-    instance["zone_congestion_penalty"] = [0.0] * 5  # Pas de pénalité par défaut
-    instance["zone_speed_factor"] = [1.0] * 5  # Vitesse normale par défaut
+    data["zone_congestion_penalty"] = [0.0] * 5  # Pas de pénalité par défaut
+    data["zone_speed_factor"] = [1.0] * 5  # Vitesse normale par défaut
 
     # EXTENSION 5 : Scores de préférence RL (par défaut tous à 0.0 = pas de préférence)
     # Matrice n_orders × n_agents : scores de préférence appris par RL
     # Si un modèle RL est disponible, ces scores peuvent être remplis avec les préférences apprises
-    instance["rl_preference_scores"] = [[0.0] * n_agents for _ in range(n_orders)]
+    data["rl_preference_scores"] = [[0.0] * n_agents for _ in range(n_orders)]
 
-    instance["incompatible"] = _build_incompatible_matrix(orders, products_by_id)
+    data["incompatible"] = _build_incompatible_matrix(orders, products_by_id)
+    return data
 
-    result = instance.solve()
-    if result is None:
-        return {o.id: None for o in orders}
 
-    assign_arr = result["assignment"]
+def _data_key(model_hash: str, solver_name: str, data: Dict[str, Any]) -> str:
+    """Clé du cache de solutions : même modèle, même solveur, mêmes données."""
+    blob = json.dumps(data, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha1(f"{model_hash}|{solver_name}|{blob}".encode("utf-8")).hexdigest()
+
+
+def _solution_vector(assign_arr: Any) -> List[int]:
     if hasattr(assign_arr, "__iter__") and not isinstance(assign_arr, (str, dict)):
-        assign_list = list(assign_arr)
-    else:
-        assign_list = [assign_arr]
+        return list(assign_arr)
+    return [assign_arr]
+
 
+def _decode_assignment(
+    assign_list: List[int],
+    orders: List[Order],
+    agents: List[Agent],
+) -> Dict[str, Optional[str]]:
+    """Vecteur MiniZinc (0 = non assigné, 1..n_agents) -> {order_id: agent_id or None}."""
+    n_agents = len(agents)
     assignment = {}
     for i, order in enumerate(orders):
-        idx = i if i < len(assign_list) else 0
-        val = assign_list[idx] if idx < len(assign_list) else 0
+        val = assign_list[i] if i < len(assign_list) else 0
         if val and 1 <= val <= n_agents:
             assignment[order.id] = agents[val - 1].id
         else:
             assignment[order.id] = None
-
     return assignment
+
+
+def _cached_solution(key: str) -> Optional[Tuple[List[int], str]]:
+    with _session_lock:
+        cached = _result_cache.get(key)
+        if cached is not None:
+            _result_cache.move_to_end(key)
+        return cached
+
+
+def _store_solution(key: str, solution: List[int], status: str) -> None:
+    with _session_lock:
+        _result_cache[key] = (solution, status)
+        while len(_result_cache) > RESULT_CACHE_SIZE:
+            _result_cache.popitem(last=False)
+
+
+def _solve_options(
+    solver_name: str,
+    time_limit_seconds: Optional[float],
+    processes: Optional[int],
+) -> Dict[str, Any]:
+    """Options de résolution ; processes n'est transmis que si le solveur accepte -p."""
+    options: Dict[str, Any] = {}
+    if time_limit_seconds is not None:
+        options["timeout"] = timedelta(seconds=time_limit_seconds)
+    if processes is not None and "-p" in _solver_flags.get(solver_name, set()):
+        options["processes"] = processes
+    return options
+
+
+def _require_minizinc() -> None:
+    if not check_minizinc_available():
+        raise RuntimeError(
+            "MiniZinc non disponible. Installez : 1) MiniZinc depuis https://www.minizinc.org/ "
+            "2) pip install minizinc"
+        )
+
+
+def _prepare(
+    orders: List[Order],
+    agents: List[Agent],
+    products_by_id: Dict[str, Product],
+    warehouse: Warehouse,
+    solver_name: str,
+    unavailable_agents: Optional[Set[str]] = None,
+    unavailable_orders: Optional[Set[str]] = None,
+) -> Tuple[Any, Dict[str, Any], str]:
+    base, model_hash = _get_base_instance(solver_name)
+    data = _build_instance_data(orders, agents, products_by_id, warehouse, unavailable_agents, unavailable_orders)
+    return base, data, _data_key(model_hash, solver_name, data)
+
+
+def allocate_with_minizinc(
+    orders: List[Order],
+    agents: List[Agent],
+    products_by_id: Dict[str, Product],
+    warehouse: Warehouse,
+    solver_name: str = "cbc",
+    stats: Optional[Dict[str, Any]] = None,
+    use_cache: bool = True,
+    time_limit_seconds: Optional[float] = None,
+    processes: Optional[int] = None,
+    unavailable_agents: Optional[Set[str]] = None,
+    unavailable_orders: Optional[Set[str]] = None,
+) -> Dict[str, Optional[str]]:
+    """
+    Allocation optimale avec MiniZinc (modèle allocation.mzn).
+    Maximise le nombre de commandes assignées sous les contraintes.
+    Si stats est fourni, il reçoit le statut du solveur ("OPTIMAL_SOLUTION", "SATISFIED", ...)
+    et "cache" ("hit" si la solution vient du cache de session, sinon "miss").
+    Avec time_limit_seconds, le solveur est arrêté à l'échéance et la meilleure solution trouvée est rendue.
+    unavailable_agents / unavailable_orders : ids exclus par le modèle (ré-optimisation, extension 3).
+
+    Returns:
+        {order_id: agent_id or None}
+    """
+    _require_minizinc()
+    if not orders or not agents:
+        return {o.id: None for o in orders}
+    base, data, key = _prepare(
+        orders, agents, products_by_id, warehouse, solver_name, unavailable_agents, unavailable_orders,
+    )
+    cached = _cached_solution(key) if use_cache else None
+    if cached is not None:
+        solution, status = cached
+        if stats is not None:
+            stats["status"] = status
+            stats["cache"] = "hit"
+        return _decode_assignment(solution, orders, agents)
+
+    # Branche de l'instance de base : les données sont écrites en JSON, minizinc aplatit modèle + données
+    with base.branch() as instance:
+        for name, value in data.items():
+            instance[name] = value
+        result = instance.solve(**_solve_options(solver_name, time_limit_seconds, processes))
+    status = result.status.name if result is not None else "ERROR"
+    if stats is not None:
+        stats["status"] = status
+        stats["cache"] = "miss"
+    if result is None or result.solution is None:
+        return {o.id: None for o in orders}
+
+    solution = _solution_vector(result["assignment"])
+    # Une solution interrompue par l'échéance n'est pas mise en cache (elle n'est pas forcément optimale)
+    if use_cache and result.status.has_solution() and (time_limit_seconds is None or status == "OPTIMAL_SOLUTION"):
+        _store_solution(key, solution, status)
+    return _decode_assignment(solution, orders, agents)
+
+
+async def allocate_with_minizinc_async(
+    orders: List[Order],
+    agents: List[Agent],
+    products_by_id: Dict[str, Product],
+    warehouse: Warehouse,
+    solver_name: str = "cbc",
+    time_limit_seconds: float = 10.0,
+    processes: Optional[int] = None,
+    on_solution: Optional[Callable[[Dict[str, Optional[str]], Optional[float]], None]] = None,
+    stats: Optional[Dict[str, Any]] = None,
+    use_cache: bool = True,
+    unavailable_agents: Optional[Set[str]] = None,
+    unavailable_orders: Optional[Set[str]] = None,
+) -> Dict[str, Optional[str]]:
+    """
+    Version asyncio : les solutions intermédiaires sont lues au fil de l'eau
+    (instance.solutions), on_solution(assignment, objectif) est appelé pour chacune.
+    À l'échéance, la meilleure solution trouvée jusque-là est rendue (toutes à None si aucune).
+    Un serveur asynchrone peut l'attendre sans bloquer de thread.
+
+    Returns:
+        {order_id: agent_id or None}
+    """
+    _require_minizinc()
+    if not orders or not agents:
+        return {o.id: None for o in orders}
+    # Analyse du modèle et construction des données (CPU) hors de la boucle d'événements
+    loop = asyncio.get_running_loop()
+    base, data, key = await loop.run_in_executor(
+        None, _prepare,
+        orders, agents, products_by_id, warehouse, solver_name, unavailable_agents, unavailable_orders,
+    )
+    cached = _cached_solution(key) if use_cache else None
+    if cached is not None:
+        solution, status = cached
+        if stats is not None:
+            stats["status"] = status
+            stats["cache"] = "hit"
+        return _decode_assignment(solution, orders, agents)
+
+    best: Dict[str, Any] = {"solution": None, "status": "UNKNOWN", "n_solutions": 0}
+    options = _solve_options(solver_name, time_limit_seconds, processes)
+    intermediate = bool({"-i", "-a"} & _solver_flags.get(solver_name, set()))
+
+    async def consume() -> None:
+        with base.branch() as instance:
+            for name, value in data.items():
+                instance[name] = value
+            async for result in instance.solutions(intermediate_solutions=intermediate, **options):
+                best["status"] = result.status.name
+                if result.solution is None:
+                    continue
+                best["solution"] = _solution_vector(result["assignment"])
+                best["n_solutions"] += 1
+                if on_solution is not None:
+                    objective = getattr(result.solution, "objective", None)
+                    on_solution(_decode_assignment(best["solution"], orders, agents), objective)
+
+    try:
+        # Garde-fou : le solveur a son propre timeout, on laisse une marge pour son arrêt propre
+        await asyncio.wait_for(consume(), timeout=time_limit_seconds + _ASYNC_GRACE_SECONDS)
+    except asyncio.TimeoutError:
+        best["status"] = "UNKNOWN" if best["solution"] is None else "SATISFIED"
+    if stats is not None:
+        stats["status"] = best["status"]
+        stats["cache"] = "miss"
+        stats["n_solutions"] = best["n_solutions"]
+    if best["solution"] is None:
+        return {o.id: None for o in orders}
+    if use_cache and best["status"] == "OPTIMAL_SOLUTION":
+        _store_solution(key, best["solution"], best["status"])
+    return _decode_assignment(best["solution"], orders, agents)
@@ -3,7 +3,7 @@ Classes Warehouse, Product, Agent, Order pour le projet OptiPick.
 """
 from __future__ import annotations
 
-from dataclasses import dataclass, field
+from dataclasses import dataclass, field, replace
 from typing import Dict, List, Any
 
 
@@ -99,3 +99,11 @@ class Human(Agent):
 
 class Cart(Agent):
     pass
+
+
+def clone_agents(agents: List[Agent]) -> List[Agent]:
+    """Copies des agents sans affectation (même classe, mêmes capacités et restrictions)."""
+    return [
+        replace(agent, restrictions=dict(agent.restrictions), assigned_orders=[], used_weight=0.0, used_volume=0.0)
+        for agent in agents
+    ]
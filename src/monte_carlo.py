@@ -0,0 +1,247 @@
+"""
+Scénarios Monte Carlo : stockage actuel vs optimisé sur de nombreux jeux de commandes synthétiques.
+
+- Chaque scénario a son propre flux aléatoire (numpy.random.SeedSequence.spawn) : les résultats
+  sont reproductibles et indépendants du nombre de processus ou de l'ordre d'exécution.
+- La génération est vectorisée (tirage avec rejet des lignes à doublons, ou clés aléatoires
+  + argpartition par blocs quand les commandes couvrent une grande part du catalogue) :
+  des millions de commandes sont produites sous forme de tableaux (offsets, produits, quantités)
+  avant d'être matérialisées en Order pour l'évaluation.
+- Les scénarios sont évalués en parallèle (ProcessPoolExecutor) avec run_simulation ;
+  on rapporte moyenne, écart-type et intervalle de confiance à 95 % de chaque métrique.
+"""
+from __future__ import annotations
+
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.models import Agent, Order, OrderItem, Product, Warehouse
+from src.day5_simulation import _enrich_orders, run_simulation
+
+ALLOCATORS = ("first_fit", "best_fit", "cheapest", "regret")
+# Nombre max de clés aléatoires tirées par bloc (commandes x produits) lors de la génération
+_GENERATION_BLOCK = 4_000_000
+# Quantiles t de Student à 97,5 % (IC bilatéral à 95 %) pour 1..30 degrés de liberté, puis loi normale
+_T_975 = [
+    12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228,
+    2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101, 2.093, 2.086,
+    2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045, 2.042,
+]
+_Z_975 = 1.96
+
+
+def generate_order_arrays(
+    rng: np.random.Generator,
+    n_products: int,
+    n_orders: int,
+    min_items: int = 1,
+    max_items: int = 5,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Tire n_orders commandes de min_items..max_items produits distincts (quantités 1..3).
+
+    Returns:
+        (offsets, product_idx, quantity) : les lignes de la commande i sont
+        product_idx[offsets[i]:offsets[i+1]] (indices dans la liste des produits).
+    """
+    max_items = max(1, min(max_items, n_products))
+    min_items = max(1, min(min_items, max_items))
+    counts = rng.integers(min_items, max_items + 1, size=n_orders)
+    if 2 * max_items <= n_products:
+        chosen = _sample_rejection(rng, n_products, n_orders, max_items)
+    else:
+        chosen = _sample_keys(rng, n_products, n_orders, max_items)
+    product_idx = chosen[np.arange(max_items) < counts[:, None]]
+    quantity = rng.integers(1, 4, size=len(product_idx))
+    offsets = np.zeros(n_orders + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+    return offsets, product_idx, quantity
+
+
+def _sample_rejection(rng: np.random.Generator, n_products: int, n_orders: int, k: int) -> np.ndarray:
+    """
+    k produits distincts par ligne : tirage avec remise, puis nouveau tirage des seules lignes
+    contenant un doublon (peu nombreuses quand k << n_products). Les lignes acceptées sont des
+    tirages ordonnés uniformes sans remise.
+    """
+    chosen = rng.integers(0, n_products, size=(n_orders, k))
+    redraw = np.arange(n_orders)
+    while len(redraw):
+        rows = np.sort(chosen[redraw], axis=1)
+        redraw = redraw[(rows[:, 1:] == rows[:, :-1]).any(axis=1)]
+        chosen[redraw] = rng.integers(0, n_products, size=(len(redraw), k))
+    return chosen
+
+
+def _sample_keys(rng: np.random.Generator, n_products: int, n_orders: int, k: int) -> np.ndarray:
+    """k produits distincts par ligne : les k plus petites clés aléatoires (par blocs), triées par clé."""
+    block = max(1, _GENERATION_BLOCK // n_products)
+    parts = []
+    for start in range(0, n_orders, block):
+        keys = rng.random((min(block, n_orders - start), n_products))
+        top = np.argpartition(keys, k - 1, axis=1)[:, :k]
+        order_in_top = np.argsort(np.take_along_axis(keys, top, axis=1), axis=1)
+        parts.append(np.take_along_axis(top, order_in_top, axis=1))
+    return np.concatenate(parts) if parts else np.empty((0, k), dtype=np.int64)
+
+
+def build_orders(
+    product_ids: Sequence[str],
+    offsets: np.ndarray,
+    product_idx: np.ndarray,
+    quantity: np.ndarray,
+    prefix: str = "Sim_Order",
+) -> List[Order]:
+    """Matérialise les tableaux de generate_order_arrays en Order (mêmes horaires que generate_test_orders)."""
+    pids = [product_ids[i] for i in product_idx.tolist()]
+    qtys = quantity.tolist()
+    bounds = offsets.tolist()
+    return [
+        Order(
+            id=f"{prefix}_{i + 1:03d}",
+            received_time="09:00",
+            deadline="12:00",
+            priority="standard",
+            items=[OrderItem(product_id=pids[k], quantity=qtys[k]) for k in range(bounds[i], bounds[i + 1])],
+        )
+        for i in range(len(bounds) - 1)
+    ]
+
+
+def confidence_interval(values: Sequence[float]) -> Dict[str, float]:
+    """Moyenne, écart-type (non biaisé) et IC à 95 % de la moyenne (t de Student)."""
+    n = len(values)
+    if n == 0:
+        return {"mean": math.nan, "std": math.nan, "ci_low": math.nan, "ci_high": math.nan, "n": 0}
+    mean = sum(values) / n
+    if n == 1:
+        return {"mean": mean, "std": 0.0, "ci_low": mean, "ci_high": mean, "n": 1}
+    std = math.sqrt(sum((v - mean) ** 2 for v in values) / (n - 1))
+    quantile = _T_975[n - 2] if n - 1 <= len(_T_975) else _Z_975
+    half_width = quantile * std / math.sqrt(n)
+    return {"mean": mean, "std": std, "ci_low": mean - half_width, "ci_high": mean + half_width, "n": n}
+
+
+# --- Processus de travail : données partagées une fois par processus (initializer) ---
+
+_worker_data: Dict[str, Any] = {}
+
+
+def _init_worker(warehouse, agents, products_current, products_optimized, allocator, simulate_events) -> None:
+    _worker_data.update(
+        warehouse=warehouse, agents=agents, products_current=products_current,
+        products_optimized=products_optimized, allocator=allocator, simulate_events=simulate_events,
+    )
+
+
+def _allocate_fn(allocator: str, products_by_id: Dict[str, Product], warehouse: Warehouse):
+    if allocator == "first_fit":
+        from main import allocate_first_fit
+        return allocate_first_fit
+    from src.allocation import GREEDY_ALLOCATORS
+    allocate = GREEDY_ALLOCATORS[allocator]
+    return lambda orders, agents: allocate(orders, agents, products_by_id, warehouse)
+
+
+def _run_scenario(task: Tuple[int, np.random.SeedSequence, int, int, int]) -> Dict[str, Any]:
+    scenario_idx, seed_seq, n_orders, min_items, max_items = task
+    data = _worker_data
+    products_current = data["products_current"]
+    product_ids = list(products_current)
+    rng = np.random.default_rng(seed_seq)
+    offsets, product_idx, quantity = generate_order_arrays(rng, len(product_ids), n_orders, min_items, max_items)
+    orders = build_orders(product_ids, offsets, product_idx, quantity, prefix=f"MC{scenario_idx}")
+    metrics = run_simulation(
+        data["warehouse"], orders, data["agents"], products_current, data["products_optimized"],
+        _allocate_fn(data["allocator"], products_current, data["warehouse"]),
+        simulate_events=data["simulate_events"],
+    )
+    metrics["scenario"] = scenario_idx
+    return metrics
+
+
+def _numeric_metrics(metrics: Dict[str, Any]) -> Dict[str, float]:
+    """Métriques numériques d'un scénario (les résumés du simulateur sont aplatis : events_current.xxx)."""
+    flat: Dict[str, float] = {}
+    for key, value in metrics.items():
+        if key == "scenario":
+            continue
+        if isinstance(value, dict):
+            for sub_key, sub_value in value.items():
+                if isinstance(sub_value, (int, float)) and not isinstance(sub_value, bool):
+                    flat[f"{key}.{sub_key}"] = float(sub_value)
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[key] = float(value)
+    return flat
+
+
+def run_monte_carlo(
+    warehouse: Warehouse,
+    agents: List[Agent],
+    products_current: Dict[str, Product],
+    products_optimized: Dict[str, Product],
+    n_scenarios: int = 100,
+    n_orders: int = 50,
+    seed: int = 42,
+    allocator: str = "first_fit",
+    min_items: int = 1,
+    max_items: int = 5,
+    simulate_events: bool = False,
+    max_workers: Optional[int] = None,
+) -> Dict[str, Any]:
+    """
+    Évalue n_scenarios jeux de n_orders commandes (flux aléatoires indépendants issus de seed).
+
+    Returns:
+        {"n_scenarios", "n_orders", "seed", "allocator",
+         "metrics": {nom: {"mean", "std", "ci_low", "ci_high", "n"}},
+         "scenarios": [métriques de run_simulation par scénario]}
+    """
+    if allocator not in ALLOCATORS:
+        raise ValueError(f"Allocateur inconnu : {allocator} (attendu : {', '.join(ALLOCATORS)})")
+    seeds = np.random.SeedSequence(seed).spawn(n_scenarios)
+    tasks = [(idx, seeds[idx], n_orders, min_items, max_items) for idx in range(n_scenarios)]
+    init_args = (warehouse, agents, products_current, products_optimized, allocator, simulate_events)
+    n_workers = max(1, min(max_workers or os.cpu_count() or 1, n_scenarios))
+
+    if n_workers == 1:
+        _init_worker(*init_args)
+        scenarios = [_run_scenario(task) for task in tasks]
+    else:
+        chunksize = max(1, n_scenarios // (4 * n_workers))
+        with ProcessPoolExecutor(max_workers=n_workers, initializer=_init_worker, initargs=init_args) as pool:
+            scenarios = list(pool.map(_run_scenario, tasks, chunksize=chunksize))
+
+    values: Dict[str, List[float]] = {}
+    for metrics in scenarios:
+        for key, value in _numeric_metrics(metrics).items():
+            values.setdefault(key, []).append(value)
+    return {
+        "n_scenarios": n_scenarios,
+        "n_orders": n_orders,
+        "seed": seed,
+        "allocator": allocator,
+        "metrics": {key: confidence_interval(vals) for key, vals in values.items()},
+        "scenarios": scenarios,
+    }
+
+
+def generate_orders(
+    products_by_id: Dict[str, Product],
+    n_orders: int,
+    seed: Optional[int] = None,
+    min_items: int = 1,
+    max_items: int = 5,
+) -> List[Order]:
+    """Version vectorisée de generate_test_orders (commandes enrichies avec products_by_id)."""
+    product_ids = list(products_by_id)
+    if not product_ids:
+        return []
+    rng = np.random.default_rng(seed)
+    orders = build_orders(product_ids, *generate_order_arrays(rng, len(product_ids), n_orders, min_items, max_items))
+    _enrich_orders(orders, products_by_id)
+    return orders
@@ -0,0 +1,118 @@
+"""
+Commandes de l'API web : journal en ajout seul, instantanés immuables (copy-on-write).
+
+- Les écrivains (POST) sont sérialisés par un verrou : allocation d'identifiant et ajout sont
+  atomiques, deux POST simultanés ne peuvent pas produire le même id.
+- Chaque écriture publie un nouvel instantané (tuple) par une seule affectation ; les lecteurs
+  prennent la référence sans verrou et itèrent dessus pendant que d'autres commandes arrivent.
+- reset(base) remplace les commandes de base (orders.json relu) ; les commandes ajoutées depuis
+  sont abandonnées, comme au rechargement du fichier, mais les identifiants ne sont jamais réutilisés.
+"""
+from __future__ import annotations
+
+import re
+import threading
+from dataclasses import dataclass
+from typing import Any, Container, Dict, Iterable, List, Optional, Tuple
+
+_HHMM = re.compile(r"^([01]\d|2[0-3]):[0-5]\d$")
+PRIORITIES = ("standard", "express")
+
+
+def validate_order(record: Any, product_ids: Container[str]) -> Dict[str, Any]:
+    """
+    Commande normalisée (sans id) à partir d'un enregistrement reçu ; ValueError si invalide.
+    product_ids : index des produits connus (ex. products_by_id).
+    """
+    if not isinstance(record, dict):
+        raise ValueError("objet JSON attendu")
+    received_time = record.get("received_time", "12:00")
+    deadline = record.get("deadline", "18:00")
+    for name, value in (("received_time", received_time), ("deadline", deadline)):
+        if not isinstance(value, str) or not _HHMM.match(value):
+            raise ValueError(f"{name} invalide (HH:MM attendu) : {value!r}")
+    priority = record.get("priority", "standard")
+    if priority not in PRIORITIES:
+        raise ValueError(f"priorité inconnue : {priority!r}")
+    items = record.get("items")
+    if not isinstance(items, list) or not items:
+        raise ValueError("Au moins un produit requis")
+    normalized = []
+    for item in items:
+        product_id = item.get("product_id") if isinstance(item, dict) else None
+        if product_id not in product_ids:
+            raise ValueError(f"Produit introuvable : {product_id!r}")
+        try:
+            quantity = int(item.get("quantity", 1))
+        except (TypeError, ValueError):
+            raise ValueError(f"quantité invalide pour {product_id}") from None
+        if quantity < 1:
+            raise ValueError(f"quantité invalide pour {product_id}")
+        normalized.append({"product_id": product_id, "quantity": quantity})
+    return {"received_time": received_time, "deadline": deadline, "priority": priority, "items": normalized}
+
+
+@dataclass(frozen=True)
+class OrderSnapshot:
+    version: int
+    orders: Tuple[Dict[str, Any], ...]
+    n_base: int  # commandes issues du fichier (les suivantes viennent du journal)
+
+    @property
+    def appended(self) -> Tuple[Dict[str, Any], ...]:
+        return self.orders[self.n_base:]
+
+    def __len__(self) -> int:
+        return len(self.orders)
+
+
+class OrderStore:
+    def __init__(self, base: Optional[Iterable[Dict[str, Any]]] = None, id_prefix: str = "Order_W") -> None:
+        self.id_prefix = id_prefix
+        self._lock = threading.Lock()
+        self._next_id = 1
+        self._ids: set = set()
+        self._snapshot = OrderSnapshot(0, (), 0)
+        self.reset(base or ())
+
+    @property
+    def snapshot(self) -> OrderSnapshot:
+        """Instantané courant (sans verrou : la référence publiée n'est jamais modifiée)."""
+        return self._snapshot
+
+    def reset(self, base: Iterable[Dict[str, Any]]) -> OrderSnapshot:
+        """Nouvelles commandes de base ; le journal des ajouts est vidé."""
+        orders = tuple(dict(o) for o in base)
+        with self._lock:
+            self._ids = {o.get("id") for o in orders}
+            self._next_id = max(self._next_id, len(orders) + 1)
+            self._snapshot = OrderSnapshot(self._snapshot.version + 1, orders, len(orders))
+            return self._snapshot
+
+    def _allocate_id_locked(self) -> str:
+        while True:
+            order_id = f"{self.id_prefix}{self._next_id:03d}"
+            self._next_id += 1
+            if order_id not in self._ids:
+                self._ids.add(order_id)
+                return order_id
+
+    def append_many(self, orders: Iterable[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], OrderSnapshot]:
+        """
+        Ajoute des commandes (sans "id" : il est attribué ici) en une seule publication.
+
+        Returns:
+            (commandes ajoutées avec leur id, instantané publié)
+        """
+        with self._lock:
+            added = [
+                {"id": self._allocate_id_locked(), **{k: v for k, v in order.items() if k != "id"}}
+                for order in orders
+            ]
+            current = self._snapshot
+            self._snapshot = OrderSnapshot(current.version + 1, current.orders + tuple(added), current.n_base)
+            return added, self._snapshot
+
+    def append(self, order: Dict[str, Any]) -> Tuple[Dict[str, Any], OrderSnapshot]:
+        added, snapshot = self.append_many([order])
+        return added[0], snapshot
@@ -0,0 +1,340 @@
+"""
+Analyse des patterns en flux (Jour 5.1, version incrémentale) sur fenêtres glissantes.
+
+Les commandes sont ingérées au fil de l'eau ; pour chaque fenêtre (ex. 1 h, 4 h, 24 h) on maintient :
+- les fréquences produits et les visites de zones (compteurs exacts, bornés par le catalogue) ;
+- les co-occurrences de paires dans un count-min sketch (profondeur x largeur fixes) ;
+- les paires les plus fréquentes dans un résumé space-saving de capacité fixe, dont les compteurs
+  sont les estimations du sketch (jamais inférieures aux vrais comptes).
+
+Le temps est découpé en tranches de bucket_seconds : chaque tranche garde ses propres compteurs
+et son sketch, retranchés des fenêtres quand elle en sort (le sketch est linéaire). Aucune requête
+ne relit l'historique : fréquence, visites de zone et comptage de paire sont en O(1),
+le top des paires est borné par la capacité du résumé.
+Le dashboard lit zone_visits(fenêtre) et le slotting co_occurrence(fenêtre) (optimize_slotting(matrix=...)).
+"""
+from __future__ import annotations
+
+import heapq
+import math
+from collections import deque
+from typing import Any, Deque, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.models import Order, Product, Warehouse
+from src.constraints import build_zone_index
+from src.allocation import _hhmm_to_seconds
+from src.day5_patterns import CoOccurrence
+
+DEFAULT_WINDOWS = (3600, 4 * 3600, 24 * 3600)
+_PAIR_SHIFT = 32
+
+
+class CountMinSketch:
+    """Count-min sketch (hachage multiply-shift sur des clés entières 64 bits)."""
+
+    def __init__(self, width: int = 4096, depth: int = 4, seed: int = 0) -> None:
+        if width & (width - 1):
+            raise ValueError(f"La largeur du sketch doit être une puissance de 2 (reçu : {width})")
+        self.width = width
+        self.depth = depth
+        rng = np.random.default_rng(seed)
+        self._mult = rng.integers(1, 2**63, size=(depth, 1), dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+        self._add = rng.integers(0, 2**63, size=(depth, 1), dtype=np.uint64)
+        self._shift = np.uint64(64 - int(math.log2(width)))
+        self._rows = np.arange(depth)[:, None]
+
+    def columns(self, keys: np.ndarray) -> np.ndarray:
+        """Colonne de chaque clé pour chaque ligne : tableau depth x len(keys)."""
+        return ((self._mult * keys.astype(np.uint64)[None, :] + self._add) >> self._shift).astype(np.intp)
+
+    def new_table(self) -> np.ndarray:
+        return np.zeros((self.depth, self.width), dtype=np.int64)
+
+    def add(self, table: np.ndarray, columns: np.ndarray) -> None:
+        np.add.at(table, (self._rows, columns), 1)
+
+    def estimate(self, table: np.ndarray, columns: np.ndarray) -> np.ndarray:
+        return table[self._rows, columns].min(axis=0)
+
+
+class SpaceSaving:
+    """
+    Résumé space-saving de capacité fixe : une clé nouvelle remplace la plus petite quand le résumé
+    est plein et que son compte la dépasse. Tas paresseux (entrées périmées ignorées, reconstruit
+    quand il grossit trop).
+    """
+
+    def __init__(self, capacity: int) -> None:
+        self.capacity = capacity
+        self.counts: Dict[int, int] = {}
+        self._heap: List[Tuple[int, int]] = []
+
+    def offer(self, key: int, count: int) -> None:
+        counts = self.counts
+        if key in counts or len(counts) < self.capacity:
+            counts[key] = count
+            heapq.heappush(self._heap, (count, key))
+        else:
+            heap = self._heap
+            while counts.get(heap[0][1]) != heap[0][0]:
+                heapq.heappop(heap)
+            if count <= heap[0][0]:
+                return
+            del counts[heapq.heappop(heap)[1]]
+            counts[key] = count
+            heapq.heappush(heap, (count, key))
+        if len(self._heap) > 4 * self.capacity:
+            self.reset(counts)
+
+    def reset(self, counts: Dict[int, int]) -> None:
+        self.counts = {key: count for key, count in counts.items() if count > 0}
+        self._heap = [(count, key) for key, count in self.counts.items()]
+        heapq.heapify(self._heap)
+
+
+class _Bucket:
+    __slots__ = ("index", "products", "zones", "n_orders", "sketch")
+
+    def __init__(self, index: int) -> None:
+        self.index = index
+        self.products: Dict[int, int] = {}
+        self.zones: Dict[str, int] = {}
+        self.n_orders = 0
+        self.sketch: Optional[np.ndarray] = None   # alloué à la première paire
+
+
+class _Window:
+    __slots__ = ("seconds", "span", "products", "zones", "n_orders", "sketch", "heavy")
+
+    def __init__(self, seconds: int, span: int, sketch: np.ndarray, capacity: int) -> None:
+        self.seconds = seconds
+        self.span = span                  # nombre de tranches couvertes
+        self.products: Dict[int, int] = {}
+        self.zones: Dict[str, int] = {}
+        self.n_orders = 0
+        self.sketch = sketch
+        self.heavy = SpaceSaving(capacity)
+
+
+def _increment(counts: Dict[Any, int], keys: Iterable[Any]) -> None:
+    for key in keys:
+        counts[key] = counts.get(key, 0) + 1
+
+
+def _subtract(counts: Dict[Any, int], other: Dict[Any, int]) -> None:
+    for key, value in other.items():
+        remaining = counts[key] - value
+        if remaining:
+            counts[key] = remaining
+        else:
+            del counts[key]
+
+
+class PatternStream:
+    """
+    Statistiques de commandes sur fenêtres glissantes (secondes), alimentées par ingest().
+
+    Le temps d'une commande est received_time (secondes depuis minuit) sauf si timestamp est fourni
+    (flux de plusieurs jours : secondes croissantes depuis une origine quelconque). Une commande
+    en retard sur la tranche courante est comptée dans la tranche courante.
+    """
+
+    def __init__(
+        self,
+        products_by_id: Dict[str, Product],
+        warehouse: Warehouse,
+        windows: Sequence[int] = DEFAULT_WINDOWS,
+        bucket_seconds: int = 900,
+        sketch_width: int = 4096,
+        sketch_depth: int = 4,
+        heavy_capacity: int = 256,
+        seed: int = 0,
+    ) -> None:
+        if not windows:
+            raise ValueError("Au moins une fenêtre est nécessaire")
+        self.bucket_seconds = bucket_seconds
+        self.cms = CountMinSketch(sketch_width, sketch_depth, seed)
+        self.windows: Dict[int, _Window] = {
+            seconds: _Window(seconds, max(1, math.ceil(seconds / bucket_seconds)), self.cms.new_table(), heavy_capacity)
+            for seconds in sorted(set(windows))
+        }
+        self._max_span = max(window.span for window in self.windows.values())
+        self._buckets: Deque[_Bucket] = deque()
+
+        zone_index = build_zone_index(warehouse)
+        self.product_ids: List[str] = []
+        self._index: Dict[str, int] = {}
+        self._zone_of: List[Optional[str]] = []
+        self._products_by_id = products_by_id
+        self._zone_index = zone_index
+        for pid in products_by_id:
+            self._index_of(pid)
+        self.n_ingested = 0
+
+    def _index_of(self, pid: str) -> int:
+        idx = self._index.get(pid)
+        if idx is None:
+            idx = self._index[pid] = len(self.product_ids)
+            self.product_ids.append(pid)
+            product = self._products_by_id.get(pid)
+            self._zone_of.append(
+                self._zone_index.get((product.location.x, product.location.y)) if product else None
+            )
+        return idx
+
+    # --- Ingestion ---
+
+    def ingest(self, order: Order, timestamp: Optional[float] = None) -> None:
+        """Ajoute une commande (chaque produit et chaque zone comptent une fois par commande)."""
+        t = _hhmm_to_seconds(order.received_time) if timestamp is None else timestamp
+        bucket = self._advance(int(t // self.bucket_seconds))
+        indices = sorted({self._index_of(item.product_id) for item in order.items})
+        zones = {self._zone_of[i] for i in indices} - {None}
+
+        bucket.n_orders += 1
+        _increment(bucket.products, indices)
+        _increment(bucket.zones, zones)
+        for window in self.windows.values():
+            window.n_orders += 1
+            _increment(window.products, indices)
+            _increment(window.zones, zones)
+        self.n_ingested += 1
+        if len(indices) < 2:
+            return
+
+        idx = np.array(indices, dtype=np.int64)
+        first, second = np.triu_indices(len(indices), k=1)
+        keys = (idx[first] << _PAIR_SHIFT) | idx[second]
+        columns = self.cms.columns(keys)
+        if bucket.sketch is None:
+            bucket.sketch = self.cms.new_table()
+        self.cms.add(bucket.sketch, columns)
+        key_list = keys.tolist()
+        for window in self.windows.values():
+            self.cms.add(window.sketch, columns)
+            offer = window.heavy.offer
+            for key, count in zip(key_list, self.cms.estimate(window.sketch, columns).tolist()):
+                offer(key, count)
+
+    def ingest_many(self, orders: Iterable[Order]) -> None:
+        for order in orders:
+            self.ingest(order)
+
+    def _advance(self, index: int) -> _Bucket:
+        """Ouvre les tranches jusqu'à index et retire des fenêtres celles qui en sortent."""
+        buckets = self._buckets
+        if buckets and index <= buckets[-1].index:
+            return buckets[-1]
+        if not buckets or index - buckets[-1].index > self._max_span:
+            self._reset()
+            buckets.append(_Bucket(index))
+            return buckets[-1]
+        expired = set()
+        for next_index in range(buckets[-1].index + 1, index + 1):
+            buckets.append(_Bucket(next_index))
+            for window in self.windows.values():
+                if len(buckets) > window.span:
+                    self._expire(window, buckets[-window.span - 1])
+                    expired.add(window.seconds)
+            while len(buckets) > self._max_span:
+                buckets.popleft()
+        for seconds in expired:
+            self._refresh_heavy(self.windows[seconds])
+        return buckets[-1]
+
+    def _expire(self, window: _Window, bucket: _Bucket) -> None:
+        window.n_orders -= bucket.n_orders
+        _subtract(window.products, bucket.products)
+        _subtract(window.zones, bucket.zones)
+        if bucket.sketch is not None:
+            window.sketch -= bucket.sketch
+
+    def _refresh_heavy(self, window: _Window) -> None:
+        """Les comptes ne font que baisser à l'expiration : on ré-estime les paires suivies."""
+        heavy = window.heavy
+        if not heavy.counts:
+            return
+        keys = np.fromiter(heavy.counts, dtype=np.int64, count=len(heavy.counts))
+        estimates = self.cms.estimate(window.sketch, self.cms.columns(keys))
+        heavy.reset(dict(zip(keys.tolist(), estimates.tolist())))
+
+    def _reset(self) -> None:
+        self._buckets.clear()
+        for window in self.windows.values():
+            window.products.clear()
+            window.zones.clear()
+            window.n_orders = 0
+            window.sketch[:] = 0
+            window.heavy.reset({})
+
+    # --- Requêtes (sans relecture de l'historique) ---
+
+    def _window(self, window: Optional[int]) -> _Window:
+        if window is None:
+            return self.windows[max(self.windows)]
+        if window not in self.windows:
+            raise ValueError(f"Fenêtre inconnue : {window} s (configurées : {sorted(self.windows)})")
+        return self.windows[window]
+
+    def _pair(self, key: int) -> Tuple[str, str]:
+        a, b = self.product_ids[key >> _PAIR_SHIFT], self.product_ids[key & 0xFFFFFFFF]
+        return (a, b) if a < b else (b, a)
+
+    def n_orders(self, window: Optional[int] = None) -> int:
+        return self._window(window).n_orders
+
+    def frequency(self, product_id: str, window: Optional[int] = None) -> int:
+        idx = self._index.get(product_id)
+        return 0 if idx is None else self._window(window).products.get(idx, 0)
+
+    def zone_visits(self, window: Optional[int] = None) -> Dict[str, int]:
+        return dict(self._window(window).zones)
+
+    def pair_count(self, product_a: str, product_b: str, window: Optional[int] = None) -> int:
+        """Estimation count-min (>= vrai nombre de commandes contenant les deux produits)."""
+        a, b = self._index.get(product_a), self._index.get(product_b)
+        if a is None or b is None or a == b:
+            return 0
+        key = (min(a, b) << _PAIR_SHIFT) | max(a, b)
+        state = self._window(window)
+        return int(self.cms.estimate(state.sketch, self.cms.columns(np.array([key], dtype=np.int64)))[0])
+
+    def product_frequency(self, window: Optional[int] = None) -> Dict[str, int]:
+        return {self.product_ids[i]: count for i, count in self._window(window).products.items()}
+
+    def top_products(self, n: int = 20, window: Optional[int] = None) -> List[Tuple[str, int]]:
+        items = self.product_frequency(window).items()
+        return sorted(items, key=lambda e: (-e[1], e[0]))[:n]
+
+    def top_pairs(self, n: int = 20, window: Optional[int] = None) -> List[Tuple[Tuple[str, str], int]]:
+        """Paires les plus fréquentes parmi celles suivies par le résumé space-saving."""
+        ranked = sorted(
+            ((self._pair(key), count) for key, count in self._window(window).heavy.counts.items() if count > 0),
+            key=lambda e: (-e[1], e[0]),
+        )
+        return ranked[:n]
+
+    def co_occurrence(self, window: Optional[int] = None) -> CoOccurrence:
+        """Matrice creuse approchée (fréquences exactes, paires suivies seulement) pour le re-slotting."""
+        state = self._window(window)
+        frequency = np.zeros(len(self.product_ids), dtype=np.int64)
+        for i, count in state.products.items():
+            frequency[i] = count
+        heavy = {key: count for key, count in state.heavy.counts.items() if count > 0}
+        keys = np.fromiter(heavy, dtype=np.int64, count=len(heavy))
+        counts = np.fromiter(heavy.values(), dtype=np.int64, count=len(heavy))
+        return CoOccurrence(
+            list(self.product_ids), frequency, keys >> _PAIR_SHIFT, keys & 0xFFFFFFFF, counts, state.n_orders,
+        )
+
+    def snapshot(self, window: Optional[int] = None, top_n: int = 20) -> Dict[str, Any]:
+        """Même format que run_pattern_analysis (clés utilisées par main et le dashboard)."""
+        return {
+            "window_seconds": self._window(window).seconds,
+            "top_products": self.top_products(top_n, window),
+            "top_co_ordered_pairs": self.top_pairs(top_n, window),
+            "zone_visits": self.zone_visits(window),
+            "n_orders": self.n_orders(window),
+        }
@@ -0,0 +1,141 @@
+"""
+Portefeuille de solveurs en course sous échéance (mode production du Jour 4).
+
+Chaque stratégie de day4_comparison.STRATEGIES tourne dans son propre processus.
+Les résultats sont notés avec compute_metrics : solutions sans violation de contrainte dure d'abord,
+puis plus de commandes assignées, puis coût le plus bas.
+On rend la meilleure solution dès qu'une stratégie exacte prouve l'optimalité ou à l'échéance ;
+les processus encore en cours sont alors arrêtés. Chaque stratégie reçoit un budget réduit
+(fraction du temps restant moins une marge pour métriques et transfert du résultat) afin que
+les solveurs exacts rendent leur meilleure solution avant l'échéance au lieu d'être tués.
+"""
+from __future__ import annotations
+
+import multiprocessing
+import queue
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.models import Agent, Order, Product, Warehouse
+from src.constraints import count_violations
+from src.day4_comparison import STRATEGIES, compute_metrics, run_strategy, _sort_orders_by_received_time
+
+DEFAULT_PORTFOLIO = ["first_fit", "regret", "alns", "minizinc", "cpsat", "cpsat_decomposed"]
+_JOIN_TIMEOUT = 1.0
+_BUDGET_FRACTION = 0.8
+_RESULT_MARGIN_SECONDS = 0.5
+_MIN_BUDGET_SECONDS = 0.1
+
+
+def score_key(metrics: Dict[str, Any]) -> Tuple[bool, int, float]:
+    """Clé de tri (plus petit = meilleur) : faisable d'abord, nombre d'assignées décroissant, puis coût croissant."""
+    return (
+        metrics.get("violations", 0) > 0,
+        -metrics.get("n_assigned", 0),
+        metrics.get("cost_euros", float("inf")),
+    )
+
+
+def _strategy_budget(deadline: float) -> float:
+    """Budget (s) d'une stratégie : 80 % du temps restant avant l'échéance (horloge murale) moins une marge."""
+    remaining = deadline - time.time()
+    return max(_MIN_BUDGET_SECONDS, _BUDGET_FRACTION * remaining - _RESULT_MARGIN_SECONDS)
+
+
+def _portfolio_worker(name, results_queue, warehouse, orders, agents, products_by_id, solver_name, deadline):
+    """Point d'entrée d'un processus : envoie (nom, métriques) ou (nom, erreur)."""
+    try:
+        # Budget calculé au démarrage du processus : le temps de lancement est déjà décompté
+        metrics = run_strategy(name, warehouse, orders, agents, products_by_id, solver_name, _strategy_budget(deadline))
+        results_queue.put((name, metrics))
+    except Exception as e:
+        results_queue.put((name, {"error": str(e)}))
+
+
+def run_portfolio(
+    warehouse: Warehouse,
+    orders: List[Order],
+    agents: List[Agent],
+    products_by_id: Dict[str, Product],
+    strategies: Optional[List[str]] = None,
+    time_limit_seconds: float = 30.0,
+    solver_name: str = "cbc",
+) -> Dict[str, Any]:
+    """
+    Lance les stratégies en parallèle sous un budget commun (secondes, horloge murale).
+
+    Returns:
+        {"best": nom, "assignment": {...}, "metrics": {...}, "results": {nom: métriques ou erreur},
+         "cancelled": [noms arrêtés], "stopped_on": "optimal" | "all_done" | "deadline", "elapsed_sec": float}
+    """
+    names = [name for name in (strategies or DEFAULT_PORTFOLIO) if name in STRATEGIES]
+    orders_sorted = _sort_orders_by_received_time(orders)
+    started = time.perf_counter()
+    deadline = started + time_limit_seconds
+    wall_deadline = time.time() + time_limit_seconds
+
+    results_queue: multiprocessing.Queue = multiprocessing.Queue()
+    processes: Dict[str, multiprocessing.Process] = {}
+    for name in names:
+        process = multiprocessing.Process(
+            target=_portfolio_worker,
+            args=(name, results_queue, warehouse, orders_sorted, agents, products_by_id,
+                  solver_name, wall_deadline),
+            daemon=True,
+        )
+        process.start()
+        processes[name] = process
+
+    results: Dict[str, Dict[str, Any]] = {}
+    stopped_on = "deadline"
+    while len(results) < len(names):
+        remaining = deadline - time.perf_counter()
+        if remaining <= 0:
+            break
+        try:
+            name, metrics = results_queue.get(timeout=remaining)
+        except queue.Empty:
+            break
+        if "error" not in metrics:
+            metrics["violations"] = count_violations(warehouse, orders_sorted, agents, metrics["assignment"], products_by_id)
+        results[name] = metrics
+        if metrics.get("status") == "OPTIMAL" and metrics.get("n_assigned", 0) > 0 and not metrics["violations"]:
+            stopped_on = "optimal"
+            break
+    else:
+        stopped_on = "all_done"
+
+    cancelled = []
+    for name, process in processes.items():
+        if process.is_alive():
+            process.terminate()
+            if name not in results:
+                cancelled.append(name)
+        process.join(_JOIN_TIMEOUT)
+
+    valid = {name: metrics for name, metrics in results.items() if "error" not in metrics}
+    if valid:
+        best = min(valid, key=lambda name: score_key(valid[name]))
+        assignment = valid[best]["assignment"]
+        best_metrics = valid[best]
+    else:
+        # Filet de sécurité : aucune stratégie n'a répondu à temps
+        from src.allocation import allocate_regret
+        from src.models import clone_agents
+        best = "regret_fallback"
+        assignment = allocate_regret(orders_sorted, clone_agents(agents), products_by_id, warehouse)
+        best_metrics = compute_metrics(warehouse, orders_sorted, agents, assignment, products_by_id)
+        best_metrics["violations"] = count_violations(warehouse, orders_sorted, agents, assignment, products_by_id)
+
+    return {
+        "best": best,
+        "assignment": assignment,
+        "metrics": {key: value for key, value in best_metrics.items() if key != "assignment"},
+        "results": {
+            name: {key: value for key, value in metrics.items() if key != "assignment"}
+            for name, metrics in results.items()
+        },
+        "cancelled": cancelled,
+        "stopped_on": stopped_on,
+        "elapsed_sec": round(time.perf_counter() - started, 3),
+    }
@@ -0,0 +1,645 @@
+"""
+Presolve : réduction de l'instance avant les solveurs exacts (CP-SAT, MiniZinc).
+
+Étapes :
+  1. suppression des commandes qu'aucun agent ne peut prendre (restrictions ou capacité) ;
+  2. fixation des commandes qui n'ont qu'un seul agent autorisé (objectif "assign") ;
+  3. dominance : parmi des agents interchangeables, un agent non saturé remplace ceux dont les
+     commandes candidates sont un sous-ensemble des siennes ;
+  4. suppression des colonnes vides (agents qu'aucune commande restante ne peut utiliser) ;
+  5. fusion des commandes identiques (mêmes articles, priorité et agents autorisés) ;
+  6. découpage en composantes connexes du graphe commandes–agents, résolues en parallèle.
+"""
+from __future__ import annotations
+
+import asyncio
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field, replace
+from typing import Any, Callable, Dict, FrozenSet, List, Optional, Set, Tuple
+
+try:
+    from ortools.sat.python import cp_model
+    CPSAT_AVAILABLE = True
+except ImportError:
+    CPSAT_AVAILABLE = False
+
+from src.models import Agent, Order, Product, Warehouse
+from src.constraints import build_profile_feasibility, order_conflict_sets, restriction_profile
+
+_EPS = 1e-9
+SCALE = 100  # même échelle entière que allocate_with_cpsat
+_MIN_COMPONENT_SECONDS = 0.5  # budget plancher d'une composante (allocate_with_presolve_async)
+
+
+@dataclass
+class OrderGroup:
+    """Commandes identiques fusionnées : une seule variable entière par agent autorisé."""
+    orders: List[Order]
+    agents: List[int]  # indices des agents autorisés (dans PresolveResult.agents)
+
+
+@dataclass
+class Component:
+    """Composante connexe du graphe commandes–agents : sous-problème indépendant."""
+    groups: List[OrderGroup]
+    agents: List[int]
+
+    @property
+    def n_orders(self) -> int:
+        return sum(len(group.orders) for group in self.groups)
+
+
+@dataclass
+class PresolveReport:
+    n_orders: int = 0
+    n_agents: int = 0
+    n_dropped_orders: int = 0
+    n_fixed_orders: int = 0
+    n_dropped_agents: int = 0
+    n_dominated_agents: int = 0
+    n_groups: int = 0
+    n_components: int = 0
+    largest_component: int = 0
+    variables_before: int = 0
+    variables_after: int = 0
+    presolve_seconds: float = 0.0
+    solve_seconds: float = 0.0
+    baseline_seconds: Optional[float] = None
+    baseline_assigned: Optional[int] = None
+    n_assigned: int = 0
+
+    @property
+    def total_seconds(self) -> float:
+        return self.presolve_seconds + self.solve_seconds
+
+    @property
+    def reduction(self) -> float:
+        """Part des variables de décision supprimées (0 à 1)."""
+        if self.variables_before == 0:
+            return 0.0
+        return 1.0 - self.variables_after / self.variables_before
+
+    @property
+    def speedup(self) -> Optional[float]:
+        if self.baseline_seconds is None or self.total_seconds <= 0:
+            return None
+        return self.baseline_seconds / self.total_seconds
+
+    def as_dict(self) -> Dict[str, Any]:
+        data = dict(self.__dict__)
+        data["reduction"] = round(self.reduction, 4)
+        data["speedup"] = round(self.speedup, 2) if self.speedup is not None else None
+        return data
+
+    def summary(self) -> List[str]:
+        lines = [
+            f"Commandes : {self.n_orders} → {self.n_groups} groupes "
+            f"({self.n_dropped_orders} impossibles, {self.n_fixed_orders} fixées)",
+            f"Agents : {self.n_agents} → {self.n_agents - self.n_dropped_agents} "
+            f"({self.n_dominated_agents} dominés)",
+            f"Variables : {self.variables_before} → {self.variables_after} (-{self.reduction:.0%})",
+            f"Composantes : {self.n_components} (la plus grande : {self.largest_component} commandes)",
+            f"Temps : presolve {self.presolve_seconds:.2f} s + résolution {self.solve_seconds:.2f} s",
+        ]
+        if self.baseline_seconds is not None:
+            lines.append(
+                f"Sans presolve : {self.baseline_seconds:.2f} s ({self.baseline_assigned} assignées) "
+                f"— accélération x{self.speedup:.1f} ({self.n_assigned} assignées)"
+            )
+        return lines
+
+
+@dataclass
+class PresolveResult:
+    fixed: Dict[str, str]          # order_id -> agent_id fixé par le presolve
+    dropped_orders: List[str]      # commandes qu'aucun agent ne peut prendre
+    agents: List[Agent]            # clones des agents avec capacité résiduelle
+    components: List[Component]
+    report: PresolveReport = field(default_factory=PresolveReport)
+
+
+class _UnionFind:
+    def __init__(self, n: int) -> None:
+        self.parent = list(range(n))
+
+    def find(self, x: int) -> int:
+        while self.parent[x] != x:
+            self.parent[x] = self.parent[self.parent[x]]
+            x = self.parent[x]
+        return x
+
+    def union(self, a: int, b: int) -> None:
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a != root_b:
+            self.parent[root_b] = root_a
+
+
+def _takes_all(
+    cands: List[int],
+    orders: List[Order],
+    residual_w: float,
+    residual_v: float,
+    pids: List[FrozenSet[str]],
+    conflicts: List[FrozenSet[str]],
+    self_incompatible: List[bool],
+) -> bool:
+    """True si l'agent est non saturé : toutes ses commandes candidates tiennent ensemble et sont compatibles."""
+    if sum(orders[o].total_weight for o in cands) > residual_w + _EPS:
+        return False
+    if sum(orders[o].total_volume for o in cands) > residual_v + _EPS:
+        return False
+    pid_counts: Dict[str, int] = {}
+    for o in cands:
+        for pid in pids[o]:
+            pid_counts[pid] = pid_counts.get(pid, 0) + 1
+    return not any(
+        self_incompatible[o]
+        or any(pid_counts.get(c, 0) > (1 if c in pids[o] else 0) for c in conflicts[o])
+        for o in cands
+    )
+
+
+def presolve(
+    orders: List[Order],
+    agents: List[Agent],
+    products_by_id: Dict[str, Product],
+    warehouse: Warehouse,
+    objective: str = "assign",
+) -> PresolveResult:
+    """
+    Réduit l'instance. La fixation des commandes à agent unique n'est appliquée que pour
+    l'objectif "assign" et seulement si l'agent est non saturé (toutes ses commandes candidates
+    tiennent ensemble et sont compatibles) : la réduction reste alors exacte. La dominance est
+    exacte pour les deux objectifs : l'agent retiré a même profil, vitesse et coût que l'agent non
+    saturé qui le remplace, et celui-ci peut prendre toutes ses commandes en plus des siennes.
+    """
+    started = time.perf_counter()
+    n_orders, n_agents = len(orders), len(agents)
+    report = PresolveReport(
+        n_orders=n_orders,
+        n_agents=n_agents,
+        variables_before=n_orders * (n_agents + 1),
+    )
+
+    residual_w = [agent.capacity_weight - agent.used_weight for agent in agents]
+    residual_v = [agent.capacity_volume - agent.used_volume for agent in agents]
+    profiles = [restriction_profile(agent) for agent in agents]
+    unique_profiles = list(dict.fromkeys(profiles))
+    agents_of_profile: List[List[int]] = [[] for _ in unique_profiles]
+    column_of = {profile: col for col, profile in enumerate(unique_profiles)}
+    for agent_idx, profile in enumerate(profiles):
+        agents_of_profile[column_of[profile]].append(agent_idx)
+    profile_ok = build_profile_feasibility(orders, unique_profiles, warehouse, products_by_id)
+    pids, conflicts, self_incompatible = order_conflict_sets(orders, products_by_id)
+
+    # 1. Agents autorisés : restrictions + capacité résiduelle suffisante pour la commande seule
+    allowed: List[List[int]] = []
+    for order_idx, order in enumerate(orders):
+        row = []
+        for col, ok in enumerate(profile_ok[order_idx]):
+            if not ok:
+                continue
+            for agent_idx in agents_of_profile[col]:
+                if (order.total_weight <= residual_w[agent_idx] + _EPS
+                        and order.total_volume <= residual_v[agent_idx] + _EPS):
+                    row.append(agent_idx)
+        allowed.append(sorted(row))
+
+    fixed: Dict[str, str] = {}
+    active = [bool(row) for row in allowed]
+
+    candidates: List[List[int]] = [[] for _ in agents]
+    for order_idx in range(n_orders):
+        for agent_idx in allowed[order_idx]:
+            candidates[agent_idx].append(order_idx)
+    unsaturated = [
+        _takes_all(cands, orders, residual_w[agent_idx], residual_v[agent_idx], pids, conflicts, self_incompatible)
+        for agent_idx, cands in enumerate(candidates)
+    ]
+
+    # 2. Fixation des commandes à agent unique sur les agents non saturés
+    # Un seul passage suffit : une fixation consomme la capacité d'un agent non saturé, dont
+    # toutes les commandes candidates tiennent déjà ; elle ne crée aucune nouvelle commande à agent unique.
+    if objective == "assign":
+        for agent_idx, cands in enumerate(candidates):
+            singles = [order_idx for order_idx in cands if len(allowed[order_idx]) == 1]
+            if not singles or not unsaturated[agent_idx]:
+                continue
+            for order_idx in singles:
+                fixed[orders[order_idx].id] = agents[agent_idx].id
+                residual_w[agent_idx] -= orders[order_idx].total_weight
+                residual_v[agent_idx] -= orders[order_idx].total_volume
+                active[order_idx] = False
+
+    dropped_orders = [orders[o].id for o in range(n_orders) if not allowed[o]]
+
+    # 3. Dominance entre agents interchangeables (même profil, vitesse et coût) : les candidates
+    # restantes d'un agent non saturé tiennent toutes sur lui, il peut donc prendre en plus celles de
+    # tout agent dont les candidates en sont un sous-ensemble ; ce dernier est retiré des colonnes.
+    cand_sets_by_class: Dict[Tuple, Dict[FrozenSet[int], List[int]]] = {}
+    for agent_idx, agent in enumerate(agents):
+        cands = frozenset(o for o in candidates[agent_idx] if active[o])
+        if cands:
+            key = (profiles[agent_idx], agent.speed, agent.cost_per_hour)
+            cand_sets_by_class.setdefault(key, {}).setdefault(cands, []).append(agent_idx)
+    dominated: Set[int] = set()
+    for agents_by_cands in cand_sets_by_class.values():
+        dominators: List[FrozenSet[int]] = []
+        for cands in sorted(agents_by_cands, key=len, reverse=True):
+            members = agents_by_cands[cands]
+            if any(cands <= dominator for dominator in dominators):
+                dominated.update(members)
+                continue
+            keeper = next((agent_idx for agent_idx in members if unsaturated[agent_idx]), None)
+            if keeper is not None:
+                dominators.append(cands)
+                dominated.update(agent_idx for agent_idx in members if agent_idx != keeper)
+    if dominated:
+        allowed = [[agent_idx for agent_idx in row if agent_idx not in dominated] for row in allowed]
+
+    # 4. Colonnes d'agents : on ne garde que les agents utilisables par une commande restante
+    used_agents = sorted({a for o in range(n_orders) if active[o] for a in allowed[o]})
+    new_index = {agent_idx: new_idx for new_idx, agent_idx in enumerate(used_agents)}
+    residual_agents = [
+        replace(
+            agents[agent_idx],
+            capacity_weight=max(0.0, residual_w[agent_idx]),
+            capacity_volume=max(0.0, residual_v[agent_idx]),
+            assigned_orders=[],
+            used_weight=0.0,
+            used_volume=0.0,
+        )
+        for agent_idx in used_agents
+    ]
+
+    # 5. Fusion des commandes identiques
+    groups_by_signature: Dict[Tuple, OrderGroup] = {}
+    for order_idx in range(n_orders):
+        if not active[order_idx]:
+            continue
+        order = orders[order_idx]
+        quantities: Dict[str, int] = {}
+        for item in order.items:
+            quantities[item.product_id] = quantities.get(item.product_id, 0) + item.quantity
+        agent_cols = tuple(new_index[a] for a in allowed[order_idx])
+        signature = (tuple(sorted(quantities.items())), order.priority, agent_cols)
+        group = groups_by_signature.get(signature)
+        if group is None:
+            groups_by_signature[signature] = OrderGroup(orders=[order], agents=list(agent_cols))
+        else:
+            group.orders.append(order)
+    groups = list(groups_by_signature.values())
+
+    # 6. Composantes connexes (nœuds : groupes puis agents)
+    union_find = _UnionFind(len(groups) + len(residual_agents))
+    for group_idx, group in enumerate(groups):
+        for agent_col in group.agents:
+            union_find.union(group_idx, len(groups) + agent_col)
+    by_root: Dict[int, Component] = {}
+    for group_idx, group in enumerate(groups):
+        root = union_find.find(group_idx)
+        by_root.setdefault(root, Component(groups=[], agents=[])).groups.append(group)
+    for agent_col in range(len(residual_agents)):
+        component = by_root.get(union_find.find(len(groups) + agent_col))
+        if component is not None:
+            component.agents.append(agent_col)
+    components = sorted(by_root.values(), key=lambda comp: -comp.n_orders)
+
+    report.n_dropped_orders = len(dropped_orders)
+    report.n_fixed_orders = len(fixed)
+    report.n_dropped_agents = n_agents - len(residual_agents)
+    report.n_dominated_agents = len(dominated)
+    report.n_groups = len(groups)
+    report.n_components = len(components)
+    report.largest_component = components[0].n_orders if components else 0
+    report.variables_after = sum(len(group.agents) + 1 for group in groups)
+    report.presolve_seconds = time.perf_counter() - started
+    return PresolveResult(
+        fixed=fixed,
+        dropped_orders=dropped_orders,
+        agents=residual_agents,
+        components=components,
+        report=report,
+    )
+
+
+def _cpsat_task(
+    component: Component,
+    agents: List[Agent],
+    warehouse: Warehouse,
+    products_by_id: Dict[str, Product],
+    objective: str,
+    time_limit_seconds: float,
+    num_workers: int,
+) -> Dict[str, Any]:
+    """Données compactes (entiers, picklables) du modèle CP-SAT agrégé d'une composante."""
+    local = {agent_col: k for k, agent_col in enumerate(component.agents)}
+    representatives = [group.orders[0] for group in component.groups]
+    pids, conflicts, self_flags = order_conflict_sets(representatives, products_by_id)
+    entry = warehouse.entry_point
+
+    # Paires de groupes incompatibles partageant au moins un agent
+    groups_of_pid: Dict[str, List[int]] = {}
+    for group_idx, group_pids in enumerate(pids):
+        for pid in group_pids:
+            groups_of_pid.setdefault(pid, []).append(group_idx)
+    pairs = set()
+    self_incompatible = []
+    single_copy = []
+    for group_idx in range(len(representatives)):
+        if self_flags[group_idx]:
+            self_incompatible.append(group_idx)
+        if pids[group_idx] & conflicts[group_idx]:
+            # Deux copies du groupe sur un même agent seraient incompatibles entre elles
+            single_copy.append(group_idx)
+        for pid in conflicts[group_idx]:
+            for other in groups_of_pid.get(pid, ()):
+                if other != group_idx:
+                    pairs.add((min(group_idx, other), max(group_idx, other)))
+    for group_idx in self_incompatible:
+        # Une commande incompatible avec elle-même l'est avec toute autre commande du même agent
+        for other in range(len(representatives)):
+            if other != group_idx:
+                pairs.add((min(group_idx, other), max(group_idx, other)))
+
+    costs = []
+    for group, order in zip(component.groups, representatives):
+        dist = sum(entry.manhattan(loc) for loc in order.unique_locations)
+        picking_sec = sum(item.quantity for item in order.items) * 30
+        row = []
+        for agent_col in group.agents:
+            agent = agents[agent_col]
+            travel_sec = dist / agent.speed if agent.speed > 0 else 0
+            row.append(int(round((travel_sec + picking_sec) * agent.cost_per_hour / 36)))
+        costs.append(row)
+
+    return {
+        "multiplicity": [len(group.orders) for group in component.groups],
+        "weight": [int(round(order.total_weight * SCALE)) for order in representatives],
+        "volume": [int(round(order.total_volume * SCALE)) for order in representatives],
+        "allowed": [[local[a] for a in group.agents] for group in component.groups],
+        "cost": costs,
+        "cap_weight": [int(agents[a].capacity_weight * SCALE) for a in component.agents],
+        "cap_volume": [int(agents[a].capacity_volume * SCALE) for a in component.agents],
+        "pairs": sorted(pairs),
+        "single_copy": single_copy,
+        "objective": objective,
+        "time_limit_seconds": float(time_limit_seconds),
+        "num_workers": num_workers,
+    }
+
+
+def _solve_cpsat_task(task: Dict[str, Any]) -> List[List[int]]:
+    """
+    Modèle CP-SAT agrégé : x[g][a] = nombre de commandes du groupe g confiées à l'agent a.
+    Retourne counts[g][k] aligné sur task["allowed"][g].
+    """
+    model = cp_model.CpModel()
+    multiplicity = task["multiplicity"]
+    allowed = task["allowed"]
+    n_local_agents = len(task["cap_weight"])
+
+    x: List[Dict[int, Any]] = []
+    for group_idx, agent_list in enumerate(allowed):
+        upper = multiplicity[group_idx]
+        x.append({a: model.NewIntVar(0, upper, f"x_{group_idx}_{a}") for a in agent_list})
+        model.Add(sum(x[group_idx].values()) <= upper)
+
+    for a in range(n_local_agents):
+        weight_terms = [task["weight"][g] * x[g][a] for g in range(len(allowed)) if a in x[g]]
+        volume_terms = [task["volume"][g] * x[g][a] for g in range(len(allowed)) if a in x[g]]
+        if weight_terms:
+            model.Add(sum(weight_terms) <= task["cap_weight"][a])
+            model.Add(sum(volume_terms) <= task["cap_volume"][a])
+
+    for group_idx in task["single_copy"]:
+        for var in x[group_idx].values():
+            model.Add(var <= 1)
+
+    used: Dict[Tuple[int, int], Any] = {}
+
+    def used_var(group_idx: int, agent: int):
+        key = (group_idx, agent)
+        if key not in used:
+            flag = model.NewBoolVar(f"u_{group_idx}_{agent}")
+            model.Add(x[group_idx][agent] <= multiplicity[group_idx] * flag)
+            used[key] = flag
+        return used[key]
+
+    for g1, g2 in task["pairs"]:
+        for a in x[g1].keys() & x[g2].keys():
+            model.Add(used_var(g1, a) + used_var(g2, a) <= 1)
+
+    if task["objective"] == "cost":
+        model.Minimize(sum(
+            cost * x[g][a]
+            for g, agent_list in enumerate(allowed)
+            for a, cost in zip(agent_list, task["cost"][g])
+        ))
+    else:
+        model.Maximize(sum(var for row in x for var in row.values()))
+
+    solver = cp_model.CpSolver()
+    solver.parameters.max_time_in_seconds = task["time_limit_seconds"]
+    if task["num_workers"] > 0:
+        solver.parameters.num_workers = task["num_workers"]
+    status = solver.Solve(model)
+    if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+        return [[0] * len(agent_list) for agent_list in allowed]
+    return [[solver.Value(x[g][a]) for a in agent_list] for g, agent_list in enumerate(allowed)]
+
+
+def _solve_minizinc_task(task: Tuple) -> Dict[str, Optional[str]]:
+    from src.minizinc_solver import allocate_with_minizinc
+
+    orders, agents, products_by_id, warehouse, solver_name, time_limit_seconds = task
+    return allocate_with_minizinc(orders, agents, products_by_id, warehouse, solver_name=solver_name,
+                                  time_limit_seconds=time_limit_seconds)
+
+
+def solve_components(
+    components: List[Component],
+    agents: List[Agent],
+    products_by_id: Dict[str, Product],
+    warehouse: Warehouse,
+    solver: str = "cpsat",
+    objective: str = "assign",
+    time_limit_seconds: float = 30.0,
+    solver_name: str = "cbc",
+    max_workers: Optional[int] = None,
+) -> Dict[str, Optional[str]]:
+    """
+    Résout des sous-problèmes indépendants (en parallèle si plusieurs) et fusionne les résultats.
+    Les indices d'agents des composantes se réfèrent à la liste agents.
+
+    Returns:
+        {order_id: agent_id or None} pour les commandes des composantes
+    """
+    assignment: Dict[str, Optional[str]] = {}
+    if not components:
+        return assignment
+    cpu_count = os.cpu_count() or 1
+    n_workers = max(1, min(max_workers or cpu_count, len(components)))
+
+    if solver == "cpsat":
+        if not CPSAT_AVAILABLE:
+            raise ImportError("OR-Tools CP-SAT non disponible. pip install ortools")
+        # En parallèle, les threads CP-SAT sont répartis entre les composantes
+        num_workers = max(1, cpu_count // n_workers) if n_workers > 1 else 0
+        tasks = [
+            _cpsat_task(component, agents, warehouse, products_by_id,
+                        objective, time_limit_seconds, num_workers)
+            for component in components
+        ]
+        if n_workers > 1:
+            with ProcessPoolExecutor(max_workers=n_workers) as pool:
+                all_counts = list(pool.map(_solve_cpsat_task, tasks))
+        else:
+            all_counts = [_solve_cpsat_task(task) for task in tasks]
+        for component, counts in zip(components, all_counts):
+            for group, group_counts in zip(component.groups, counts):
+                pending = iter(group.orders)
+                for agent_col, count in zip(group.agents, group_counts):
+                    for _ in range(count):
+                        assignment[next(pending).id] = agents[agent_col].id
+                for order in pending:
+                    assignment[order.id] = None
+    elif solver == "minizinc":
+        tasks = [
+            (
+                [order for group in component.groups for order in group.orders],
+                [agents[agent_col] for agent_col in component.agents],
+                products_by_id,
+                warehouse,
+                solver_name,
+                time_limit_seconds,
+            )
+            for component in components
+        ]
+        if n_workers > 1:
+            with ProcessPoolExecutor(max_workers=n_workers) as pool:
+                partials = list(pool.map(_solve_minizinc_task, tasks))
+        else:
+            partials = [_solve_minizinc_task(task) for task in tasks]
+        for partial in partials:
+            assignment.update(partial)
+    else:
+        raise ValueError(f"Solveur inconnu : {solver} (attendu : cpsat ou minizinc)")
+    return assignment
+
+
+def solve_presolved(
+    result: PresolveResult,
+    products_by_id: Dict[str, Product],
+    warehouse: Warehouse,
+    solver: str = "cpsat",
+    objective: str = "assign",
+    time_limit_seconds: float = 30.0,
+    solver_name: str = "cbc",
+    max_workers: Optional[int] = None,
+) -> Dict[str, Optional[str]]:
+    """
+    Résout chaque composante séparément (en parallèle si plusieurs), puis recolle
+    les commandes fixées et impossibles. Returns: {order_id: agent_id or None}
+    """
+    started = time.perf_counter()
+    assignment: Dict[str, Optional[str]] = {order_id: None for order_id in result.dropped_orders}
+    assignment.update(result.fixed)
+    assignment.update(solve_components(
+        result.components, result.agents, products_by_id, warehouse, solver=solver, objective=objective,
+        time_limit_seconds=time_limit_seconds, solver_name=solver_name, max_workers=max_workers,
+    ))
+    result.report.solve_seconds = time.perf_counter() - started
+    result.report.n_assigned = sum(1 for agent_id in assignment.values() if agent_id is not None)
+    return assignment
+
+
+def allocate_with_presolve(
+    orders: List[Order],
+    agents: List[Agent],
+    products_by_id: Dict[str, Product],
+    warehouse: Warehouse,
+    solver: str = "cpsat",
+    objective: str = "assign",
+    time_limit_seconds: float = 30.0,
+    solver_name: str = "cbc",
+    max_workers: Optional[int] = None,
+    compare_baseline: bool = False,
+) -> Tuple[Dict[str, Optional[str]], PresolveReport]:
+    """
+    Presolve + résolution par composantes. Avec compare_baseline=True, le même solveur est
+    aussi lancé sur l'instance complète pour mesurer l'accélération de bout en bout.
+
+    Returns:
+        ({order_id: agent_id or None}, rapport de réduction)
+    """
+    result = presolve(orders, agents, products_by_id, warehouse, objective=objective)
+    partial = solve_presolved(
+        result, products_by_id, warehouse, solver=solver, objective=objective,
+        time_limit_seconds=time_limit_seconds, solver_name=solver_name, max_workers=max_workers,
+    )
+    assignment = {order.id: partial.get(order.id) for order in orders}
+    report = result.report
+
+    if compare_baseline:
+        fresh_agents = [replace(agent, assigned_orders=list(agent.assigned_orders)) for agent in agents]
+        started = time.perf_counter()
+        if solver == "cpsat":
+            from src.allocation_cpsat import allocate_with_cpsat
+            baseline = allocate_with_cpsat(orders, fresh_agents, products_by_id, warehouse,
+                                           objective=objective, time_limit_seconds=time_limit_seconds)
+        else:
+            from src.minizinc_solver import allocate_with_minizinc
+            baseline = allocate_with_minizinc(orders, fresh_agents, products_by_id, warehouse,
+                                              solver_name=solver_name, time_limit_seconds=time_limit_seconds,
+                                              use_cache=False)
+        report.baseline_seconds = time.perf_counter() - started
+        report.baseline_assigned = sum(1 for agent_id in baseline.values() if agent_id is not None)
+
+    return assignment, report
+
+
+async def allocate_with_presolve_async(
+    orders: List[Order],
+    agents: List[Agent],
+    products_by_id: Dict[str, Product],
+    warehouse: Warehouse,
+    solver_name: str = "cbc",
+    time_limit_seconds: float = 10.0,
+    on_solution: Optional[Callable[[Dict[str, Optional[str]], Optional[float]], None]] = None,
+) -> Tuple[Dict[str, Optional[str]], PresolveReport]:
+    """
+    Presolve puis MiniZinc asynchrone composante par composante (de la plus grande à la plus petite),
+    le budget restant étant partagé au prorata du nombre de commandes. on_solution reçoit l'affectation
+    complète : commandes fixées, composantes déjà résolues et solution intermédiaire de la composante en cours.
+
+    Returns:
+        ({order_id: agent_id or None}, rapport de réduction)
+    """
+    from src.minizinc_solver import allocate_with_minizinc_async
+
+    loop = asyncio.get_running_loop()
+    result = await loop.run_in_executor(None, presolve, orders, agents, products_by_id, warehouse)
+    started = time.perf_counter()
+    deadline = started + time_limit_seconds
+    assignment: Dict[str, Optional[str]] = {order.id: None for order in orders}
+    assignment.update(result.fixed)
+    remaining_orders = sum(component.n_orders for component in result.components)
+    for component in result.components:
+        component_orders = [order for group in component.groups for order in group.orders]
+        budget = max(_MIN_COMPONENT_SECONDS, (deadline - time.perf_counter()) * component.n_orders / remaining_orders)
+        remaining_orders -= component.n_orders
+
+        def forward(partial: Dict[str, Optional[str]], objective: Optional[float]) -> None:
+            on_solution({**assignment, **partial}, objective)
+
+        assignment.update(await allocate_with_minizinc_async(
+            component_orders, [result.agents[agent_col] for agent_col in component.agents], products_by_id,
+            warehouse, solver_name=solver_name, time_limit_seconds=budget,
+            on_solution=forward if on_solution is not None else None,
+        ))
+    result.report.solve_seconds = time.perf_counter() - started
+    result.report.n_assigned = sum(1 for agent_id in assignment.values() if agent_id is not None)
+    return assignment, result.report
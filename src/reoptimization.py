@@ -0,0 +1,380 @@
+"""
+Ré-optimisation événementielle en cours de journée (extensions 2 et 3 du modèle MiniZinc).
+
+Événements gérés :
+- ExpressOrder : une commande express arrive ; si aucun agent n'a la place, des commandes
+  standard (deadline la plus tardive d'abord) sont déplacées pour la loger ;
+- AgentDown : un agent tombe en panne ; ses commandes sont réinsérées chez les autres ;
+- StockOut : un produit est en rupture ; les commandes qui le contiennent sont retirées
+  et la capacité libérée est proposée aux commandes en attente.
+
+La solution courante sert de base figée : seules les commandes touchées sont retirées puis
+réinsérées (meilleur delta de score, comme la réparation de l'ALNS) et seules les tournées
+des agents modifiés sont recalculées. Une ré-optimisation complète reste possible avec
+resolve_with_minizinc, qui transmet au modèle agent_available / order_available.
+"""
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set, Tuple, Union
+
+from src.models import Agent, Location, Order, Product, Warehouse, clone_agents
+from src.allocation import ScoreWeights, _AlnsState, _hhmm_to_seconds, _priority_key, allocate_regret
+from src.routing import check_deadlines, solve_tsp_nearest_neighbor, solve_tsp_with_ortools
+
+ROUTE_SOLVERS = ("nearest", "ortools")
+# Budget OR-Tools par tournée recalculée (la réparation doit rester sous la seconde)
+_ORTOOLS_REPAIR_SECONDS = 1
+
+
+@dataclass
+class ExpressOrder:
+    order: Order
+
+
+@dataclass
+class AgentDown:
+    agent_id: str
+
+
+@dataclass
+class StockOut:
+    product_id: str
+
+
+Event = Union[ExpressOrder, AgentDown, StockOut]
+
+
+@dataclass
+class AgentRoute:
+    locations: List[Location]
+    distance: int
+    time_sec: float
+    late_orders: List[str] = field(default_factory=list)
+
+
+@dataclass
+class RepairReport:
+    event: str
+    changed_agents: List[str] = field(default_factory=list)
+    moved: Dict[str, Optional[str]] = field(default_factory=dict)  # order_id -> nouvel agent (None = en attente)
+    bumped: List[str] = field(default_factory=list)                # commandes standard déplacées par une express
+    unassigned: List[str] = field(default_factory=list)            # commandes laissées sans agent par l'événement
+    withdrawn: List[str] = field(default_factory=list)             # commandes retirées (rupture de stock)
+    repair_ms: float = 0.0
+    routing_ms: float = 0.0
+
+    @property
+    def latency_ms(self) -> float:
+        return self.repair_ms + self.routing_ms
+
+    def summary(self) -> str:
+        # moved contient aussi les commandes restées en attente (agent None), comptées dans unassigned
+        reassigned = sum(1 for agent_id in self.moved.values() if agent_id is not None)
+        return (
+            f"{self.event} : {reassigned} commande(s) réaffectée(s), {len(self.bumped)} déplacée(s), "
+            f"{len(self.unassigned)} en attente, {len(self.withdrawn)} retirée(s), "
+            f"{len(self.changed_agents)} tournée(s) recalculée(s) en {self.latency_ms:.1f} ms"
+        )
+
+
+class _RepairState(_AlnsState):
+    """État ALNS + commandes portées par chaque agent (pour retirer celles d'un agent ou d'un produit)."""
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.members: List[Set[int]] = [set() for _ in self.agents]
+
+    def assign(self, order_idx: int, agent_idx: int) -> None:
+        super().assign(order_idx, agent_idx)
+        self.members[agent_idx].add(order_idx)
+
+    def unassign(self, order_idx: int) -> None:
+        self.members[self.agent_of[order_idx]].discard(order_idx)
+        super().unassign(order_idx)
+
+
+class ReoptimizationEngine:
+    """
+    Maintient une allocation et ses tournées au fil des événements de la journée.
+    apply(event) répare uniquement ce que l'événement touche et retourne un RepairReport.
+    """
+
+    def __init__(
+        self,
+        orders: List[Order],
+        agents: List[Agent],
+        products_by_id: Dict[str, Product],
+        warehouse: Warehouse,
+        assignment: Optional[Dict[str, Optional[str]]] = None,
+        weights: Optional[ScoreWeights] = None,
+        route_solver: str = "nearest",
+        current_time: Optional[str] = None,
+    ) -> None:
+        if route_solver not in ROUTE_SOLVERS:
+            raise ValueError(f"route_solver inconnu : {route_solver} (attendu : {', '.join(ROUTE_SOLVERS)})")
+        self.agents = agents
+        self.products_by_id = products_by_id
+        self.warehouse = warehouse
+        self.weights = weights or ScoreWeights()
+        self.route_solver = route_solver
+        self.current_time_sec = _hhmm_to_seconds(current_time) if current_time else 0.0
+        self.unavailable_agents: Set[str] = set()
+        self.unavailable_orders: Set[str] = set()
+        self.out_of_stock: Set[str] = set()
+        if assignment is None:
+            assignment = allocate_regret(orders, clone_agents(agents), products_by_id, warehouse)
+        self._load(list(orders), assignment)
+
+    # --- État ---
+
+    def _load(self, orders: List[Order], assignment: Dict[str, Optional[str]]) -> None:
+        """(Re)construit l'état à partir d'une allocation de référence et recalcule toutes les tournées."""
+        self.state = _RepairState(orders, clone_agents(self.agents), self.products_by_id, self.warehouse, self.weights)
+        self.index_of_order: Dict[str, int] = {order.id: order_idx for order_idx, order in enumerate(orders)}
+        self.index_of_agent: Dict[str, int] = {agent.id: agent_idx for agent_idx, agent in enumerate(self.agents)}
+        self.orders_of_product: Dict[str, Set[int]] = {}
+        for order_idx in range(len(orders)):
+            self._index_products(order_idx)
+        self.pending: Set[int] = set()
+        for order_idx, order in enumerate(orders):
+            agent_id = assignment.get(order.id)
+            if order.id in self.unavailable_orders:
+                continue
+            if (agent_id is None or agent_id in self.unavailable_agents or agent_id not in self.index_of_agent
+                    or not self.state.compatible(order_idx, self.index_of_agent[agent_id])):
+                # Affectation de référence incompatible (ex. commande exclusive partagée) : la commande attend
+                self.pending.add(order_idx)
+            else:
+                self.state.assign(order_idx, self.index_of_agent[agent_id])
+        for agent_id in self.unavailable_agents:
+            self.state.disable_agent(self.index_of_agent[agent_id])
+        self.routes: Dict[str, AgentRoute] = {}
+        for agent_idx in range(len(self.agents)):
+            self._update_route(agent_idx)
+
+    def _index_products(self, order_idx: int) -> None:
+        for pid in self.state.pids[order_idx]:
+            self.orders_of_product.setdefault(pid, set()).add(order_idx)
+
+    @property
+    def orders(self) -> List[Order]:
+        return self.state.orders
+
+    @property
+    def assignment(self) -> Dict[str, Optional[str]]:
+        """{order_id: agent_id or None} de la solution courante."""
+        agent_of = self.state.agent_of
+        return {
+            order.id: (self.agents[agent_of[order_idx]].id if agent_of[order_idx] is not None else None)
+            for order_idx, order in enumerate(self.state.orders)
+        }
+
+    # --- Événements ---
+
+    def apply(self, event: Event) -> RepairReport:
+        """Applique un événement, répare l'allocation localement et recalcule les tournées touchées."""
+        started = time.perf_counter()
+        report = RepairReport(event=type(event).__name__)
+        changed: Set[int] = set()
+        if isinstance(event, ExpressOrder):
+            self._on_express(event.order, report, changed)
+        elif isinstance(event, AgentDown):
+            self._on_agent_down(event.agent_id, report, changed)
+        elif isinstance(event, StockOut):
+            self._on_stock_out(event.product_id, report, changed)
+        else:
+            raise TypeError(f"Événement inconnu : {event!r}")
+        routing_started = time.perf_counter()
+        for agent_idx in sorted(changed):
+            self._update_route(agent_idx)
+        report.changed_agents = [self.agents[agent_idx].id for agent_idx in sorted(changed)]
+        report.repair_ms = (routing_started - started) * 1000.0
+        report.routing_ms = (time.perf_counter() - routing_started) * 1000.0
+        return report
+
+    def _on_express(self, order: Order, report: RepairReport, changed: Set[int]) -> None:
+        state = self.state
+        order_idx = self.index_of_order.get(order.id)
+        if order_idx is None:
+            order_idx = state.add_order(order)
+            self.index_of_order[order.id] = order_idx
+            self._index_products(order_idx)
+            if not state.pids[order_idx].isdisjoint(self.out_of_stock):
+                self.unavailable_orders.add(order.id)
+        elif state.agent_of[order_idx] is not None:
+            return  # Déjà servie : rien à réparer
+        if order.id in self.unavailable_orders:
+            report.unassigned.append(order.id)
+            return
+        self.pending.discard(order_idx)
+        if self._insert(order_idx, report, changed):
+            return
+        plan = self._bump_plan(order_idx)
+        if plan is None:
+            self.pending.add(order_idx)
+            report.unassigned.append(order.id)
+            return
+        agent_idx, bumped = plan
+        for bumped_idx in bumped:
+            state.unassign(bumped_idx)
+        state.assign(order_idx, agent_idx)
+        changed.add(agent_idx)
+        report.moved[order.id] = self.agents[agent_idx].id
+        report.bumped = [state.orders[bumped_idx].id for bumped_idx in bumped]
+        self._reinsert(bumped, report, changed)
+
+    def _on_agent_down(self, agent_id: str, report: RepairReport, changed: Set[int]) -> None:
+        if agent_id in self.unavailable_agents:
+            return
+        agent_idx = self.index_of_agent[agent_id]
+        displaced = sorted(self.state.members[agent_idx])
+        for order_idx in displaced:
+            self.state.unassign(order_idx)
+        self.state.disable_agent(agent_idx)
+        self.unavailable_agents.add(agent_id)
+        changed.add(agent_idx)
+        self._reinsert(displaced, report, changed)
+
+    def _on_stock_out(self, product_id: str, report: RepairReport, changed: Set[int]) -> None:
+        state = self.state
+        self.out_of_stock.add(product_id)
+        freed: Set[int] = set()
+        for order_idx in sorted(self.orders_of_product.get(product_id, ())):
+            order_id = state.orders[order_idx].id
+            if order_id in self.unavailable_orders:
+                continue
+            self.unavailable_orders.add(order_id)
+            self.pending.discard(order_idx)
+            agent_idx = state.agent_of[order_idx]
+            if agent_idx is not None:
+                state.unassign(order_idx)
+                freed.add(agent_idx)
+            report.withdrawn.append(order_id)
+        changed.update(freed)
+        # La capacité libérée n'est proposée qu'aux agents touchés : le reste de la solution ne bouge pas
+        for order_idx in sorted(self.pending, key=lambda i: _priority_key(state.orders[i])):
+            candidates = [
+                agent_idx for agent_idx in freed
+                if state.class_of_agent[agent_idx] in state.allowed_classes[order_idx]
+                and state.fits(order_idx, agent_idx)
+            ]
+            if candidates:
+                agent_idx = min(candidates, key=lambda a: (state.insertion_delta(order_idx, a), a))
+                state.assign(order_idx, agent_idx)
+                self.pending.discard(order_idx)
+                report.moved[state.orders[order_idx].id] = self.agents[agent_idx].id
+
+    # --- Réparation ---
+
+    def _insert(self, order_idx: int, report: RepairReport, changed: Set[int]) -> bool:
+        found = self.state.best_insertions(order_idx, 1)
+        if not found:
+            return False
+        _, agent_idx = found[0]
+        self.state.assign(order_idx, agent_idx)
+        changed.add(agent_idx)
+        report.moved[self.state.orders[order_idx].id] = self.agents[agent_idx].id
+        return True
+
+    def _reinsert(self, order_indices: List[int], report: RepairReport, changed: Set[int]) -> None:
+        """Réinsère des commandes retirées (express puis deadline la plus proche) ; les autres attendent."""
+        for order_idx in sorted(order_indices, key=lambda i: _priority_key(self.state.orders[i])):
+            if not self._insert(order_idx, report, changed):
+                self.pending.add(order_idx)
+                order_id = self.state.orders[order_idx].id
+                report.moved[order_id] = None
+                report.unassigned.append(order_id)
+
+    def _bump_plan(self, order_idx: int) -> Optional[Tuple[int, List[int]]]:
+        """
+        Agent qui peut accueillir la commande express en retirant le moins de commandes standard :
+        d'abord celles incompatibles avec elle, puis celles à la deadline la plus tardive.
+        """
+        state = self.state
+        pids, incompatible = state.pids[order_idx], state.incompatible[order_idx]
+        best: Optional[Tuple[Tuple[int, float], int, List[int]]] = None
+        for class_idx in state.allowed_classes[order_idx]:
+            for agent_idx in state.classes[class_idx].agent_indices:
+                if self.agents[agent_idx].id in self.unavailable_agents:
+                    continue
+                members = state.members[agent_idx]
+                exclusive = state.self_incompatible[order_idx]
+                conflicting = [
+                    i for i in members
+                    if exclusive or state.self_incompatible[i]
+                    or not pids.isdisjoint(state.incompatible[i]) or not incompatible.isdisjoint(state.pids[i])
+                ]
+                if any(state.orders[i].priority == "express" for i in conflicting):
+                    continue
+                removed = list(conflicting)
+                rem_w = state.rem_w[agent_idx] + sum(state.weight[i] for i in removed)
+                rem_v = state.rem_v[agent_idx] + sum(state.volume[i] for i in removed)
+                standard = sorted(
+                    (i for i in members if i not in conflicting and state.orders[i].priority != "express"),
+                    key=lambda i: -state.deadline_sec[i],
+                )
+                for i in standard:
+                    if rem_w >= state.weight[order_idx] and rem_v >= state.volume[order_idx]:
+                        break
+                    removed.append(i)
+                    rem_w += state.weight[i]
+                    rem_v += state.volume[i]
+                if rem_w < state.weight[order_idx] or rem_v < state.volume[order_idx]:
+                    continue
+                key = (len(removed), state.order_time(order_idx, agent_idx))
+                if best is None or key < best[0]:
+                    best = (key, agent_idx, removed)
+        if best is None:
+            return None
+        return best[1], best[2]
+
+    # --- Tournées ---
+
+    def _update_route(self, agent_idx: int) -> None:
+        agent = self.agents[agent_idx]
+        if agent.id in self.unavailable_agents:
+            self.routes.pop(agent.id, None)
+            return
+        assigned = [self.state.orders[order_idx] for order_idx in sorted(self.state.members[agent_idx])]
+        locations: List[Location] = []
+        seen: Set[Tuple[int, int]] = set()
+        for order in assigned:
+            for item in order.items:
+                product = self.products_by_id.get(item.product_id)
+                if product and (product.location.x, product.location.y) not in seen:
+                    seen.add((product.location.x, product.location.y))
+                    locations.append(product.location)
+        if self.route_solver == "ortools":
+            tour, distance = solve_tsp_with_ortools(locations, self.warehouse.entry_point, _ORTOOLS_REPAIR_SECONDS)
+        else:
+            tour, distance = solve_tsp_nearest_neighbor(locations, self.warehouse.entry_point)
+        all_locations = [self.warehouse.entry_point] + locations
+        # Même estimation que compute_route_for_agent : 30 s par ligne de commande
+        picking_time = sum(len(order.items) for order in assigned) * 30
+        route_time = (distance / agent.speed if agent.speed > 0 else 0) + picking_time
+        _, late = check_deadlines(agent, assigned, route_time, self.current_time_sec)
+        self.routes[agent.id] = AgentRoute(
+            locations=[all_locations[node] for node in tour],
+            distance=distance,
+            time_sec=route_time,
+            late_orders=late,
+        )
+
+    # --- Ré-optimisation complète ---
+
+    def resolve_with_minizinc(self, solver_name: str = "cbc", time_limit_seconds: float = 10.0) -> Dict[str, Optional[str]]:
+        """
+        Ré-optimisation globale avec le modèle MiniZinc (agents en panne et commandes en rupture exclus,
+        express prioritaires). La solution obtenue devient la nouvelle base des réparations locales.
+        """
+        from src.minizinc_solver import allocate_with_minizinc
+
+        assignment = allocate_with_minizinc(
+            self.state.orders, self.agents, self.products_by_id, self.warehouse,
+            solver_name=solver_name, time_limit_seconds=time_limit_seconds,
+            unavailable_agents=self.unavailable_agents, unavailable_orders=self.unavailable_orders,
+        )
+        self._load(self.state.orders, assignment)
+        return self.assignment
@@ -0,0 +1,119 @@
+"""
+Sérialisation et compression des réponses de l'API web.
+
+- dumps() : orjson s'il est installé (plusieurs fois plus rapide), sinon json compact.
+- negotiate_encoding() / compress() : br (si le module brotli est installé) ou gzip, selon
+  Accept-Encoding ; les petits corps ne sont pas compressés.
+- EncodedBodyCache : corps sérialisés et compressés mémorisés par (ETag, encodage). Un ETag
+  dépend de la version des données : tant qu'elle ne change pas, une requête (sans
+  If-None-Match) ne resérialise ni ne recompresse rien.
+"""
+from __future__ import annotations
+
+import gzip
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Optional, Tuple
+
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
+try:
+    import brotli
+    HAS_BROTLI = True
+except ImportError:
+    HAS_BROTLI = False
+
+# En dessous, la compression coûte plus qu'elle ne rapporte
+MIN_COMPRESS_BYTES = 1024
+
+
+def dumps(payload: Any) -> bytes:
+    if HAS_ORJSON:
+        return orjson.dumps(payload, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(payload, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """Encodage retenu ("br", "gzip") d'après l'en-tête Accept-Encoding, ou None."""
+    accepted = set()
+    for part in (accept_encoding or "").split(","):
+        name, _, params = part.strip().partition(";")
+        if params.replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        accepted.add(name.strip().lower())
+    if HAS_BROTLI and "br" in accepted:
+        return "br"
+    if "gzip" in accepted or "*" in accepted:
+        return "gzip"
+    return None
+
+
+def compress(body: bytes, encoding: Optional[str]) -> Tuple[bytes, Optional[str]]:
+    """(corps, encodage effectif) ; pas de compression pour les petits corps."""
+    if encoding is None or len(body) < MIN_COMPRESS_BYTES:
+        return body, None
+    if encoding == "br":
+        return brotli.compress(body, quality=4), "br"
+    return gzip.compress(body, compresslevel=5, mtime=0), "gzip"
+
+
+def parse_if_none_match(header: Optional[str]) -> set:
+    """ETags d'un en-tête If-None-Match (préfixe faible W/ ignoré, comparaison faible)."""
+    if not header:
+        return set()
+    tags = set()
+    for tag in header.split(","):
+        tag = tag.strip()
+        tags.add(tag[2:] if tag.startswith("W/") else tag)
+    return tags
+
+
+def etag_matches(etag: str, if_none_match: Optional[str]) -> bool:
+    tags = parse_if_none_match(if_none_match)
+    return "*" in tags or (etag[2:] if etag.startswith("W/") else etag) in tags
+
+
+class EncodedBodyCache:
+    def __init__(self, max_entries: int = 256) -> None:
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[tuple, Tuple[bytes, Optional[str]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_encode(
+        self, etag: str, encoding: Optional[str], payload: Callable[[], Any],
+    ) -> Tuple[bytes, Optional[str]]:
+        """(corps, encodage effectif) pour etag ; payload() n'est appelé qu'en cas d'absence."""
+        key = (etag, encoding)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry
+        entry = compress(dumps(payload()), encoding)
+        with self._lock:
+            self._entries[key] = entry
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+
+def conditional_json(
+    etag: str,
+    payload: Callable[[], Any],
+    cache: EncodedBodyCache,
+    if_none_match: Optional[str] = None,
+    accept_encoding: str = "",
+) -> Tuple[int, dict, bytes]:
+    """(statut, en-têtes, corps) d'une réponse JSON conditionnelle, indépendamment du framework web."""
+    headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    if etag_matches(etag, if_none_match):
+        return 304, headers, b""
+    body, encoding = cache.get_or_encode(etag, negotiate_encoding(accept_encoding), payload)
+    if encoding is not None:
+        headers["Content-Encoding"] = encoding
+    return 200, headers, body
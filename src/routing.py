@@ -27,15 +27,8 @@ def create_distance_matrix(locations: List[Location]) -> List[List[int]]:
     Returns:
         Matrice de distances carrée (n x n) où matrix[i][j] = distance entre locations[i] et locations[j]
     """
-    n = len(locations)
-    matrix = [[0] * n for _ in range(n)]
-    
-    for i in range(n):
-        for j in range(n):
-            if i != j:
-                matrix[i][j] = locations[i].manhattan(locations[j])
-    
-    return matrix
+    coords = [(loc.x, loc.y) for loc in locations]
+    return [[abs(x1 - x2) + abs(y1 - y2) for x2, y2 in coords] for x1, y1 in coords]
 
 
 def solve_tsp_with_ortools(
@@ -124,6 +117,55 @@ def solve_tsp_with_ortools(
     return tour, total_distance
 
 
+def solve_tsp_nearest_neighbor(
+    locations: List[Location],
+    entry_point: Location,
+    max_passes: int = 3
+) -> Tuple[List[int], int]:
+    """
+    Tournée rapide sans OR-Tools : plus proche voisin puis quelques passes de 2-opt.
+    Utilisée quand la latence compte plus que l'optimalité (ré-optimisation en cours de journée).
+
+    Args:
+        locations: Liste des emplacements à visiter (sans l'entrée)
+        entry_point: Point d'entrée (départ et retour)
+        max_passes: Nombre maximal de passes d'amélioration 2-opt
+
+    Returns:
+        Tuple (tournée, distance_totale), même format que solve_tsp_with_ortools
+    """
+    if not locations:
+        return [0], 0
+
+    all_locations = [entry_point] + locations
+    matrix = create_distance_matrix(all_locations)
+
+    # Plus proche voisin depuis l'entrée
+    tour = [0]
+    remaining = set(range(1, len(all_locations)))
+    while remaining:
+        last = tour[-1]
+        nearest = min(remaining, key=lambda node: (matrix[last][node], node))
+        tour.append(nearest)
+        remaining.remove(nearest)
+    tour.append(0)
+
+    # 2-opt : inverse un segment tant que cela raccourcit la tournée
+    for _ in range(max_passes):
+        improved = False
+        for i in range(1, len(tour) - 2):
+            for j in range(i + 1, len(tour) - 1):
+                a, b, c, d = tour[i - 1], tour[i], tour[j], tour[j + 1]
+                if matrix[a][c] + matrix[b][d] < matrix[a][b] + matrix[c][d]:
+                    tour[i:j + 1] = reversed(tour[i:j + 1])
+                    improved = True
+        if not improved:
+            break
+
+    total_distance = sum(matrix[tour[k]][tour[k + 1]] for k in range(len(tour) - 1))
+    return tour, total_distance
+
+
 def compute_route_for_agent(
     agent: Agent,
     assigned_orders: List[Order],
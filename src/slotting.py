@@ -0,0 +1,433 @@
+"""
+Slotting par affinité (Jour 5.2, règle 2) : placement vu comme un problème d'affectation quadratique.
+
+Les emplacements sont les positions actuelles des produits (plusieurs produits peuvent partager
+une même case). On minimise
+    sum_p freq[p] * d(entrée, pos(p))  +  affinity_weight * sum_{p<q} aff[p,q] * d(pos(p), pos(q))
+où freq et aff viennent de la matrice de co-occurrences (diagonale / hors diagonale, distances de Manhattan).
+
+Contraintes (règle 3) : les positions de la zone C sont réservées à l'alimentaire, celles de la
+zone D à la chimie ; les produits alimentaires / chimiques en surnombre vont en zone libre.
+
+Départ : placement glouton par fréquence (règles 1 et 3), puis recuit simulé par échanges.
+Le delta d'un échange p <-> q se calcule en O(deg(p) + deg(q)) (voisins d'affinité uniquement) ;
+la moitié des échanges rapprochent p d'un de ses voisins (on échange p avec un occupant de la case
+d'un produit co-commandé), ce qui garde la recherche efficace sur 50 000 références.
+
+incremental_reslotting part au contraire des emplacements actuels et n'applique que les meilleurs
+échanges dans un budget de K produits déplacés (re-slotting horaire, peu de manutention).
+"""
+from __future__ import annotations
+
+import heapq
+import math
+import random
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from src.models import Location, Order, Product, Warehouse
+from src.constraints import build_zone_index
+from src.day5_patterns import CoOccurrence, co_occurrence
+
+# Zone réservée par catégorie (règle 3)
+RESERVED_ZONES: Dict[str, str] = {"C": "food", "D": "chemical"}
+_FREE = ""
+
+
+@dataclass
+class SlottingReport:
+    initial_cost: float
+    final_cost: float
+    iterations: int
+    accepted: int
+    seconds: float
+
+    @property
+    def improvement_percent(self) -> float:
+        if self.initial_cost <= 0:
+            return 0.0
+        return (self.initial_cost - self.final_cost) / self.initial_cost * 100
+
+
+class _SlottingState:
+    """Positions (coordonnées distinctes), affectation produit -> position et deltas d'échange."""
+
+    def __init__(
+        self,
+        products_by_id: Dict[str, Product],
+        warehouse: Warehouse,
+        matrix: CoOccurrence,
+        affinity_weight: float,
+        start: str = "greedy",
+    ) -> None:
+        self.pids = list(products_by_id)
+        index_of = {pid: p for p, pid in enumerate(self.pids)}
+        # Indices de la matrice -> indices produits (-1 : produit commandé hors catalogue)
+        remap = [index_of.get(pid, -1) for pid in matrix.product_ids]
+        self.freq = [0.0] * len(self.pids)
+        for i, count in enumerate(matrix.frequency.tolist()):
+            if remap[i] >= 0:
+                self.freq[remap[i]] = float(count)
+        self.neighbors: List[List[Tuple[int, float]]] = [[] for _ in self.pids]
+        for i, j, count in zip(matrix.rows.tolist(), matrix.cols.tolist(), matrix.counts.tolist()):
+            a, b = remap[i], remap[j]
+            if a >= 0 and b >= 0:
+                w = affinity_weight * count
+                self.neighbors[a].append((b, w))
+                self.neighbors[b].append((a, w))
+
+        # Cases distinctes et positions (une par produit, à la case qu'il occupe aujourd'hui)
+        zone_of = build_zone_index(warehouse)
+        coord_index: Dict[Tuple[int, int], int] = {}
+        self.xs: List[int] = []
+        self.ys: List[int] = []
+        self.coord_zone: List[str] = []
+        position_coords: List[int] = []
+        for pid in self.pids:
+            loc = products_by_id[pid].location
+            key = (loc.x, loc.y)
+            if key not in coord_index:
+                coord_index[key] = len(self.xs)
+                self.xs.append(loc.x)
+                self.ys.append(loc.y)
+                self.coord_zone.append(zone_of.get(key) or _FREE)
+            position_coords.append(coord_index[key])
+        entry = warehouse.entry_point
+        self.entry_dist = [abs(x - entry.x) + abs(y - entry.y) for x, y in zip(self.xs, self.ys)]
+
+        # Catégorie requise par position : une zone réservée sans assez de produits de sa catégorie devient libre
+        category = [products_by_id[pid].category for pid in self.pids]
+        self.group = [category[p] if category[p] in RESERVED_ZONES.values() else _FREE for p in range(len(self.pids))]
+        demand = {cat: self.group.count(cat) for cat in RESERVED_ZONES.values()}
+        self.coord_of = [0] * len(self.pids)
+        self.requires = [_FREE] * len(self.pids)  # catégorie imposée par la position du produit
+        if start == "current":
+            # Emplacements actuels ; une case réservée le reste tant qu'un produit de sa catégorie l'occupe
+            for p, c in enumerate(position_coords):
+                self.coord_of[p] = c
+                cat = RESERVED_ZONES.get(self.coord_zone[c])
+                if cat is not None and self.group[p] == cat:
+                    self.requires[p] = cat
+        else:
+            self._greedy_start(position_coords, demand)
+
+        self.occupants: List[List[int]] = [[] for _ in self.xs]
+        for p, c in enumerate(self.coord_of):
+            self.occupants[c].append(p)
+
+    def _greedy_start(self, position_coords: List[int], demand: Dict[str, int]) -> None:
+        """Placement initial glouton par fréquence (règles 1 et 3)."""
+        reserved_positions: Dict[str, List[int]] = {cat: [] for cat in RESERVED_ZONES.values()}
+        free_positions: List[int] = []
+        for c in sorted(position_coords, key=lambda c: self.entry_dist[c]):
+            cat = RESERVED_ZONES.get(self.coord_zone[c])
+            if cat is not None and len(reserved_positions[cat]) < demand[cat]:
+                reserved_positions[cat].append(c)
+            else:
+                free_positions.append(c)
+
+        by_freq = sorted(range(len(self.pids)), key=lambda p: (-self.freq[p], self.pids[p]))
+        placed = [False] * len(self.pids)
+        for cat, positions in reserved_positions.items():
+            members = [p for p in by_freq if self.group[p] == cat][:len(positions)]
+            for p, c in zip(members, positions):
+                self.coord_of[p] = c
+                self.requires[p] = cat
+                placed[p] = True
+        remaining = [p for p in by_freq if not placed[p]]
+        for p, c in zip(remaining, free_positions):
+            self.coord_of[p] = c
+
+    def dist(self, c1: int, c2: int) -> int:
+        return abs(self.xs[c1] - self.xs[c2]) + abs(self.ys[c1] - self.ys[c2])
+
+    def cost(self) -> float:
+        total = sum(self.freq[p] * self.entry_dist[c] for p, c in enumerate(self.coord_of))
+        for p, neighbors in enumerate(self.neighbors):
+            cp = self.coord_of[p]
+            for q, w in neighbors:
+                if p < q:
+                    total += w * self.dist(cp, self.coord_of[q])
+        return total
+
+    def can_swap(self, p: int, q: int) -> bool:
+        """Chaque produit doit respecter la réservation de la position qu'il reçoit."""
+        return (
+            (not self.requires[q] or self.group[p] == self.requires[q])
+            and (not self.requires[p] or self.group[q] == self.requires[p])
+        )
+
+    def swap_delta(self, p: int, q: int) -> float:
+        cp, cq = self.coord_of[p], self.coord_of[q]
+        if cp == cq:
+            return 0.0
+        delta = (self.freq[p] - self.freq[q]) * (self.entry_dist[cq] - self.entry_dist[cp])
+        coord_of, xs, ys = self.coord_of, self.xs, self.ys
+        xp, yp, xq, yq = xs[cp], ys[cp], xs[cq], ys[cq]
+        # dist() déroulée : c'est la boucle la plus chaude du recuit et du re-slotting
+        for r, w in self.neighbors[p]:
+            if r != q:
+                cr = coord_of[r]
+                xr, yr = xs[cr], ys[cr]
+                delta += w * (abs(xq - xr) + abs(yq - yr) - abs(xp - xr) - abs(yp - yr))
+        for r, w in self.neighbors[q]:
+            if r != p:
+                cr = coord_of[r]
+                xr, yr = xs[cr], ys[cr]
+                delta += w * (abs(xp - xr) + abs(yp - yr) - abs(xq - xr) - abs(yq - yr))
+        return delta
+
+    def swap(self, p: int, q: int) -> None:
+        cp, cq = self.coord_of[p], self.coord_of[q]
+        occupants_p, occupants_q = self.occupants[cp], self.occupants[cq]
+        occupants_p[occupants_p.index(p)] = q
+        occupants_q[occupants_q.index(q)] = p
+        self.coord_of[p], self.coord_of[q] = cq, cp
+        self.requires[p], self.requires[q] = self.requires[q], self.requires[p]
+
+    def placement(self) -> Dict[str, Location]:
+        return {
+            pid: Location(self.xs[self.coord_of[p]], self.ys[self.coord_of[p]])
+            for p, pid in enumerate(self.pids)
+        }
+
+
+def _propose(state: _SlottingState, rng: random.Random) -> Tuple[int, int]:
+    """Échange aléatoire, ou (une fois sur deux) rapprochement de p d'un de ses voisins d'affinité."""
+    n = len(state.pids)
+    p = rng.randrange(n)
+    neighbors = state.neighbors[p]
+    if neighbors and rng.random() < 0.5:
+        r, _ = neighbors[rng.randrange(len(neighbors))]
+        occupants = state.occupants[state.coord_of[r]]
+        return p, occupants[rng.randrange(len(occupants))]
+    return p, rng.randrange(n)
+
+
+def optimize_slotting(
+    orders: List[Order],
+    products_by_id: Dict[str, Product],
+    warehouse: Warehouse,
+    affinity_weight: float = 0.5,
+    time_limit_seconds: float = 5.0,
+    max_iterations: Optional[int] = None,
+    seed: int = 0,
+    matrix: Optional[CoOccurrence] = None,
+) -> Tuple[Dict[str, Location], SlottingReport]:
+    """
+    Placement produit -> emplacement par recuit simulé (échanges) sur l'objectif fréquence + affinité.
+    matrix : co-occurrences déjà calculées (ex. PatternStream.co_occurrence(fenêtre)) ; orders est alors ignoré.
+
+    Returns:
+        ({product_id: Location}, rapport)
+    """
+    started = time.perf_counter()
+    if matrix is None:
+        matrix = co_occurrence(orders, product_ids=products_by_id)
+    state = _SlottingState(products_by_id, warehouse, matrix, affinity_weight)
+    n = len(state.pids)
+    initial_cost = state.cost()
+    if n < 2:
+        return state.placement(), SlottingReport(initial_cost, initial_cost, 0, 0, time.perf_counter() - started)
+    rng = random.Random(seed)
+    if max_iterations is None:
+        max_iterations = 200 * n
+
+    # Température initiale : moyenne des deltas positifs d'échanges aléatoires
+    samples = []
+    for _ in range(min(1000, 10 * n)):
+        p, q = _propose(state, rng)
+        if p != q and state.can_swap(p, q):
+            delta = state.swap_delta(p, q)
+            if delta > 0:
+                samples.append(delta)
+    t_start = sum(samples) / len(samples) if samples else 1.0
+    log_ratio = math.log(1e-3)  # température finale = t_start / 1000
+
+    # Refroidissement géométrique sur l'avancement (itérations ou temps, le plus avancé des deux)
+    initial_coords = list(state.coord_of)
+    initial_requires = list(state.requires)
+    cost = initial_cost
+    temperature = t_start
+    accepted = 0
+    iterations = 0
+    while iterations < max_iterations:
+        if iterations % 1024 == 0:
+            progress = max(iterations / max_iterations, (time.perf_counter() - started) / time_limit_seconds)
+            if progress >= 1.0:
+                break
+            temperature = t_start * math.exp(log_ratio * progress)
+        iterations += 1
+        p, q = _propose(state, rng)
+        if p == q or not state.can_swap(p, q):
+            continue
+        delta = state.swap_delta(p, q)
+        if delta < 0 or (delta > 0 and rng.random() < math.exp(-delta / temperature)):
+            state.swap(p, q)
+            cost += delta
+            accepted += 1
+
+    if cost > initial_cost:
+        # Filet de sécurité (budget trop court pour refroidir) : on garde le placement glouton
+        state.coord_of, state.requires, cost = initial_coords, initial_requires, initial_cost
+    report = SlottingReport(initial_cost, cost, iterations, accepted, time.perf_counter() - started)
+    return state.placement(), report
+
+
+@dataclass
+class ReslottingReport:
+    initial_cost: float
+    final_cost: float
+    moves: List[Tuple[str, Location, Location]]  # (produit, emplacement actuel, nouvel emplacement)
+    swaps: int
+    evaluated: int
+    seconds: float
+
+    @property
+    def improvement_percent(self) -> float:
+        if self.initial_cost <= 0:
+            return 0.0
+        return (self.initial_cost - self.final_cost) / self.initial_cost * 100
+
+
+def _move_potential(state: _SlottingState, p: int, min_entry: int) -> float:
+    """Borne grossière du gain d'un déplacement de p : trajet vers l'entrée + distance à ses voisins."""
+    cp = state.coord_of[p]
+    potential = state.freq[p] * (state.entry_dist[cp] - min_entry)
+    for r, w in state.neighbors[p]:
+        potential += w * state.dist(cp, state.coord_of[r])
+    return potential
+
+
+def incremental_reslotting(
+    orders: List[Order],
+    products_by_id: Dict[str, Product],
+    warehouse: Warehouse,
+    max_moves: int = 50,
+    affinity_weight: float = 0.5,
+    time_limit_seconds: float = 5.0,
+    matrix: Optional[CoOccurrence] = None,
+    front_candidates: int = 32,
+    neighbor_candidates: int = 8,
+) -> Tuple[Dict[str, Location], ReslottingReport]:
+    """
+    Re-slotting à partir des emplacements actuels, limité à max_moves produits déplacés.
+
+    Glouton par échanges : on applique à chaque pas l'échange de meilleur gain par déplacement
+    supplémentaire (un produit déjà déplacé ne recompte pas). Candidats de p : produits moins
+    fréquents placés plus près de l'entrée (front_candidates) et occupants des cases de ses
+    voisins d'affinité les plus forts (neighbor_candidates). Seuls les produits au plus fort
+    potentiel sont examinés, et un échange n'invalide que p, q et leurs voisins (file à priorité
+    paresseuse) : de l'ordre de la seconde sur 50 000 références pour K = 50.
+
+    Returns:
+        ({product_id: Location} pour tous les produits, rapport avec la liste des déplacements)
+    """
+    started = time.perf_counter()
+    if matrix is None:
+        matrix = co_occurrence(orders, product_ids=products_by_id)
+    state = _SlottingState(products_by_id, warehouse, matrix, affinity_weight, start="current")
+    n = len(state.pids)
+    original = list(state.coord_of)
+    initial_cost = state.cost()
+    cost = initial_cost
+    if n < 2 or max_moves < 2:
+        return state.placement(), ReslottingReport(initial_cost, cost, [], 0, 0, time.perf_counter() - started)
+
+    coords_by_entry = sorted(range(len(state.xs)), key=lambda c: state.entry_dist[c])
+    strongest = [sorted(neighbors, key=lambda e: -e[1])[:neighbor_candidates] for neighbors in state.neighbors]
+    moves_used = 0
+    evaluated = 0
+
+    def extra_moves(p: int, q: int) -> int:
+        cp, cq = state.coord_of[p], state.coord_of[q]
+        before = (cp != original[p]) + (cq != original[q])
+        return (cq != original[p]) + (cp != original[q]) - before
+
+    def candidates(p: int) -> set:
+        cp = state.coord_of[p]
+        found = set()
+        for r, _ in strongest[p]:
+            found.update(state.occupants[state.coord_of[r]][:4])
+        limit = len(found) + front_candidates
+        # Parcours borné : un produit peu fréquent trouve rarement plus froid que lui près de l'entrée
+        for c in coords_by_entry[:8 * front_candidates]:
+            if state.entry_dist[c] >= state.entry_dist[cp] or len(found) >= limit:
+                break
+            for q in state.occupants[c]:
+                if state.freq[q] < state.freq[p]:
+                    found.add(q)
+        found.discard(p)
+        return found
+
+    def best_swap(p: int) -> Optional[Tuple[float, int]]:
+        nonlocal evaluated
+        best = None
+        for q in candidates(p):
+            if state.coord_of[q] == state.coord_of[p] or not state.can_swap(p, q):
+                continue
+            extra = extra_moves(p, q)
+            if moves_used + extra > max_moves:
+                continue
+            evaluated += 1
+            delta = state.swap_delta(p, q)
+            if delta >= -1e-9:
+                continue
+            score = delta / max(extra, 1)
+            if best is None or score < best[0]:
+                best = (score, q)
+        return best
+
+    # Produits examinés : les plus forts potentiels (quelques multiples du budget)
+    min_entry = min(state.entry_dist)
+    n_movers = min(n, max(20 * max_moves, 500))
+    movers = sorted(range(n), key=lambda p: -_move_potential(state, p, min_entry))[:n_movers]
+    version = [0] * n
+    queued = [-1] * n
+    heap: List[Tuple[float, int, int, int, int]] = []
+
+    def push(p: int) -> None:
+        best = best_swap(p)
+        queued[p] = version[p]
+        if best is not None:
+            score, q = best
+            heapq.heappush(heap, (score, p, q, version[p], version[q]))
+
+    for p in movers:
+        push(p)
+    swaps = 0
+    while heap and moves_used < max_moves and time.perf_counter() - started < time_limit_seconds:
+        score, p, q, version_p, version_q = heapq.heappop(heap)
+        if version_p != version[p]:
+            # p ou un de ses voisins a bougé : on réévalue p (une seule entrée à jour par produit)
+            if queued[p] != version[p]:
+                push(p)
+            continue
+        if version_q != version[q]:
+            push(p)
+            continue
+        extra = extra_moves(p, q)
+        if moves_used + extra > max_moves:
+            push(p)
+            continue
+        delta = state.swap_delta(p, q)
+        state.swap(p, q)
+        cost += delta
+        moves_used += extra
+        swaps += 1
+        for r in {p, q, *(r for r, _ in state.neighbors[p]), *(r for r, _ in state.neighbors[q])}:
+            version[r] += 1
+        push(p)
+        push(q)
+
+    placement = {pid: product.location for pid, product in products_by_id.items()}
+    moves = []
+    for p in range(n):
+        c = state.coord_of[p]
+        if c != original[p]:
+            pid = state.pids[p]
+            placement[pid] = Location(state.xs[c], state.ys[c])
+            moves.append((pid, products_by_id[pid].location, placement[pid]))
+    report = ReslottingReport(initial_cost, cost, moves, swaps, evaluated, time.perf_counter() - started)
+    return placement, report
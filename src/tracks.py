@@ -0,0 +1,152 @@
+"""
+Pistes d'animation des agents, précalculées côté serveur.
+
+- La tournée de chaque agent est celle du TSP (plus proche voisin + 2-opt, ou OR-Tools) sur les
+  emplacements de ses commandes, depuis et vers l'entrée.
+- Chaque piste est une suite d'images clés (t, x, y) : déplacement Manhattan (horizontal puis
+  vertical) à la vitesse de l'agent, arrêt de 30 s par ligne de commande à chaque emplacement.
+  Entre deux images clés, le navigateur interpole linéairement.
+- Encodage compact : les pistes sont concaténées, codées en deltas (t en time_unit secondes) dans
+  des tableaux typés little-endian (Int32 pour t, Int16 pour x et y) transmis en base64.
+"""
+from __future__ import annotations
+
+import base64
+import sys
+from array import array
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from src.models import Agent, Location, Order, Product, Warehouse
+from src.routing import solve_tsp_nearest_neighbor, solve_tsp_with_ortools
+
+# Même estimation que compute_route_for_agent : 30 s par ligne de commande
+PICK_SECONDS = 30
+_ORTOOLS_TRACK_SECONDS = 1
+
+
+@dataclass
+class AgentTracks:
+    agent_ids: List[str]
+    offsets: List[int]                     # piste i = images clés offsets[i]:offsets[i+1]
+    times: List[int] = field(default_factory=list)   # en time_unit secondes, absolus
+    xs: List[int] = field(default_factory=list)
+    ys: List[int] = field(default_factory=list)
+    time_unit: float = 0.1
+
+    def track(self, agent_id: str) -> List[Tuple[float, int, int]]:
+        """Images clés (t en secondes, x, y) d'un agent."""
+        i = self.agent_ids.index(agent_id)
+        start, end = self.offsets[i], self.offsets[i + 1]
+        return [(self.times[k] * self.time_unit, self.xs[k], self.ys[k]) for k in range(start, end)]
+
+    def durations(self) -> List[float]:
+        return [
+            self.times[self.offsets[i + 1] - 1] * self.time_unit if self.offsets[i + 1] > self.offsets[i] else 0.0
+            for i in range(len(self.agent_ids))
+        ]
+
+    def to_dict(self) -> Dict[str, object]:
+        """Charge utile JSON : deltas par piste (le premier point de chaque piste est absolu)."""
+        dt, dx, dy = array("i"), array("h"), array("h")
+        for i in range(len(self.agent_ids)):
+            prev_t = prev_x = prev_y = 0
+            for k in range(self.offsets[i], self.offsets[i + 1]):
+                dt.append(self.times[k] - prev_t)
+                dx.append(self.xs[k] - prev_x)
+                dy.append(self.ys[k] - prev_y)
+                prev_t, prev_x, prev_y = self.times[k], self.xs[k], self.ys[k]
+        return {
+            "agents": self.agent_ids,
+            "time_unit": self.time_unit,
+            "durations": [round(d, 1) for d in self.durations()],
+            "offsets": _b64(array("I", self.offsets)),
+            "dt": _b64(dt),
+            "dx": _b64(dx),
+            "dy": _b64(dy),
+        }
+
+
+def _b64(values: array) -> str:
+    if sys.byteorder != "little":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return base64.b64encode(values.tobytes()).decode("ascii")
+
+
+def _agent_stops(
+    orders: List[Order], products_by_id: Dict[str, Product],
+) -> Tuple[List[Location], List[int]]:
+    """Emplacements uniques des commandes et nombre de lignes à prélever à chacun."""
+    locations: List[Location] = []
+    picks: Dict[Tuple[int, int], int] = {}
+    for order in orders:
+        for item in order.items:
+            product = products_by_id.get(item.product_id)
+            if product is None:
+                continue
+            key = (product.location.x, product.location.y)
+            if key not in picks:
+                picks[key] = 0
+                locations.append(product.location)
+            picks[key] += 1
+    return locations, [picks[(loc.x, loc.y)] for loc in locations]
+
+
+def build_tracks(
+    assignment: Dict[str, Optional[str]],
+    orders: List[Order],
+    agents: List[Agent],
+    products_by_id: Dict[str, Product],
+    warehouse: Warehouse,
+    route_solver: str = "nearest",
+    time_unit: float = 0.1,
+) -> AgentTracks:
+    """
+    Pistes de tous les agents pour une affectation (un agent sans commande reste à l'entrée).
+
+    Args:
+        route_solver: "nearest" (plus proche voisin + 2-opt, rapide) ou "ortools" (1 s par agent)
+    """
+    orders_by_id = {o.id: o for o in orders}
+    orders_by_agent: Dict[str, List[Order]] = {}
+    for order_id, agent_id in assignment.items():
+        if agent_id is not None and order_id in orders_by_id:
+            orders_by_agent.setdefault(agent_id, []).append(orders_by_id[order_id])
+
+    entry = warehouse.entry_point
+    tracks = AgentTracks(agent_ids=[], offsets=[0], time_unit=time_unit)
+    for agent in agents:
+        locations, picks = _agent_stops(orders_by_agent.get(agent.id, []), products_by_id)
+        if route_solver == "ortools":
+            tour, _ = solve_tsp_with_ortools(locations, entry, _ORTOOLS_TRACK_SECONDS)
+        else:
+            tour, _ = solve_tsp_nearest_neighbor(locations, entry)
+        all_locations = [entry] + locations
+        dwell = [0] + [n * PICK_SECONDS for n in picks]
+        speed = agent.speed if agent.speed > 0 else 1.0
+
+        t = 0.0
+        x, y = entry.x, entry.y
+        keyframes = [(0.0, x, y)]
+        for node in (tour or [0])[1:]:
+            target = all_locations[node]
+            # Horizontal puis vertical : un coin intermédiaire si les deux changent
+            if target.x != x and target.y != y:
+                t += abs(target.x - x) / speed
+                x = target.x
+                keyframes.append((t, x, y))
+            t += (abs(target.x - x) + abs(target.y - y)) / speed
+            x, y = target.x, target.y
+            keyframes.append((t, x, y))
+            if dwell[node]:
+                t += dwell[node]
+                keyframes.append((t, x, y))
+
+        tracks.agent_ids.append(agent.id)
+        for kt, kx, ky in keyframes:
+            tracks.times.append(int(round(kt / time_unit)))
+            tracks.xs.append(kx)
+            tracks.ys.append(ky)
+        tracks.offsets.append(len(tracks.times))
+    return tracks
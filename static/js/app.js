@@ -26,8 +26,26 @@ const API = {
       headers: { "Content-Type": "application/json" },
       body: JSON.stringify({ ...getAllocParams(), ...body }),
     }).then((r) => r.json()),
+  job: (jobId) => fetch("/api/jobs/" + encodeURIComponent(jobId)).then((r) => r.json()),
+  tracks: (params) => {
+    const q = new URLSearchParams(params || getAllocParams()).toString();
+    return fetch("/api/tracks" + (q ? "?" + q : "")).then((r) => r.json());
+  },
 };
 
+// Attend la fin d'un job de calcul (POST /api/orders rend la main avant l'allocation)
+function waitForJob(jobId, onDone, delayMs = 500) {
+  API.job(jobId)
+    .then((job) => {
+      if (job.status === "queued" || job.status === "running") {
+        setTimeout(() => waitForJob(jobId, onDone, Math.min(delayMs * 2, 4000)), delayMs);
+      } else {
+        onDone(job);
+      }
+    })
+    .catch((e) => console.warn("Job status failed", e));
+}
+
 // État
 let warehouse = null;
 let products = [];
@@ -44,6 +62,10 @@ let scale = 1;
 let offsetX = 0;
 let offsetY = 0;
 const ANIMATION_SPEED = 0.0006;
+// Pistes précalculées (/api/tracks) : la plus longue tournée est rejouée en TRACK_LOOP_SECONDS
+const TRACK_LOOP_SECONDS = 30;
+// Délai avant de redemander des pistes que le serveur est encore en train de construire
+const TRACK_RETRY_MS = 1000;
 const FLOOR_LABEL_MARGIN = 52;
 let animationId = null;
 
@@ -155,6 +177,96 @@ function drawWarehouseBase() {
   ctx.stroke();
 }
 
+// Pistes d'animation : par agent, images clés absolues (t en secondes, x, y) dans des tableaux typés
+let tracks = null;
+// Pistes chargées pour (version, allocateur, solveur) : changer d'allocateur garde la même version
+let tracksKey = null;
+let tracksParams = null;
+let trackClockStart = performance.now();
+
+function decodeBase64(b64, ArrayType) {
+  const bin = atob(b64);
+  const bytes = new Uint8Array(bin.length);
+  for (let i = 0; i < bin.length; i++) bytes[i] = bin.charCodeAt(i);
+  return new ArrayType(bytes.buffer);
+}
+
+function decodeTracks(data) {
+  const offsets = decodeBase64(data.offsets, Uint32Array);
+  const dt = decodeBase64(data.dt, Int32Array);
+  const dx = decodeBase64(data.dx, Int16Array);
+  const dy = decodeBase64(data.dy, Int16Array);
+  const n = dt.length;
+  const t = new Float64Array(n);
+  const x = new Int16Array(n);
+  const y = new Int16Array(n);
+  const byAgent = {};
+  data.agents.forEach((aid, i) => {
+    let pt = 0, px = 0, py = 0;
+    for (let k = offsets[i]; k < offsets[i + 1]; k++) {
+      pt += dt[k]; px += dx[k]; py += dy[k];
+      t[k] = pt * data.time_unit; x[k] = px; y[k] = py;
+    }
+    byAgent[aid] = { start: offsets[i], end: offsets[i + 1] };
+  });
+  const cycle = Math.max(1, ...data.durations);
+  return { t, x, y, byAgent, cycle, speed: cycle / TRACK_LOOP_SECONDS };
+}
+
+function loadTracks(version) {
+  const params = getAllocParams();
+  const key = [version, params.alloc, params.solver].join("|");
+  if (key === tracksKey) return;
+  const paramsKey = params.alloc + "|" + params.solver;
+  // Autre allocateur : les anciennes pistes ne correspondent plus (repli sur l'animation simple)
+  if (paramsKey !== tracksParams) tracks = null;
+  tracksKey = key;
+  tracksParams = paramsKey;
+  API.tracks(params)
+    .then((data) => {
+      if (key !== tracksKey) return;  // réponse d'une version ou d'un allocateur dépassé
+      if (data.pending) {
+        // Le job construit encore les pistes de ce résultat : nouvel essai dans un instant
+        tracksKey = null;
+        setTimeout(() => {
+          if (tracksKey === null && tracksParams === paramsKey) loadTracks(version);
+        }, TRACK_RETRY_MS);
+        return;
+      }
+      if (data.error || !data.agents) {
+        tracksKey = null;  // nouvel essai à la prochaine mise à jour
+        return;
+      }
+      tracks = decodeTracks(data);
+      trackClockStart = performance.now();
+    })
+    .catch((e) => {
+      if (key === tracksKey) tracksKey = null;
+      console.warn("Tracks failed", e);
+    });
+}
+
+// Position sur la piste à l'instant simulé (recherche dichotomique de l'image clé, interpolation linéaire)
+function getTrackPosition(agentId) {
+  const track = tracks && tracks.byAgent[agentId];
+  if (!track || track.end <= track.start) return null;
+  const { t, x, y } = tracks;
+  const now = (((performance.now() - trackClockStart) / 1000) * tracks.speed) % tracks.cycle;
+  let lo = track.start, hi = track.end - 1;
+  if (now >= t[hi]) return { x: x[hi] + 0.5, y: y[hi] + 0.5, isVerticalSegment: false };
+  while (hi - lo > 1) {
+    const mid = (lo + hi) >> 1;
+    if (t[mid] <= now) lo = mid; else hi = mid;
+  }
+  const span = t[hi] - t[lo];
+  const f = span > 0 ? (now - t[lo]) / span : 0;
+  return {
+    x: x[lo] + (x[hi] - x[lo]) * f + 0.5,
+    y: y[lo] + (y[hi] - y[lo]) * f + 0.5,
+    isVerticalSegment: y[hi] !== y[lo],
+  };
+}
+
 /**
  * Déplacement en Manhattan : horizontal puis vertical. Pas de diagonale.
  * - Robots et chariots : restent sur le même étage (pas de déplacement vertical à l'écran).
@@ -205,7 +317,7 @@ function drawAgents() {
   const entryY = Array.isArray(entry) ? entry[1] : entry.y;
   for (const agent of agentList) {
     const type = agent.type || "robot";
-    const pos = getAgentPosition(agent.id, type);
+    const pos = getTrackPosition(agent.id) || getAgentPosition(agent.id, type);
     let color = AGENT_COLORS[type] || "#7dcfff";
     if (type === "human" && pos && pos.isVerticalSegment) {
       color = HUMAN_FLOOR_COLOR;
@@ -253,43 +365,81 @@ function resizeCanvas() {
 
 function refreshStats() {
   API.stats()
-    .then((data) => {
-      if (data.error) {
-        console.warn("Stats error:", data.error);
-        return;
-      }
-      stats = data.stats || {};
-      ordersMetrics = data.orders_metrics || [];
-      agentPositions = data.agent_positions || {};
-      agentRoutes = data.agent_routes || {};
-      assignment = data.assignment || {};
-      for (const aid of Object.keys(agentRoutes)) {
-        if (agentProgress[aid] === undefined) agentProgress[aid] = 0;
-      }
-      const byType = stats.by_type || {};
-      document.getElementById("stat-orders").textContent = stats.n_orders ?? 0;
-      document.getElementById("stat-assigned").textContent = stats.n_assigned ?? 0;
-      document.getElementById("stat-unassigned").textContent = stats.n_unassigned ?? 0;
-      document.getElementById("stat-distance").textContent = stats.total_distance ?? 0;
-      document.getElementById("stat-time").textContent = stats.total_time_min ?? 0;
-      document.getElementById("stat-cost").textContent = stats.total_cost_euros ?? 0;
-      let html = "";
-      for (const [type, t] of Object.entries(byType)) {
-        const label = type === "robot" ? "Robots" : type === "human" ? "Humains" : "Chariots";
-        html += `<div><span>${label}</span><span>${t.orders || 0} cmd / ${t.count || 0} agent(s)</span></div>`;
-      }
-      document.getElementById("stats-by-type").innerHTML = html || "<div>Aucun agent</div>";
-      const tbody = document.getElementById("orders-metrics-body");
-      if (tbody) {
-        tbody.innerHTML = ordersMetrics.map((m) =>
-          `<tr><td>${m.order_id}</td><td>${m.agent_id || "—"}</td><td>${m.distance}</td><td>${m.time_min}</td><td>${m.cost_euros}</td></tr>`
-        ).join("") || "<tr><td colspan=\"5\">Aucune donnée</td></tr>";
-      }
-      if (ctx && canvasEl) drawWarehouse();
-    })
+    .then(applyStats)
     .catch((e) => console.warn("Refresh stats failed", e));
 }
 
+// Flux SSE : le serveur pousse les nouvelles stats quand le jeu de données change ; repli sur le polling
+let stream = null;
+let pollTimer = null;
+
+function startPolling() {
+  if (!pollTimer) pollTimer = setInterval(refreshStats, 4000);
+}
+
+function openStream() {
+  if (stream) stream.close();
+  if (!window.EventSource) {
+    startPolling();
+    refreshStats();
+    return;
+  }
+  const q = new URLSearchParams(getAllocParams()).toString();
+  stream = new EventSource("/api/stream?" + q);
+  const onEvent = (e) => applyStats(JSON.parse(e.data));
+  stream.addEventListener("update", onEvent);
+  stream.addEventListener("incumbent", onEvent);
+  stream.onopen = () => {
+    if (pollTimer) {
+      clearInterval(pollTimer);
+      pollTimer = null;
+    }
+  };
+  stream.onerror = () => {
+    // Le navigateur se reconnecte seul ; si le serveur refuse le flux (503), on repasse au polling
+    if (stream.readyState === EventSource.CLOSED) {
+      startPolling();
+      refreshStats();
+    }
+  };
+}
+
+function applyStats(data) {
+  if (data.error) {
+    console.warn("Stats error:", data.error);
+    return;
+  }
+  stats = data.stats || {};
+  ordersMetrics = data.orders_metrics || [];
+  agentPositions = data.agent_positions || {};
+  agentRoutes = data.agent_routes || {};
+  assignment = data.assignment || {};
+  for (const aid of Object.keys(agentRoutes)) {
+    if (agentProgress[aid] === undefined) agentProgress[aid] = 0;
+  }
+  loadTracks(data.version);
+  const byType = stats.by_type || {};
+  document.getElementById("stat-orders").textContent = stats.n_orders ?? 0;
+  document.getElementById("stat-assigned").textContent = stats.n_assigned ?? 0;
+  document.getElementById("stat-unassigned").textContent = stats.n_unassigned ?? 0;
+  document.getElementById("stat-distance").textContent = stats.total_distance ?? 0;
+  document.getElementById("stat-time").textContent = stats.total_time_min ?? 0;
+  document.getElementById("stat-cost").textContent = stats.total_cost_euros ?? 0;
+  let html = "";
+  for (const [type, t] of Object.entries(byType)) {
+    const label = type === "robot" ? "Robots" : type === "human" ? "Humains" : "Chariots";
+    html += `<div><span>${label}</span><span>${t.orders || 0} cmd / ${t.count || 0} agent(s)</span></div>`;
+  }
+  document.getElementById("stats-by-type").innerHTML = html || "<div>Aucun agent</div>";
+  const tbody = document.getElementById("orders-metrics-body");
+  if (tbody) {
+    tbody.innerHTML = ordersMetrics.map((m) =>
+      `<tr><td>${m.order_id}</td><td>${m.agent_id || "—"}</td><td>${m.distance}</td><td>${m.time_min}</td><td>${m.cost_euros}</td></tr>`
+    ).join("") || "<tr><td colspan=\"5\">Aucune donnée</td></tr>";
+  }
+  if (ctx && canvasEl) drawWarehouse();
+}
+
 function animationLoop() {
   if (!ctx || !canvasEl || !warehouse) {
     animationId = requestAnimationFrame(animationLoop);
@@ -362,8 +512,16 @@ function submitOrder(e) {
   };
   API.addOrder(body).then((data) => {
     if (data.ok) {
-      msgEl.textContent = `Commande ${data.order_id} créée.`;
+      msgEl.textContent = `Commande ${data.order_id} créée (affectation en cours de calcul).`;
       msgEl.className = "message success";
+      if (data.job_id) {
+        waitForJob(data.job_id, (job) => {
+          if (job.status === "done") {
+            msgEl.textContent = `Commande ${data.order_id} créée et affectée.`;
+            refreshStats();
+          }
+        });
+      }
       if (data.stats) {
         stats = data.stats;
         ordersMetrics = data.orders_metrics || ordersMetrics;
@@ -418,13 +576,12 @@ function init() {
 
   API.agents().then((a) => {
     agents = Array.isArray(a) ? a : [];
-    refreshStats();
+    openStream();
   });
 
   loadProductsForForm();
-  setInterval(refreshStats, 4000);
 
-  document.getElementById("alloc-method")?.addEventListener("change", () => refreshStats());
+  document.getElementById("alloc-method")?.addEventListener("change", () => openStream());
   document.getElementById("btn-add-row")?.addEventListener("click", addProductRow);
   document.getElementById("form-order")?.addEventListener("submit", submitOrder);
 }